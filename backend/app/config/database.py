@@ -6,4 +6,9 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-db = Database(DATABASE_URL)
+# Tamaño del pool de conexiones (opcional). Los movimientos usan una conexión fija por operación,
+# así que se puede agrandar el pool sin riesgo de leer variables de sesión de otra request
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+
+db = Database(DATABASE_URL, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX)
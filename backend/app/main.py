@@ -1,5 +1,13 @@
 from fastapi import FastAPI
 from app.config.database import db
+from app.services.stock_historico import iniciar_checkpoints_stock, detener_checkpoints_stock
+from app.services.idempotencia import iniciar_barrido_idempotencia, detener_barrido_idempotencia
+from app.services.movimiento_archivo import iniciar_archivo_movimientos, detener_archivo_movimientos
+from app.services.reporte_pool import detener_pool_reportes
+from app.services.reporte_jobs import iniciar_limpieza_jobs, detener_limpieza_jobs
+from app.services.reporte_programado import iniciar_reportes_programados, detener_reportes_programados
+from app.services.valuacion import iniciar_valuacion, detener_valuacion
+from app.services.stock_cache import iniciar_sync_stock_cache, detener_sync_stock_cache
 from app.routes import (
     usuarioRoutes,
     categoriaRoutes,
@@ -26,6 +34,7 @@ app.add_middleware(
     allow_credentials=True,  # Importante para JWT
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Siguiente-Cursor"],  # Cursor de paginación (keyset) en los listados paginados
 )
 
 
@@ -34,12 +43,27 @@ async def startup():
     try:
         await db.connect()
         print("✅ Conexión exitosa con la BD ")
+        iniciar_checkpoints_stock()
+        iniciar_barrido_idempotencia()
+        iniciar_archivo_movimientos()
+        iniciar_limpieza_jobs()
+        iniciar_reportes_programados()
+        iniciar_valuacion()
+        iniciar_sync_stock_cache()
     except Exception as e:
         print(f"❌Error al conectarse a la base de datos: {e}")
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await detener_checkpoints_stock()
+    await detener_barrido_idempotencia()
+    await detener_archivo_movimientos()
+    await detener_limpieza_jobs()
+    await detener_reportes_programados()
+    await detener_valuacion()
+    await detener_sync_stock_cache()
+    detener_pool_reportes()
     await db.disconnect()
 
 
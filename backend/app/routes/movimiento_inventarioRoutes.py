@@ -1,27 +1,181 @@
+from datetime import date
 from typing import List
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Header, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from app.schemas.movimiento_inventario import (
+    ConteoFisicoOut,
+    FeedMovimientosOut,
+    LoteMovimientosIn,
+    LoteMovimientosOut,
+    MovimientoFiltros,
     MovimientoInventarioIn,
     MovimientoInventarioOut,
+    ResumenMovimientosOut,
+    TransferenciaIn,
+    TransferenciaOut,
 )
 import app.services.movimiento_inventario as service
+import app.services.conteo_fisico as conteo_service
+import app.services.movimiento_group_commit as group_commit_service
+import app.services.idempotencia as idempotencia_service
+import app.services.movimiento_resumen as resumen_service
+import app.services.movimiento_export as export_service
+import app.services.movimiento_feed as feed_service
 from app.services.auth import require_auth
 
 router = APIRouter()
 
 
+# Los listados aceptan filtros y paginación por keyset: con "limite" se devuelve una página y el cursor
+# de la siguiente viaja en el header X-Siguiente-Cursor (sin "limite" se devuelve todo, como antes)
+
+
+def _pagina(response: Response, resultado: dict):
+    if resultado["siguiente_cursor"]:
+        response.headers["X-Siguiente-Cursor"] = resultado["siguiente_cursor"]
+    return resultado["movimientos"]
+
+
 @router.get("/", response_model=List[MovimientoInventarioOut])
-async def read_movimientos(usuario_actual=Depends(require_auth)):
-    return await service.get_all_movimientos(usuario_actual)
+async def read_movimientos(
+    response: Response,
+    filtros: MovimientoFiltros = Depends(),
+    cursor: str | None = None,
+    limite: int | None = Query(None, ge=1, le=1000),
+    usuario_actual=Depends(require_auth),
+):
+    resultado = await service.get_all_movimientos(usuario_actual, filtros, cursor, limite)
+    return _pagina(response, resultado)
 
 
 @router.get("/usuario/{fk_usuario}", response_model=List[MovimientoInventarioOut])
-async def read_movimientos_por_usuario(fk_usuario: int, usuario_actual=Depends(require_auth)):
-    return await service.get_movimientos_por_usuario(fk_usuario, usuario_actual)
+async def read_movimientos_por_usuario(
+    fk_usuario: int,
+    response: Response,
+    filtros: MovimientoFiltros = Depends(),
+    cursor: str | None = None,
+    limite: int | None = Query(None, ge=1, le=1000),
+    usuario_actual=Depends(require_auth),
+):
+    resultado = await service.get_movimientos_por_usuario(fk_usuario, usuario_actual, filtros, cursor, limite)
+    return _pagina(response, resultado)
+
+
+@router.get("/resumen", response_model=List[ResumenMovimientosOut])
+async def read_resumen_movimientos(
+    granularidad: str = "dia",
+    fecha_desde: date | None = None,
+    fecha_hasta: date | None = None,
+    fk_producto: int | None = None,
+    fk_almacen: int | None = None,
+    tipo_movimiento: str | None = None,
+    usuario_actual=Depends(require_auth),
+):
+    return await resumen_service.get_resumen_movimientos(
+        granularidad, fecha_desde, fecha_hasta, fk_producto, fk_almacen, tipo_movimiento
+    )
+
+
+@router.get("/export")
+async def exportar_movimientos(
+    formato: str = "csv",
+    fecha_inicio: date = None,
+    fecha_fin: date = None,
+    usuario_actual=Depends(require_auth),
+):
+    contenido = export_service.exportar_movimientos(formato, fecha_inicio, fecha_fin)
+
+    return StreamingResponse(
+        contenido,
+        media_type=export_service.FORMATOS[formato],
+        headers={"Content-Disposition": f"attachment; filename=movimientos.{formato}"},
+    )
+
+
+@router.get("/feed", response_model=FeedMovimientosOut)
+async def read_feed_movimientos(
+    cursor: int = 0,
+    limite: int = 500,
+    espera: int = 0,  # Segundos de long-poll si no hay movimientos nuevos (0 = responder enseguida)
+    usuario_actual=Depends(require_auth),
+):
+    return await feed_service.get_feed_movimientos(usuario_actual, cursor, limite, espera)
+
+
+@router.get("/feed/stream")
+async def stream_feed_movimientos(
+    request: Request,
+    cursor: int = 0,
+    limite: int = 500,
+    last_event_id: int | None = Header(None),  # Reconexión automática de EventSource
+    usuario_actual=Depends(require_auth),
+):
+    eventos = await feed_service.stream_feed_movimientos(
+        usuario_actual, request, last_event_id or cursor, limite
+    )
+    return StreamingResponse(
+        eventos,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.post("/", response_model=MovimientoInventarioOut)
 async def create_movimiento(
-    movimiento: MovimientoInventarioIn, usuario_actual=Depends(require_auth)
+    movimiento: MovimientoInventarioIn,
+    idempotency_key: str | None = Header(None),  # Header "Idempotency-Key": los reintentos devuelven el movimiento original
+    usuario_actual=Depends(require_auth),
 ):
+    if idempotency_key is not None:
+        return await idempotencia_service.create_movimiento_idempotente(
+            idempotency_key, movimiento, usuario_actual
+        )
+    if group_commit_service.GROUP_COMMIT_HABILITADO:
+        return await group_commit_service.create_movimiento(movimiento, usuario_actual)
     return await service.create_movimiento(movimiento, usuario_actual)
+
+
+@router.get("/group-commit/metricas")
+async def read_metricas_group_commit(usuario_actual=Depends(require_auth)):
+    return group_commit_service.get_metricas(usuario_actual)
+
+
+@router.post("/lote", response_model=LoteMovimientosOut)
+async def create_movimientos_lote(
+    lote: LoteMovimientosIn, usuario_actual=Depends(require_auth)
+):
+    return await service.create_movimientos_lote(lote, usuario_actual)
+
+
+@router.post("/transferencia", response_model=TransferenciaOut)
+async def transferir_stock(
+    transferencia: TransferenciaIn, usuario_actual=Depends(require_auth)
+):
+    return await service.transferir_stock(transferencia, usuario_actual)
+
+
+@router.post("/conteo/{almacen_id}", response_model=ConteoFisicoOut)
+async def procesar_conteo_fisico(
+    almacen_id: int,
+    request: Request,
+    dry_run: bool = False,
+    completo: bool = False,
+    tamano_lote: int = 500,
+    motivo: str | None = None,
+    usuario_actual=Depends(require_auth),
+):
+    # El body se lee en streaming: CSV (Content-Type text/csv) o array JSON
+    if "csv" in request.headers.get("content-type", ""):
+        lineas = conteo_service.leer_conteo_csv(request.stream())
+    else:
+        lineas = conteo_service.leer_conteo_json(request.stream())
+
+    return await conteo_service.procesar_conteo_fisico(
+        almacen_id,
+        lineas,
+        usuario_actual,
+        dry_run=dry_run,
+        completo=completo,
+        tamano_lote=tamano_lote,
+        motivo=motivo,
+    )
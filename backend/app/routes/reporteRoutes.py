@@ -1,57 +1,131 @@
-from fastapi import APIRouter, Depends
-from fastapi.responses import StreamingResponse
+import os
+from datetime import date
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from app.services.auth import require_auth
+from typing import List
+from app.schemas.reporte import ReporteJobIn, ReporteJobOut, ReporteProgramadoOut
 import app.services.reportes as service
+import app.services.reporte_pool as pool_service
+import app.services.reporte_cache as cache_service
+import app.services.reporte_jobs as jobs_service
+import app.services.reporte_programado as programados_service
+import app.services.reporte_paquete as paquete_service
+import app.services.reporte_export as export_service
 
 router = APIRouter()
 
 
-@router.get("/stock-bajo")
-async def descargar_reporte_stock_bajo(usuario_actual=Depends(require_auth)):
-    pdf_buffer = await service.generar_reporte_stock_bajo_pdf()
-
-    return StreamingResponse(
-        pdf_buffer,
+def _respuesta_pdf(ruta: str, filename: str):  # FileResponse (con Content-Length); el archivo es propio de esta request y se borra después de enviarlo
+    return FileResponse(
+        ruta,
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=reporte_stock_bajo.pdf"},
+        filename=filename,
+        background=BackgroundTask(os.remove, ruta),
     )
 
 
-@router.get("/inventario-general")
-async def descargar_reporte_inventario_general(usuario_actual=Depends(require_auth)):
-    pdf_buffer = await service.generar_reporte_inventario_general_pdf()
+async def _reporte(tipo: str, params: dict, formato: str):
+    if formato != "pdf":  # CSV / XLSX: se escriben fila por fila mientras se envían
+        contenido, filename = await export_service.exportar_reporte(tipo, params, formato)
+        return StreamingResponse(
+            contenido,
+            media_type=export_service.FORMATOS[formato],
+            headers={"Content-Disposition": f"attachment; filename={filename}"},
+        )
 
-    return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
-        headers={
-            "Content-Disposition": f"attachment; filename=reporte_inventario_general.pdf"
-        },
+    await cache_service.sincronizar_version()  # El prearmado se compara con la versión de datos de todos los procesos
+    prearmado = programados_service.obtener_prearmado(tipo, params)  # Copia generada por el scheduler, si sigue fresca
+    if prearmado:
+        return _respuesta_pdf(prearmado, service.nombre_archivo_reporte(tipo, params))
+
+    ruta = await cache_service.obtener_o_generar(
+        tipo, params, lambda: service.generar_reporte_pdf(tipo, params)
     )
+    return _respuesta_pdf(ruta, service.nombre_archivo_reporte(tipo, params))
+
+
+@router.get("/stock-bajo")
+async def descargar_reporte_stock_bajo(
+    solo_resumen: bool = False,  # Solo la página de resumen, sin el detalle
+    almacen_id: int = None,  # Solo ese almacén (sin filtro: todos)
+    formato: str = "pdf",  # pdf, csv o xlsx
+    usuario_actual=Depends(require_auth),
+):
+    return await _reporte("stock-bajo", {"solo_resumen": solo_resumen, "almacen_id": almacen_id}, formato)
+
+
+@router.get("/inventario-general")
+async def descargar_reporte_inventario_general(
+    solo_resumen: bool = False,
+    almacen_id: int = None,
+    formato: str = "pdf",
+    usuario_actual=Depends(require_auth),
+):
+    return await _reporte("inventario-general", {"solo_resumen": solo_resumen, "almacen_id": almacen_id}, formato)
 
 
 @router.get("/movimientos")
 async def descargar_reporte_movimientos(
-    fecha_inicio: str = None,
-    fecha_fin: str = None,
+    fecha_inicio: date = None,
+    fecha_fin: date = None,
+    solo_resumen: bool = False,
+    almacen_id: int = None,
+    formato: str = "pdf",
     usuario_actual=Depends(require_auth),
 ):
-    pdf_buffer = await service.generar_reporte_movimientos_pdf(
-        fecha_inicio=fecha_inicio, fecha_fin=fecha_fin
+    return await _reporte(
+        "movimientos",
+        {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "solo_resumen": solo_resumen, "almacen_id": almacen_id},
+        formato,
     )
 
-    # Nombre del archivo según fechas
-    if fecha_inicio and fecha_fin:
-        filename = f"reporte_movimientos_{fecha_inicio}_al_{fecha_fin}.pdf"
-    elif fecha_inicio:
-        filename = f"reporte_movimientos_desde_{fecha_inicio}.pdf"
-    elif fecha_fin:
-        filename = f"reporte_movimientos_hasta_{fecha_fin}.pdf"
-    else:
-        filename = "reporte_movimientos_general.pdf"
 
+@router.get("/paquete")
+async def descargar_paquete_reportes(
+    tipo: str,
+    almacen_ids: List[int] | None = Query(None),  # Sin almacenes: uno por cada almacén activo
+    fecha_inicio: date = None,
+    fecha_fin: date = None,
+    solo_resumen: bool = False,
+    usuario_actual=Depends(require_auth),
+):
+    params = {"fecha_inicio": fecha_inicio, "fecha_fin": fecha_fin, "solo_resumen": solo_resumen}
+    contenido, filename = await paquete_service.generar_paquete(tipo, params, almacen_ids)
     return StreamingResponse(
-        pdf_buffer,
-        media_type="application/pdf",
+        contenido,
+        media_type="application/zip",
         headers={"Content-Disposition": f"attachment; filename={filename}"},
     )
+
+
+@router.post("/jobs", response_model=ReporteJobOut, status_code=202)
+async def crear_job_reporte(job: ReporteJobIn, usuario_actual=Depends(require_auth)):
+    return await jobs_service.crear_job(job, usuario_actual)
+
+
+@router.get("/jobs/{job_id}", response_model=ReporteJobOut)
+async def read_job_reporte(job_id: str, usuario_actual=Depends(require_auth)):
+    return await jobs_service.get_job(job_id, usuario_actual)
+
+
+@router.get("/jobs/{job_id}/descarga")
+async def descargar_job_reporte(job_id: str, usuario_actual=Depends(require_auth)):
+    ruta, filename = await jobs_service.get_archivo_job(job_id, usuario_actual)
+    return _respuesta_pdf(ruta, filename)
+
+
+@router.get("/programados", response_model=List[ReporteProgramadoOut])
+async def read_reportes_programados(usuario_actual=Depends(require_auth)):
+    return programados_service.get_programados(usuario_actual)
+
+
+@router.get("/pool/metricas")
+async def metricas_pool_reportes(usuario_actual=Depends(require_auth)):
+    return pool_service.get_metricas(usuario_actual)
+
+
+@router.get("/cache/metricas")
+async def metricas_cache_reportes(usuario_actual=Depends(require_auth)):
+    return cache_service.get_metricas(usuario_actual)
@@ -1,15 +1,65 @@
+from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends
-from app.schemas.stock_almacen import Stock_AlmacenIn, Stock_AlmacenOut, StockConProductoOut, StockDetalladoOut, StockPorAlmacenOut, StockPorProductoOut
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from app.schemas.stock_almacen import ConciliacionOut, Stock_AlmacenIn, Stock_AlmacenOut, StockCheckpointOut, StockConProductoOut, StockDetalladoOut, StockHistoricoOut, StockPorAlmacenOut, StockPorProductoOut, ValuacionActualizacionOut, ValuacionOut
 import app.services.stock_almacen as service
+import app.services.stock_historico as historico_service
+import app.services.conciliacion as conciliacion_service
+import app.services.valuacion as valuacion_service
 from app.services.auth import require_auth
 
 router = APIRouter()
 
+FILAS_POR_CHUNK = 500  # Cuántas filas se juntan antes de mandar un chunk al cliente
+
+
+async def _stream_json_array(primera, rows, modelo):  # Serializa de a FILAS_POR_CHUNK filas, sin armar la lista completa en memoria
+    filas = [modelo.model_validate(dict(primera)).model_dump_json()] if primera is not None else []
+    separador = "["  # Antes de cada chunk: abre el array en el primero y separa de lo anterior en los demás
+    async for row in rows:
+        filas.append(modelo.model_validate(dict(row)).model_dump_json())
+        if len(filas) >= FILAS_POR_CHUNK:
+            yield (separador + ",".join(filas)).encode()
+            separador, filas = ",", []
+    if filas or separador == "[":
+        yield (separador + ",".join(filas)).encode()
+    yield b"]"
+
+
+async def _respuesta_json_stream(rows, modelo) -> StreamingResponse:
+    # La primera fila se lee antes de responder: si la consulta falla es un 500, no un 200 con el JSON cortado
+    try:
+        primera = await anext(rows, None)
+    except Exception as e:
+        print(f"Error al consultar el stock: {e}")
+        raise HTTPException(status_code=500, detail="Error al consultar el stock. Intente nuevamente.")
+    return StreamingResponse(_stream_json_array(primera, rows, modelo), media_type="application/json")
+
 
 @router.get("/", response_model=List[StockDetalladoOut])  
-async def read_stock_almacen(usuario_actual=Depends(require_auth)):
-    return await service.get_stock_detallado()
+async def read_stock_almacen(
+    response: Response,
+    almacen_id: int | None = None,
+    categoria_id: int | None = None,
+    solo_con_stock: bool = False,
+    cursor: str | None = None,
+    limite: int | None = Query(None, ge=1, le=1000),  # Sin límite se devuelve todo (igual que antes), pero en streaming
+    usuario_actual=Depends(require_auth),
+):
+    filtros = {
+        "almacen_id": almacen_id,
+        "categoria_id": categoria_id,
+        "solo_con_stock": solo_con_stock,
+        "cursor": cursor,
+    }
+    if limite is None:  # Todo el stock, en streaming y sin cursor
+        return await _respuesta_json_stream(service.get_stock_detallado(**filtros), StockDetalladoOut)
+
+    filas, siguiente_cursor = await service.get_pagina_stock_detallado(**filtros, limite=limite)
+    if siguiente_cursor:
+        response.headers["X-Siguiente-Cursor"] = siguiente_cursor
+    return filas
 
 
 @router.get("/producto/{producto_id}", response_model=List[StockConProductoOut])
@@ -27,6 +77,50 @@ async def read_stock_por_almacen(almacen_id: int, usuario_actual=Depends(require
     return await service.get_stock_por_almacen(almacen_id)  
 
 
+@router.get("/historico", response_model=List[StockHistoricoOut])
+async def read_stock_historico(
+    fecha: datetime,
+    almacen_id: int | None = None,
+    producto_id: int | None = None,
+    usuario_actual=Depends(require_auth),
+):
+    return await historico_service.get_stock_historico(fecha, almacen_id, producto_id)
+
+
+@router.post("/historico/checkpoint", response_model=StockCheckpointOut)
+async def create_checkpoint_stock(usuario_actual=Depends(require_auth)):
+    return await historico_service.crear_checkpoint_stock(usuario_actual)
+
+
+@router.get("/cache/metricas")
+async def read_metricas_cache(usuario_actual=Depends(require_auth)):
+    return await service.get_metricas_cache(usuario_actual)
+
+
+@router.post("/conciliacion", response_model=ConciliacionOut)
+async def conciliar_stock(
+    almacen_id: int | None = None,
+    corregir: bool = False,  # Registrar ajustes para que el libro de movimientos cierre con el stock actual
+    usuario_actual=Depends(require_auth),
+):
+    return await conciliacion_service.conciliar_stock_admin(usuario_actual, almacen_id, corregir)
+
+
+@router.get("/valuacion", response_model=ValuacionOut)
+async def read_valuacion(
+    periodo: str | None = None,  # AAAA-MM: valuación al cierre de ese mes (sin período: la actual)
+    almacen_id: int | None = None,
+    producto_id: int | None = None,
+    usuario_actual=Depends(require_auth),
+):
+    return await valuacion_service.get_valuacion(usuario_actual, periodo, almacen_id, producto_id)
+
+
+@router.post("/valuacion/actualizar", response_model=ValuacionActualizacionOut)
+async def actualizar_valuacion(usuario_actual=Depends(require_auth)):
+    return await valuacion_service.actualizar_valuacion_admin(usuario_actual)
+
+
 @router.post("/", response_model=Stock_AlmacenOut)
 async def create_stock_almacen(
     stock_almacen: Stock_AlmacenIn, usuario_actual=Depends(require_auth)
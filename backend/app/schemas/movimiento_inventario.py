@@ -1,5 +1,6 @@
+from typing import List
 from pydantic import BaseModel
-from datetime import datetime
+from datetime import date, datetime
 
 
 class MovimientoInventarioIn(BaseModel):
@@ -12,6 +13,15 @@ class MovimientoInventarioIn(BaseModel):
     fk_proveedor: int | None = None
 
 
+class MovimientoFiltros(BaseModel):  # Filtros opcionales de los listados de movimientos (query params)
+    fk_producto: int | None = None
+    fk_almacen: int | None = None
+    tipo_movimiento: str | None = None
+    fk_proveedor: int | None = None
+    fecha_desde: datetime | None = None  # Inclusive
+    fecha_hasta: datetime | None = None  # Exclusiva (rango semiabierto)
+
+
 class MovimientoInventarioOut(BaseModel):
     id: int
     fk_producto: int
@@ -23,6 +33,7 @@ class MovimientoInventarioOut(BaseModel):
     motivo: str | None = None
     fk_usuario: int
     fk_proveedor: int | None = None
+    fk_transferencia: int | None = None  # Id de la salida de la transferencia (en sus dos movimientos)
     fecha_movimiento: datetime | None = None
     nombre_usuario: str| None = None
 
@@ -30,4 +41,85 @@ class MovimientoInventarioOut(BaseModel):
         json_encoders = {
             datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
         }
-        
\ No newline at end of file
+        
+
+class TransferenciaLineaIn(BaseModel):  # Una línea de la transferencia: qué producto, de dónde a dónde y cuánto
+    fk_producto: int
+    fk_almacen_origen: int
+    fk_almacen_destino: int
+    cantidad: int
+
+
+class TransferenciaIn(BaseModel):  # Transferencia entre almacenes (acepta varias líneas para aplicar un plan completo)
+    lineas: List[TransferenciaLineaIn]
+    motivo: str | None = None
+    fk_usuario: int
+
+
+class TransferenciaOut(BaseModel):
+    movimientos: List[MovimientoInventarioOut]
+
+
+class ConteoDiferenciaOut(BaseModel):  # Diferencia de un producto entre el sistema y el conteo físico
+    fk_producto: int
+    codigo: str
+    cantidad_sistema: int
+    cantidad_contada: int
+    diferencia: int
+    movimiento_id: int | None = None  # Ajuste generado (None en dry run)
+
+
+class ConteoErrorOut(BaseModel):
+    linea: int
+    detalle: str
+
+
+class ConteoFisicoOut(BaseModel):  # Resumen de varianza del conteo físico
+    fk_almacen: int
+    dry_run: bool
+    lineas_leidas: int
+    productos_contados: int
+    productos_con_diferencia: int
+    unidades_faltantes: int
+    unidades_sobrantes: int
+    diferencias: List[ConteoDiferenciaOut]
+    errores: List[ConteoErrorOut]
+    ajustes_aplicados: int = 0  # Ajustes confirmados (0 en dry run)
+    error_ajustes: str | None = None  # Si un lote de ajustes falló: los lotes anteriores quedaron aplicados
+
+
+class LoteMovimientosIn(BaseModel):  # Lote de movimientos a procesar en un solo request
+    movimientos: List[MovimientoInventarioIn]
+    tamano_chunk: int | None = None  # Movimientos por transacción (None = todo el lote en una sola)
+    atomico: bool = False  # Si una línea falla, se revierte todo su chunk
+
+
+class LoteResultadoOut(BaseModel):  # Resultado de una línea del lote
+    indice: int
+    ok: bool
+    movimiento: MovimientoInventarioOut | None = None
+    error: str | None = None
+
+
+class LoteMovimientosOut(BaseModel):
+    resultados: List[LoteResultadoOut]
+    total: int
+    exitosos: int
+    fallidos: int
+    duracion_ms: float
+    movimientos_por_segundo: float
+
+
+class ResumenMovimientosOut(BaseModel):  # Un punto de la serie (día, semana o mes) del resumen de movimientos
+    periodo: date
+    fk_producto: int
+    fk_almacen: int
+    tipo_movimiento: str
+    cantidad_movimientos: int
+    cantidad_total: int
+    cambio_neto: int
+
+
+class FeedMovimientosOut(BaseModel):  # Página del feed de cambios: movimientos con id mayor al cursor
+    movimientos: List[MovimientoInventarioOut]
+    siguiente_cursor: int  # Mandarlo como "cursor" en el próximo pedido
@@ -0,0 +1,49 @@
+from typing import Literal
+from pydantic import BaseModel
+from datetime import date, datetime
+
+
+class ReporteJobIn(BaseModel):  # Pedido de un reporte para generar en segundo plano
+    tipo: Literal["stock-bajo", "inventario-general", "movimientos"]
+    fecha_inicio: date | None = None  # Solo para "movimientos"
+    fecha_fin: date | None = None
+    almacen_id: int | None = None  # Reporte de un solo almacén
+    solo_resumen: bool = False  # Solo la página de resumen, sin el detalle
+
+
+class ReporteJobOut(BaseModel):
+    id: str
+    tipo: str
+    estado: str  # en_cola, consultando, armando, terminado, error
+    progreso: int  # Porcentaje aproximado según la etapa
+    filas: int | None = None
+    tamano_bytes: int | None = None
+    error: str | None = None
+    fecha_creacion: datetime
+    fecha_fin: datetime | None = None
+    fecha_expiracion: datetime | None = None  # A partir de esta fecha el archivo se borra
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
+        }
+
+
+class ReporteProgramadoIn(ReporteJobIn):  # Entrada de REPORTES_PROGRAMADOS (JSON)
+    cron: str  # "minuto hora día_mes mes día_semana", ej: "30 5 * * 1-5"
+    frescura_minutos: int = 0  # Se sirve aunque los datos hayan cambiado si tiene menos de estos minutos (0 = solo si no cambió nada)
+
+
+class ReporteProgramadoOut(BaseModel):
+    tipo: str
+    params: dict
+    cron: str
+    frescura_minutos: int
+    proxima_ejecucion: datetime | None = None
+    ultima_generacion: datetime | None = None
+    ultimo_error: str | None = None
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
+        }
@@ -22,6 +22,8 @@ class Stock_AlmacenOut(BaseModel):
         }
 
 class StockDetalladoOut(BaseModel):
+    fk_producto: int
+    fk_almacen: int
     producto: str
     almacen: str
     total_disponible: int
@@ -51,3 +53,77 @@ class StockPorAlmacenOut(BaseModel):
     nombre_producto: str
     cantidad_disponible: int
     cantidad_reservada: int
+
+
+class StockHistoricoOut(BaseModel):  # Stock reconstruido a una fecha pasada
+    fk_producto: int
+    fk_almacen: int
+    cantidad_disponible: int
+    fecha_checkpoint: datetime | None = None  # Checkpoint desde el que se reconstruyó (None = desde el inicio)
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
+        }
+
+
+class StockCheckpointOut(BaseModel):
+    id: int
+    fecha_checkpoint: datetime
+    ultimo_movimiento_id: int
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
+        }
+
+
+class ConciliacionDiferenciaOut(BaseModel):  # Producto cuyo stock no coincide con el saldo de sus movimientos
+    fk_almacen: int
+    fk_producto: int
+    stock_actual: int
+    saldo_libro: int
+    diferencia: int
+    movimiento_id: int | None = None  # Ajuste correctivo generado (si se pidió corregir)
+
+
+class ConciliacionOut(BaseModel):
+    almacenes_revisados: int
+    productos_revisados: int
+    diferencias: list[ConciliacionDiferenciaOut]
+    ajustes_generados: int
+    duracion_ms: float
+
+
+class ValuacionItemOut(BaseModel):  # Valuación a costo de un producto en un almacén
+    fk_producto: int
+    codigo: str
+    producto: str
+    fk_almacen: int
+    almacen: str
+    cantidad: int
+    costo_promedio: float  # Promedio ponderado móvil
+    valor_promedio: float  # cantidad * costo_promedio
+    valor_fifo: float  # Suma de las capas FIFO que siguen en stock
+
+
+class ValuacionOut(BaseModel):
+    periodo: str | None = None  # AAAA-MM del cierre consultado (None = estado actual)
+    fecha_cierre: datetime | None = None
+    ultimo_movimiento_id: int
+    fecha_actualizacion: datetime | None = None  # Última corrida de la valuación (el GET no recalcula)
+    valor_promedio_total: float
+    valor_fifo_total: float
+    items: list[ValuacionItemOut]
+
+    class Config:
+        json_encoders = {
+            datetime: lambda v: v.strftime("%d/%m/%Y %H:%M:%S") if v else None
+        }
+
+
+class ValuacionActualizacionOut(BaseModel):
+    movimientos_procesados: int
+    ultimo_movimiento_id: int
+    cierres_generados: list[str]  # Meses que se cerraron en esta corrida
+    duracion_ms: float
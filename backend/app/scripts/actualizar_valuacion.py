@@ -0,0 +1,24 @@
+# Actualiza la valuación a costo (promedio ponderado y FIFO) con los movimientos posteriores al checkpoint
+# Uso (desde backend/): python -m app.scripts.actualizar_valuacion
+# La primera vez recorre todo el historial y genera los cierres de cada mes; después solo lo nuevo
+import asyncio
+from app.config.database import db
+from app.services.valuacion import actualizar_valuacion
+
+
+async def main():
+    await db.connect()
+    try:
+        resultado = await actualizar_valuacion()
+    finally:
+        await db.disconnect()
+
+    cierres = ", ".join(resultado["cierres_generados"]) or "ninguno"
+    print(
+        f"✅ {resultado['movimientos_procesados']} movimientos procesados hasta el id {resultado['ultimo_movimiento_id']} "
+        f"en {resultado['duracion_ms']} ms (cierres: {cierres})"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
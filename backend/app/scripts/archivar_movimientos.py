@@ -0,0 +1,26 @@
+# Archiva los movimientos anteriores al horizonte y acumula su efecto en saldos_apertura
+# Uso (desde backend/): python -m app.scripts.archivar_movimientos [horizonte_dias]
+# Sin argumento se usa MOVIMIENTOS_ARCHIVO_HORIZONTE_DIAS
+import asyncio
+import sys
+from app.config.database import db
+from app.services.movimiento_archivo import ARCHIVO_HORIZONTE_DIAS, archivar_movimientos
+
+
+async def main():
+    horizonte_dias = int(sys.argv[1]) if len(sys.argv) > 1 else ARCHIVO_HORIZONTE_DIAS
+
+    await db.connect()
+    try:
+        resultado = await archivar_movimientos(horizonte_dias)
+    finally:
+        await db.disconnect()
+
+    print(
+        f"✅ {resultado['movimientos_archivados']} movimientos archivados "
+        f"(saldos de apertura hasta el movimiento {resultado['ultimo_movimiento_id']})"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
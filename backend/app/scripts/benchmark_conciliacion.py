@@ -0,0 +1,66 @@
+# Mide la conciliación de stock (solo lectura, sin --corregir) contra su objetivo de tiempo:
+# un libro de 10M de movimientos tiene que conciliarse en minutos
+# Uso (desde backend/): python -m app.scripts.benchmark_conciliacion [--repeticiones 3] [--objetivo-segundos 300]
+#   [--objetivo-movimientos 10000000] [--concurrencia 4 8 ...]
+# Con menos movimientos que el objetivo, el tiempo se extrapola linealmente (el agregado por almacén recorre
+# cada movimiento una vez). Sale con código 1 si el tiempo medido o extrapolado supera el objetivo
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from app.config.database import db
+import app.services.conciliacion as conciliacion
+
+
+async def _medir(concurrencia: int, repeticiones: int) -> tuple[float, dict]:  # Mediana en segundos y el último resultado
+    conciliacion.CONCILIACION_CONCURRENCIA = concurrencia
+    tiempos = []
+    resultado = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = await conciliacion.conciliar_stock()
+        tiempos.append(time.perf_counter() - inicio)
+    return statistics.median(tiempos), resultado
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la conciliación de stock")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--objetivo-segundos", type=float, default=300)
+    parser.add_argument("--objetivo-movimientos", type=int, default=10_000_000)
+    parser.add_argument(
+        "--concurrencia", type=int, nargs="+", default=[conciliacion.CONCILIACION_CONCURRENCIA],
+        help="almacenes en paralelo (se mide cada valor)",
+    )
+    args = parser.parse_args()
+
+    await db.connect()
+    try:
+        row = await db.fetch_one("SELECT COUNT(*) AS total FROM movimientos_inventario")
+        movimientos = row["total"]
+        print(f"Libro: {movimientos} movimientos en la tabla caliente")
+
+        fallas = 0
+        for concurrencia in args.concurrencia:
+            mediana, resultado = await _medir(concurrencia, args.repeticiones)
+            escala = max(1.0, args.objetivo_movimientos / movimientos) if movimientos else 1.0
+            estimado = mediana * escala
+            ok = estimado <= args.objetivo_segundos
+            fallas += not ok
+            print(
+                f"{'✅' if ok else '❌'} concurrencia {concurrencia}: mediana {mediana:.2f} s "
+                f"({movimientos / mediana:,.0f} mov/s), {resultado['almacenes_revisados']} almacenes, "
+                f"{resultado['productos_revisados']} productos, {len(resultado['diferencias'])} diferencias"
+                + (f" -> estimado para {args.objetivo_movimientos:,} movimientos: {estimado:.0f} s" if escala > 1 else "")
+                + f" (objetivo {args.objetivo_segundos:.0f} s)"
+            )
+    finally:
+        await db.disconnect()
+
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+# Benchmark de un SKU "caliente": N clientes concurrentes registrando entradas sobre el mismo (producto, almacén)
+# Compara el camino normal (SP, un lock por movimiento) contra el group commit (un lock por lote)
+# Uso (desde backend/, contra una base de PRUEBA: registra movimientos reales):
+#   python -m app.scripts.benchmark_group_commit --producto 1 --almacen 1 --usuario 1 [--clientes 50] [--por-cliente 20] [--modo ambos]
+import argparse
+import asyncio
+import statistics
+import time
+from app.config.database import db
+from app.schemas.movimiento_inventario import MovimientoInventarioIn
+import app.services.movimiento_group_commit as group_commit
+import app.services.movimiento_inventario as movimientos
+
+
+async def _cliente(crear, movimiento, por_cliente: int, latencias: list, errores: list):
+    for _ in range(por_cliente):
+        inicio = time.perf_counter()
+        try:
+            await crear(movimiento)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        except Exception as e:
+            errores.append(str(getattr(e, "detail", e)))
+
+
+async def _medir(nombre: str, crear, movimiento, clientes: int, por_cliente: int):
+    latencias, errores = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(crear, movimiento, por_cliente, latencias, errores) for _ in range(clientes)))
+    duracion = time.perf_counter() - inicio
+
+    latencias.sort()
+    percentil = lambda p: latencias[min(len(latencias) - 1, int(len(latencias) * p))] if latencias else 0.0
+    print(
+        f"{nombre:>12}: {len(latencias)} ok / {len(errores)} errores en {duracion:.2f} s "
+        f"-> {len(latencias) / duracion:.1f} mov/s | latencia p50 {percentil(0.50):.1f} ms, "
+        f"p95 {percentil(0.95):.1f} ms, p99 {percentil(0.99):.1f} ms, media {statistics.fmean(latencias or [0]):.1f} ms"
+    )
+    if errores:
+        print(f"{'':>12}  primer error: {errores[0]}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark de group commit sobre un SKU caliente")
+    parser.add_argument("--producto", type=int, required=True)
+    parser.add_argument("--almacen", type=int, required=True)
+    parser.add_argument("--usuario", type=int, required=True, help="usuario que registra los movimientos")
+    parser.add_argument("--clientes", type=int, default=50)
+    parser.add_argument("--por-cliente", type=int, default=20)
+    parser.add_argument("--modo", choices=["sp", "group", "ambos"], default="ambos")
+    args = parser.parse_args()
+
+    movimiento = MovimientoInventarioIn(
+        fk_producto=args.producto,
+        fk_almacen=args.almacen,
+        tipo_movimiento="entrada",
+        cantidad=1,
+        motivo="Benchmark group commit",
+        fk_usuario=args.usuario,
+    )
+    admin = {"id": args.usuario, "rol": "admin"}
+
+    await db.connect()
+    try:
+        print(f"{args.clientes} clientes x {args.por_cliente} movimientos sobre producto {args.producto} / almacén {args.almacen}")
+        if args.modo in ("sp", "ambos"):
+            await _medir("sp", lambda m: movimientos.create_movimiento(m, admin), movimiento, args.clientes, args.por_cliente)
+        if args.modo in ("group", "ambos"):
+            await _medir("group commit", group_commit.encolar_movimiento, movimiento, args.clientes, args.por_cliente)
+            metricas = group_commit.get_metricas(admin)
+            print(f"{'':>12}  lotes {metricas['lotes']}, promedio {metricas['promedio_por_lote']} por lote, máximo {metricas['lote_maximo']}")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,138 @@
+# Mide la latencia de la API mientras se arman reportes PDF grandes
+# Uso (desde backend/):
+#   python -m app.scripts.benchmark_latencia_reportes --local 20000 [--reportes 4]
+#       Sin servidor ni BD: arma N filas inventadas por reporte en el pool de procesos y mide cuánto se atrasa
+#       el event loop (lo mismo que esperaría cualquier request atendida por ese worker)
+#   python -m app.scripts.benchmark_latencia_reportes --url http://localhost:8000 --token JWT [--reportes 4]
+#       Contra la API levantada: pide GET / cada 20 ms, primero sola y después con N reportes de movimientos
+#       en curso (cada uno con otro rango de fechas, para que no salgan de la caché), y compara p50/p95/p99
+import argparse
+import asyncio
+import os
+import time
+from datetime import date, timedelta
+from app.services import reportes
+from app.services.reporte_pool import detener_pool_reportes, renderizar_pdf
+from app.scripts.benchmark_reportes import _escribir_detalle_sintetico
+
+INTERVALO_SONDA_SEGUNDOS = 0.02
+
+
+def _percentiles(muestras: list) -> str:
+    if not muestras:
+        return "sin muestras"
+    ordenadas = sorted(muestras)
+
+    def p(q):
+        return ordenadas[min(len(ordenadas) - 1, int(q * len(ordenadas)))]
+
+    return (
+        f"n={len(ordenadas)} p50={p(0.50):.1f} ms p95={p(0.95):.1f} ms "
+        f"p99={p(0.99):.1f} ms max={ordenadas[-1]:.1f} ms"
+    )
+
+
+async def _sonda_loop(muestras: list, fin: asyncio.Event):  # Atraso de cada sleep respecto de lo pedido
+    while not fin.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(INTERVALO_SONDA_SEGUNDOS)
+        muestras.append((time.perf_counter() - inicio - INTERVALO_SONDA_SEGUNDOS) * 1000)
+
+
+async def local(filas: int, cantidad: int):
+    resumen = {"total": filas, "entradas": 0, "salidas": 0, "ajustes": 0, "devoluciones": 0, "almacenes": 12, "usuarios": 30}
+    detalles = [_escribir_detalle_sintetico(filas) for _ in range(cantidad)]
+
+    # Calienta el pool (arranque de los procesos spawn) para no medirlo
+    os.remove(await renderizar_pdf(reportes.render_movimientos_pdf, resumen, None))
+
+    reposo, carga = [], []
+    fin = asyncio.Event()
+    sonda = asyncio.create_task(_sonda_loop(reposo, fin))
+    await asyncio.sleep(2)
+    fin.set()
+    await sonda
+
+    fin = asyncio.Event()
+    sonda = asyncio.create_task(_sonda_loop(carga, fin))
+    inicio = time.perf_counter()
+    try:
+        rutas = await asyncio.gather(
+            *(renderizar_pdf(reportes.render_movimientos_pdf, resumen, d) for d in detalles)
+        )
+    finally:
+        fin.set()
+        await sonda
+        for d in detalles:
+            os.remove(d)
+    duracion = time.perf_counter() - inicio
+    for ruta in rutas:
+        os.remove(ruta)
+    detener_pool_reportes()
+
+    print(f"Atraso del event loop en reposo:          {_percentiles(reposo)}")
+    print(f"Atraso con {cantidad} reportes de {filas} filas: {_percentiles(carga)} ({duracion:.1f} s)")
+
+
+async def _sondear_api(cliente, muestras: list, fin: asyncio.Event):
+    while not fin.is_set():
+        inicio = time.perf_counter()
+        respuesta = await cliente.get("/")
+        respuesta.raise_for_status()
+        muestras.append((time.perf_counter() - inicio) * 1000)
+        await asyncio.sleep(INTERVALO_SONDA_SEGUNDOS)
+
+
+async def contra_api(url: str, token: str, cantidad: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=url, timeout=None) as cliente:
+        reposo, carga = [], []
+        fin = asyncio.Event()
+        sonda = asyncio.create_task(_sondear_api(cliente, reposo, fin))
+        await asyncio.sleep(5)
+        fin.set()
+        await sonda
+
+        async def descargar(i):
+            respuesta = await cliente.get(
+                "/reportes/movimientos",
+                params={"fecha_fin": (date.today() - timedelta(days=i)).isoformat()},
+                headers={"Authorization": f"Bearer {token}"},
+            )
+            return respuesta.status_code, len(respuesta.content)
+
+        fin = asyncio.Event()
+        sonda = asyncio.create_task(_sondear_api(cliente, carga, fin))
+        inicio = time.perf_counter()
+        try:
+            resultados = await asyncio.gather(*(descargar(i) for i in range(cantidad)))
+        finally:
+            fin.set()
+            await sonda
+        duracion = time.perf_counter() - inicio
+
+    print(f"GET / en reposo:                 {_percentiles(reposo)}")
+    print(f"GET / con {cantidad} reportes en curso: {_percentiles(carga)} ({duracion:.1f} s)")
+    for status, tamano in resultados:
+        print(f"  reporte: HTTP {status}, {tamano / 1024 / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latencia de la API durante la generación de reportes")
+    parser.add_argument("--local", type=int, help="filas inventadas por reporte (sin servidor ni BD)")
+    parser.add_argument("--url", help="URL base de la API")
+    parser.add_argument("--token", help="JWT de un usuario para pedir los reportes")
+    parser.add_argument("--reportes", type=int, default=4, help="reportes simultáneos")
+    args = parser.parse_args()
+
+    if args.local:
+        asyncio.run(local(args.local, args.reportes))
+    elif args.url and args.token:
+        asyncio.run(contra_api(args.url, args.token, args.reportes))
+    else:
+        parser.error("indicar --local N, o --url y --token")
+
+
+if __name__ == "__main__":
+    main()
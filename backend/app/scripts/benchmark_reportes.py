@@ -0,0 +1,105 @@
+# Mide tiempo y memoria pico de un reporte PDF grande
+# Uso (desde backend/):
+#   python -m app.scripts.benchmark_reportes --sintetico 500000      (sin BD: N movimientos inventados)
+#   python -m app.scripts.benchmark_reportes --tipo movimientos [--fecha-inicio AAAA-MM-DD] [--fecha-fin AAAA-MM-DD] [--almacen ID]
+# En modo sintético el detalle se escribe igual que lo hace _leer_reporte y el PDF se arma en este mismo proceso,
+# así la memoria pico medida es la del armado. Con BD mide la generación completa (consulta + pool de procesos)
+import argparse
+import asyncio
+import os
+import pickle
+import resource
+import time
+from datetime import date, datetime, timedelta
+from app.services import reportes
+from app.services.reporte_pool import detener_pool_reportes
+
+
+def _memoria_pico_mb() -> float:  # ru_maxrss está en KB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _escribir_detalle_sintetico(filas: int) -> str:
+    ruta = reportes._archivo_temporal(".detalle")
+    tipos = ("entrada", "salida", "ajuste", "devolucion")
+    inicio = datetime(2024, 1, 1)
+    with open(ruta, "wb") as archivo:
+        for desde in range(0, filas, reportes.REPORTES_FILAS_POR_TABLA):
+            bloque = [
+                {
+                    "fecha": (inicio + timedelta(minutes=i)).strftime("%d/%m/%Y %H:%M"),
+                    "tipo_movimiento": tipos[i % 4],
+                    "producto": f"Producto de prueba {i % 5000}",
+                    "almacen": f"Almacén {i % 12}",
+                    "cantidad": i % 50 + 1,
+                    "cantidad_anterior": 100,
+                    "cantidad_nueva": 100 + i % 50,
+                    "usuario": f"usuario{i % 30}",
+                }
+                for i in range(desde, min(desde + reportes.REPORTES_FILAS_POR_TABLA, filas))
+            ]
+            pickle.dump(bloque, archivo)
+    return ruta
+
+
+def sintetico(filas: int):
+    resumen = {"total": filas, "entradas": 0, "salidas": 0, "ajustes": 0, "devoluciones": 0, "almacenes": 12, "usuarios": 30}
+    detalle = _escribir_detalle_sintetico(filas)
+    base = _memoria_pico_mb()
+    inicio = time.perf_counter()
+    try:
+        ruta = reportes.render_movimientos_pdf(resumen, detalle, None, None, None)
+    finally:
+        os.remove(detalle)
+    duracion = time.perf_counter() - inicio
+    tamano = os.path.getsize(ruta) / 1024 / 1024
+    os.remove(ruta)
+    print(
+        f"✅ {filas} filas: {duracion:.1f} s, PDF de {tamano:.1f} MB, "
+        f"memoria pico {_memoria_pico_mb():.0f} MB (antes de armar: {base:.0f} MB)"
+    )
+
+
+async def con_bd(args):
+    from app.config.database import db
+
+    params = {
+        "fecha_inicio": args.fecha_inicio,
+        "fecha_fin": args.fecha_fin,
+        "almacen_id": args.almacen,
+        "solo_resumen": False,
+    }
+    filas = []
+    await db.connect()
+    try:
+        inicio = time.perf_counter()
+        ruta = await reportes.generar_reporte_pdf(args.tipo, params, filas.append)
+        duracion = time.perf_counter() - inicio
+    finally:
+        await db.disconnect()
+        detener_pool_reportes()
+    tamano = os.path.getsize(ruta) / 1024 / 1024
+    os.remove(ruta)
+    print(
+        f"✅ {args.tipo}: {filas[0] if filas else '?'} filas en {duracion:.1f} s, PDF de {tamano:.1f} MB, "
+        f"memoria pico del proceso principal {_memoria_pico_mb():.0f} MB"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de reportes PDF grandes")
+    parser.add_argument("--sintetico", type=int, help="cantidad de movimientos inventados (no usa la BD)")
+    parser.add_argument("--tipo", choices=reportes.TIPOS_REPORTE, default="movimientos")
+    parser.add_argument("--fecha-inicio", type=date.fromisoformat)
+    parser.add_argument("--fecha-fin", type=date.fromisoformat)
+    parser.add_argument("--almacen", type=int)
+    args = parser.parse_args()
+
+    if args.sintetico:
+        sintetico(args.sintetico)
+    else:
+        asyncio.run(con_bd(args))
+
+
+if __name__ == "__main__":
+    main()
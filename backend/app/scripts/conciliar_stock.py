@@ -0,0 +1,38 @@
+# Concilia stock_almacen contra el saldo de movimientos_inventario e informa las diferencias
+# Uso (desde backend/): python -m app.scripts.conciliar_stock [--corregir --usuario ID] [almacen_id ...]
+import argparse
+import asyncio
+from app.config.database import db
+from app.services.conciliacion import conciliar_stock
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Conciliación de stock vs. movimientos")
+    parser.add_argument("almacenes", nargs="*", type=int, help="ids de almacén (por defecto, todos)")
+    parser.add_argument("--corregir", action="store_true", help="registrar ajustes correctivos")
+    parser.add_argument("--usuario", type=int, help="usuario que registra los ajustes")
+    args = parser.parse_args()
+
+    if args.corregir and args.usuario is None:
+        parser.error("--corregir requiere --usuario")
+
+    await db.connect()
+    try:
+        resultado = await conciliar_stock(args.almacenes or None, args.corregir, args.usuario)
+    finally:
+        await db.disconnect()
+
+    for d in resultado["diferencias"]:
+        print(
+            f"Almacén {d['fk_almacen']} - producto {d['fk_producto']}: "
+            f"stock {d['stock_actual']} / libro {d['saldo_libro']} (diferencia {d['diferencia']})"
+        )
+    print(
+        f"✅ {resultado['almacenes_revisados']} almacenes, {resultado['productos_revisados']} productos, "
+        f"{len(resultado['diferencias'])} diferencias, {resultado['ajustes_generados']} ajustes "
+        f"en {resultado['duracion_ms']} ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+# Verifica con EXPLAIN que el reporte de movimientos filtrado por fechas use idx_movimientos_fecha (range scan)
+# y no recorra toda la tabla. Sale con código 1 si alguna consulta no usa el índice, para poder correrlo en CI
+# Uso (desde backend/): python -m app.scripts.explicar_reportes [--fecha-inicio AAAA-MM-DD] [--fecha-fin AAAA-MM-DD]
+#   Sin fechas usa el último día: con rangos que abarcan casi toda la tabla el optimizador puede preferir,
+#   con razón, recorrerla entera
+import argparse
+import asyncio
+import sys
+from datetime import date, timedelta
+from app.config.database import db
+from app.services import reportes
+
+INDICE_FECHA = "idx_movimientos_fecha"
+
+
+def _consultas(fecha_inicio: date, fecha_fin: date) -> dict:  # Las consultas del reporte que filtran por fecha
+    return {
+        "detalle (solo inicio)": reportes.query_movimientos(fecha_inicio, None),
+        "detalle (rango)": reportes.query_movimientos(fecha_inicio, fecha_fin),
+        "resumen (rango)": reportes.query_resumen_movimientos(fecha_inicio, fecha_fin),
+    }
+
+
+def _revisar_plan(plan: list) -> str | None:  # None si el acceso a movimientos_inventario es un range scan por fecha
+    filas = [p for p in plan if p["table"] == "mi"]
+    if not filas:
+        return "movimientos_inventario no aparece en el plan"
+    mi = filas[0]
+    if mi["type"] != "range" or mi["key"] != INDICE_FECHA:
+        return f"acceso type={mi['type']} key={mi['key']} (se esperaba type=range key={INDICE_FECHA})"
+    return None
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="EXPLAIN del filtro de fechas del reporte de movimientos")
+    parser.add_argument("--fecha-inicio", type=date.fromisoformat)
+    parser.add_argument("--fecha-fin", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    fecha_fin = args.fecha_fin or date.today()
+    fecha_inicio = args.fecha_inicio or fecha_fin - timedelta(days=1)
+
+    fallas = 0
+    await db.connect()
+    try:
+        for nombre, (query, values) in _consultas(fecha_inicio, fecha_fin).items():
+            plan = [dict(row) for row in await db.fetch_all(f"EXPLAIN {query}", values)]
+            error = _revisar_plan(plan)
+            if error:
+                fallas += 1
+                print(f"❌ {nombre}: {error}")
+                for p in plan:
+                    print(f"     {p['table']}: type={p['type']} key={p['key']} rows={p['rows']} extra={p['Extra']}")
+            else:
+                mi = next(p for p in plan if p["table"] == "mi")
+                print(f"✅ {nombre}: range scan por {INDICE_FECHA} (~{mi['rows']} filas)")
+    finally:
+        await db.disconnect()
+
+    if fallas:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
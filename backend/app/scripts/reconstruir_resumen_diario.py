@@ -0,0 +1,24 @@
+# Reconstruye movimientos_resumen_diario a partir de movimientos_inventario
+# Uso (desde backend/): python -m app.scripts.reconstruir_resumen_diario [fecha_desde] [fecha_hasta]
+# Las fechas son opcionales (AAAA-MM-DD); sin fechas se recalcula todo el historial
+import asyncio
+import sys
+from datetime import date
+from app.config.database import db
+from app.services.movimiento_resumen import reconstruir_resumen_diario
+
+
+async def main():
+    fecha_desde = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+    fecha_hasta = date.fromisoformat(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    await db.connect()
+    try:
+        await reconstruir_resumen_diario(fecha_desde, fecha_hasta)
+        print("✅ Resumen diario reconstruido")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
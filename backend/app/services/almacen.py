@@ -1,6 +1,7 @@
 from typing import List
 from fastapi import HTTPException
 from app.config.database import db
+from app.services import reporte_cache
 from app.schemas.almacen import AlmacenIn, AlmacenOut
 
 
@@ -92,6 +93,7 @@ async def update_almacen(almacen_id: int, almacen: AlmacenIn, usuario_actual) ->
         """
         values = {**almacen.dict(), "id": almacen_id}
         await db.execute(query=query, values=values)
+        reporte_cache.invalidar_reportes()  # Los reportes muestran el nombre del almacén
         return await get_almacen_by_id(almacen_id)
     except HTTPException:
         raise
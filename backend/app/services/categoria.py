@@ -1,6 +1,7 @@
 from typing import List
 from fastapi import HTTPException
 from app.config.database import db
+from app.services import reporte_cache
 from app.schemas.categoria import CategoriaIn, CategoriaOut
 
 
@@ -120,6 +121,7 @@ async def update_categoria(
         """
         values = {**categoria.dict(), "id": categoria_id}
         await db.execute(query=query, values=values)
+        reporte_cache.invalidar_reportes()  # El inventario general muestra el nombre de la categoría
         return await get_categoria_by_id(categoria_id)
 
     except Exception as e:
@@ -0,0 +1,152 @@
+import asyncio
+import os
+import time
+from typing import List
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.stock_almacen import ConciliacionOut
+from app.services.movimiento_inventario import (
+    bloquear_stock,
+    get_movimientos_by_ids,
+    insertar_movimiento,
+    notificar_movimientos,
+)
+from app.services.movimiento_resumen import sumar_al_resumen
+
+load_dotenv()
+
+CONCILIACION_CONCURRENCIA = int(os.getenv("CONCILIACION_CONCURRENCIA", "4"))  # Almacenes procesados en paralelo
+
+
+async def _conciliar_almacen(almacen_id: int) -> tuple[int, List[dict]]:  # Compara stock_almacen contra el saldo del libro de un almacén
+    async with db.connection() as conn:
+        # Stock y agregado se leen en la misma transacción: ven la misma foto aunque entren movimientos nuevos
+        async with conn.transaction():
+            stock_rows = await conn.fetch_all(
+                query="SELECT fk_producto, cantidad_disponible FROM stock_almacen WHERE fk_almacen = :almacen_id",
+                values={"almacen_id": almacen_id},
+            )
+            stock = {row["fk_producto"]: row["cantidad_disponible"] for row in stock_rows}
+
+            # Efecto neto de los movimientos ya archivados (ver movimiento_archivo)
+            apertura_rows = await conn.fetch_all(
+                query="SELECT fk_producto, cantidad FROM saldos_apertura WHERE fk_almacen = :almacen_id",
+                values={"almacen_id": almacen_id},
+            )
+            apertura = {row["fk_producto"]: row["cantidad"] for row in apertura_rows}
+
+            # Saldo del libro = saldo de apertura + suma de los cambios netos de cada movimiento (sirve para cualquier tipo)
+            query = """
+                SELECT fk_producto, CAST(SUM(cantidad_nueva - cantidad_anterior) AS SIGNED) AS saldo_libro
+                FROM movimientos_inventario
+                WHERE fk_almacen = :almacen_id
+                GROUP BY fk_producto
+            """
+            diferencias = []
+            vistos = set()
+            async for row in conn.iterate(query=query, values={"almacen_id": almacen_id}):
+                fk_producto = row["fk_producto"]
+                vistos.add(fk_producto)
+                stock_actual = stock.get(fk_producto, 0)
+                saldo_libro = apertura.get(fk_producto, 0) + row["saldo_libro"]
+                if stock_actual != saldo_libro:
+                    diferencias.append(_diferencia(almacen_id, fk_producto, stock_actual, saldo_libro))
+
+    # Productos sin movimientos en la tabla caliente: su saldo de libro es el de apertura (o 0)
+    for fk_producto in (stock.keys() | apertura.keys()) - vistos:
+        stock_actual = stock.get(fk_producto, 0)
+        saldo_libro = apertura.get(fk_producto, 0)
+        if stock_actual != saldo_libro:
+            diferencias.append(_diferencia(almacen_id, fk_producto, stock_actual, saldo_libro))
+
+    return len(stock.keys() | apertura.keys() | vistos), diferencias
+
+
+def _diferencia(almacen_id, fk_producto, stock_actual, saldo_libro) -> dict:
+    return {
+        "fk_almacen": almacen_id,
+        "fk_producto": fk_producto,
+        "stock_actual": stock_actual,
+        "saldo_libro": saldo_libro,
+        "diferencia": stock_actual - saldo_libro,
+        "movimiento_id": None,
+    }
+
+
+async def _corregir_almacen(almacen_id: int, diferencias: List[dict], fk_usuario: int):  # Registra un ajuste por cada diferencia para que el libro cierre con el stock
+    claves = [(d["fk_producto"], almacen_id) for d in diferencias]
+    async with db.connection() as conn:
+        async with conn.transaction():
+            stock = await bloquear_stock(conn, claves, crear_faltantes=set(claves))
+            ids = []
+            for d in diferencias:
+                # El stock físico se toma como verdad: el ajuste no lo cambia, solo documenta la diferencia en el libro
+                actual = stock[(d["fk_producto"], almacen_id)]["cantidad_disponible"]
+                d["movimiento_id"] = await insertar_movimiento(
+                    conn,
+                    {
+                        "fk_producto": d["fk_producto"],
+                        "fk_almacen": almacen_id,
+                        "tipo_movimiento": "ajuste",
+                        "cantidad": actual,
+                        "cantidad_anterior": actual - d["diferencia"],
+                        "cantidad_nueva": actual,
+                        "motivo": "Ajuste por conciliación de stock vs. movimientos",
+                        "fk_usuario": fk_usuario,
+                    },
+                )
+                ids.append(d["movimiento_id"])
+            movimientos = await get_movimientos_by_ids(conn, ids)
+            await sumar_al_resumen(conn, movimientos)
+
+    notificar_movimientos(movimientos)
+
+
+async def conciliar_stock(
+    almacen_ids: List[int] | None = None, corregir: bool = False, fk_usuario: int | None = None
+) -> ConciliacionOut:  # Concilia todos (o algunos) almacenes en paralelo y opcionalmente genera los ajustes
+    if corregir and fk_usuario is None:
+        raise ValueError("Para generar ajustes hace falta el usuario que los registra")
+
+    if almacen_ids is None:
+        rows = await db.fetch_all("SELECT id FROM almacenes ORDER BY id")
+        almacen_ids = [row["id"] for row in rows]
+
+    inicio = time.perf_counter()
+    semaforo = asyncio.Semaphore(CONCILIACION_CONCURRENCIA)
+
+    async def procesar(almacen_id):
+        async with semaforo:  # Cada tarea usa su propia conexión del pool
+            revisados, diferencias = await _conciliar_almacen(almacen_id)
+            if corregir and diferencias:
+                await _corregir_almacen(almacen_id, diferencias, fk_usuario)
+            return revisados, diferencias
+
+    resultados = await asyncio.gather(*(procesar(a) for a in almacen_ids))
+    diferencias = [d for _, difs in resultados for d in difs]
+
+    return {
+        "almacenes_revisados": len(almacen_ids),
+        "productos_revisados": sum(revisados for revisados, _ in resultados),
+        "diferencias": diferencias,
+        "ajustes_generados": sum(1 for d in diferencias if d["movimiento_id"]),
+        "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+    }
+
+
+async def conciliar_stock_admin(
+    usuario_actual, almacen_id: int | None = None, corregir: bool = False
+) -> ConciliacionOut:  # POST - Endpoint de conciliación (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para conciliar el stock")
+
+    try:
+        return await conciliar_stock(
+            [almacen_id] if almacen_id is not None else None,
+            corregir=corregir,
+            fk_usuario=usuario_actual["id"],
+        )
+    except Exception as e:
+        print(f"Error al conciliar stock: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al conciliar stock: {e}")
@@ -0,0 +1,262 @@
+import codecs
+import csv
+import json
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.movimiento_inventario import ConteoFisicoOut
+from app.services.movimiento_resumen import sumar_al_resumen
+from app.services.movimiento_inventario import (
+    actualizar_stock,
+    bloquear_stock,
+    get_movimientos_by_ids,
+    insertar_movimiento,
+    notificar_movimientos,
+)
+
+
+# Funciones auxiliares para leer el conteo a medida que llega (sin cargar todo el body en memoria)
+
+
+async def _leer_lineas(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:  # Convierte los chunks del body en líneas de texto
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pendiente = ""
+    async for chunk in chunks:
+        pendiente += decoder.decode(chunk)
+        *lineas, pendiente = pendiente.split("\n")
+        for linea in lineas:
+            yield linea.rstrip("\r")
+    pendiente += decoder.decode(b"", final=True)
+    if pendiente.strip():
+        yield pendiente.rstrip("\r")
+
+
+async def leer_conteo_csv(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:  # CSV con encabezado: codigo o fk_producto, y cantidad
+    encabezado = None
+    async for linea in _leer_lineas(chunks):
+        if not linea.strip():
+            continue
+        valores = next(csv.reader([linea]))
+        if encabezado is None:
+            encabezado = [v.strip().lower() for v in valores]
+            continue
+        yield dict(zip(encabezado, (v.strip() for v in valores)))
+
+
+async def leer_conteo_json(chunks: AsyncIterator[bytes]) -> AsyncIterator:  # Array JSON de objetos, decodificado elemento por elemento (los que no son objeto se reportan como error de línea)
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8-sig")()
+    buffer = ""
+    inicio_array = False
+
+    async for chunk in chunks:
+        buffer += utf8.decode(chunk)
+        while True:
+            buffer = buffer.lstrip()
+            if not inicio_array:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise HTTPException(status_code=400, detail="El conteo debe ser un array JSON")
+                inicio_array = True
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if not buffer or buffer.startswith("]"):
+                break
+            try:
+                objeto, fin = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break  # El objeto todavía no llegó completo: esperar más datos
+            yield objeto
+            buffer = buffer[fin:]
+
+    # Sin el "]" final el body llegó cortado: no se procesa como si fuera el conteo entero (con completo=true pondría en 0 lo que falta)
+    if not inicio_array or buffer.strip() != "]":
+        raise HTTPException(status_code=400, detail="JSON del conteo inválido o incompleto")
+
+
+# CONTEO FÍSICO (cycle count)
+
+
+async def procesar_conteo_fisico(
+    almacen_id: int,
+    lineas: AsyncIterator[dict],
+    usuario_actual,
+    dry_run: bool = False,
+    completo: bool = False,
+    tamano_lote: int = 500,
+    motivo: str | None = None,
+) -> ConteoFisicoOut:  # POST - Compara un conteo físico contra stock_almacen y genera los ajustes
+
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para cargar conteos físicos")
+
+    if tamano_lote <= 0:
+        raise HTTPException(status_code=400, detail="El tamaño de lote debe ser mayor a 0")
+
+    try:
+        almacen = await db.fetch_one(
+            "SELECT id FROM almacenes WHERE id = :id AND activo = true", values={"id": almacen_id}
+        )
+        if not almacen:
+            raise HTTPException(status_code=404, detail="Almacen no encontrado")
+
+        # Una sola lectura del stock del almacén y del catálogo; después todo se compara en memoria
+        # Solo productos activos: los inactivos no se pueden contar, así que tampoco se ponen en 0 con completo=true
+        stock_rows = await db.fetch_all(
+            query="""
+                SELECT sa.fk_producto, sa.cantidad_disponible
+                FROM stock_almacen sa
+                INNER JOIN productos p ON p.id = sa.fk_producto AND p.activo = true
+                WHERE sa.fk_almacen = :almacen_id
+            """,
+            values={"almacen_id": almacen_id},
+        )
+        stock_sistema = {row["fk_producto"]: row["cantidad_disponible"] for row in stock_rows}
+
+        producto_rows = await db.fetch_all("SELECT id, codigo FROM productos WHERE activo = true")
+        id_por_codigo = {row["codigo"]: row["id"] for row in producto_rows}
+        codigo_por_id = {row["id"]: row["codigo"] for row in producto_rows}
+
+        # Se acumula por producto (el mismo producto puede contarse en varias ubicaciones del almacén)
+        contado = {}
+        errores = []
+        lineas_leidas = 0
+        async for numero, linea in _enumerar(lineas):
+            lineas_leidas += 1
+            try:
+                if not isinstance(linea, dict):  # Ej: un número o un string suelto dentro del array JSON
+                    raise ValueError("la línea debe ser un objeto con 'codigo' o 'fk_producto' y 'cantidad'")
+                if linea.get("fk_producto") not in (None, ""):
+                    fk_producto = int(linea["fk_producto"])
+                elif linea.get("codigo") not in (None, ""):
+                    fk_producto = id_por_codigo.get(str(linea["codigo"]))
+                else:
+                    raise ValueError("falta 'codigo' o 'fk_producto'")
+
+                if fk_producto not in codigo_por_id:
+                    raise ValueError("producto inexistente o inactivo")
+
+                cantidad = int(linea.get("cantidad"))
+                if cantidad < 0:
+                    raise ValueError("la cantidad no puede ser negativa")
+            except (TypeError, ValueError) as e:
+                errores.append({"linea": numero, "detalle": str(e)})
+                continue
+
+            contado[fk_producto] = contado.get(fk_producto, 0) + cantidad
+
+        if completo:  # Conteo completo: lo que no se contó se considera en 0
+            for fk_producto in stock_sistema:
+                contado.setdefault(fk_producto, 0)
+
+        diferencias = []
+        faltante = 0
+        sobrante = 0
+        for fk_producto, cantidad_contada in sorted(contado.items()):
+            cantidad_sistema = stock_sistema.get(fk_producto, 0)
+            diferencia = cantidad_contada - cantidad_sistema
+            if diferencia == 0:
+                continue
+            if diferencia < 0:
+                faltante += -diferencia
+            else:
+                sobrante += diferencia
+            diferencias.append(
+                {
+                    "fk_producto": fk_producto,
+                    "codigo": codigo_por_id[fk_producto],
+                    "cantidad_sistema": cantidad_sistema,
+                    "cantidad_contada": cantidad_contada,
+                    "diferencia": diferencia,
+                    "movimiento_id": None,
+                }
+            )
+
+        ajustes_aplicados, error_ajustes = 0, None
+        if not dry_run:
+            ajustes_aplicados, error_ajustes = await _aplicar_ajustes(
+                almacen_id, diferencias, usuario_actual["id"], tamano_lote, motivo
+            )
+
+        return {
+            "fk_almacen": almacen_id,
+            "dry_run": dry_run,
+            "lineas_leidas": lineas_leidas,
+            "productos_contados": len(contado),
+            "productos_con_diferencia": len(diferencias),
+            "unidades_faltantes": faltante,
+            "unidades_sobrantes": sobrante,
+            "diferencias": diferencias,
+            "errores": errores,
+            "ajustes_aplicados": ajustes_aplicados,
+            "error_ajustes": error_ajustes,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al procesar conteo físico: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al procesar el conteo físico. Intente nuevamente.",
+        )
+
+
+async def _enumerar(lineas: AsyncIterator[dict]):
+    numero = 0
+    async for linea in lineas:
+        numero += 1
+        yield numero, linea
+
+
+async def _aplicar_ajustes(almacen_id, diferencias, fk_usuario, tamano_lote, motivo) -> tuple[int, str | None]:  # Escribe los ajustes en transacciones de a tamano_lote
+    # Si un lote falla se corta ahí: los lotes anteriores ya quedaron confirmados (tienen movimiento_id)
+    # y se devuelve cuántos ajustes se aplicaron junto con el error, en lugar de un 500 que los oculte
+    motivo = motivo or "Ajuste por conteo físico"
+    aplicados = 0
+
+    for inicio in range(0, len(diferencias), tamano_lote):
+        lote = diferencias[inicio:inicio + tamano_lote]
+        claves = [(d["fk_producto"], almacen_id) for d in lote]
+
+        try:
+            async with db.connection() as conn:
+                async with conn.transaction():
+                    stock = await bloquear_stock(conn, claves, crear_faltantes=set(claves))
+                    ids = []
+                    for d in lote:
+                        fila = stock[(d["fk_producto"], almacen_id)]
+                        # El ajuste fija la cantidad contada; el anterior se toma de la fila bloqueada por si cambió desde la lectura
+                        movimiento = {
+                            "fk_producto": d["fk_producto"],
+                            "fk_almacen": almacen_id,
+                            "tipo_movimiento": "ajuste",
+                            "cantidad": d["cantidad_contada"],
+                            "cantidad_anterior": fila["cantidad_disponible"],
+                            "cantidad_nueva": d["cantidad_contada"],
+                            "motivo": motivo,
+                            "fk_usuario": fk_usuario,
+                        }
+                        ids.append(await insertar_movimiento(conn, movimiento))
+                        fila["cantidad_disponible"] = d["cantidad_contada"]
+                    await actualizar_stock(conn, stock)
+                    movimientos = await get_movimientos_by_ids(conn, ids)
+                    await sumar_al_resumen(conn, movimientos)
+        except Exception as e:
+            print(f"Error al aplicar ajustes del conteo físico: {e}")
+            return aplicados, (
+                f"Se aplicaron {aplicados} de {len(diferencias)} ajustes; el lote que empieza en el "
+                f"producto {lote[0]['fk_producto']} falló y se revirtió. Los ajustes sin movimiento_id no se aplicaron"
+            )
+
+        # movimiento_id se asigna recién después del commit: solo lo tienen los ajustes que quedaron grabados
+        for d, movimiento_id in zip(lote, ids):
+            d["movimiento_id"] = movimiento_id
+        aplicados += len(lote)
+        notificar_movimientos(movimientos)
+
+    return aplicados, None
@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.movimiento_inventario import MovimientoInventarioIn, MovimientoInventarioOut
+from app.services.movimiento_resumen import sumar_al_resumen
+from app.services.movimiento_inventario import (
+    actualizar_stock,
+    bloquear_stock,
+    get_movimiento_by_id,
+    get_movimientos_by_ids,
+    notificar_movimientos,
+    registrar_movimiento,
+    validar_permiso_movimiento,
+    validar_referencias,
+)
+
+load_dotenv()
+
+IDEMPOTENCIA_TTL_HORAS = int(os.getenv("IDEMPOTENCIA_TTL_HORAS", "24"))
+IDEMPOTENCIA_LRU_CAPACIDAD = int(os.getenv("IDEMPOTENCIA_LRU_CAPACIDAD", "10000"))
+IDEMPOTENCIA_BARRIDO_MINUTOS = int(os.getenv("IDEMPOTENCIA_BARRIDO_MINUTOS", "60"))
+IDEMPOTENCIA_BARRIDO_LOTE = 5000  # Filas por DELETE al limpiar claves vencidas
+
+_lru = OrderedDict()  # (fk_usuario, clave) -> (hash_solicitud, fk_movimiento, expira_en); solo atajo de lectura
+_tarea_barrido: asyncio.Task | None = None
+
+
+def _hash_solicitud(movimiento: MovimientoInventarioIn) -> str:  # Para detectar la misma clave usada con otro contenido
+    return hashlib.sha256(movimiento.model_dump_json().encode()).hexdigest()
+
+
+def _guardar_en_lru(clave_lru, hash_solicitud, fk_movimiento, expira_en):
+    _lru[clave_lru] = (hash_solicitud, fk_movimiento, expira_en)
+    _lru.move_to_end(clave_lru)
+    while len(_lru) > IDEMPOTENCIA_LRU_CAPACIDAD:
+        _lru.popitem(last=False)
+
+
+def _buscar_en_lru(clave_lru) -> tuple[str, int] | None:  # Solo claves ya confirmadas por este proceso; la tabla es la fuente de verdad
+    registro = _lru.get(clave_lru)
+    if not registro:
+        return None
+    hash_solicitud, fk_movimiento, expira_en = registro
+    if expira_en <= time.time():
+        _lru.pop(clave_lru, None)
+        return None
+    _lru.move_to_end(clave_lru)
+    return hash_solicitud, fk_movimiento
+
+
+def _validar_hash(hash_original: str, hash_solicitud: str):
+    if hash_original != hash_solicitud:
+        raise HTTPException(
+            status_code=422,
+            detail="La Idempotency-Key ya se usó con un movimiento distinto",
+        )
+
+
+async def _reservar_clave(conn, fk_usuario: int, clave: str, hash_solicitud: str, expira: datetime) -> dict:  # INSERT de la clave (PK única) o la fila que ya existía
+    # Si la clave existe y está vencida se reemplaza por la reserva nueva; si está vigente no se toca.
+    # Con la PK única, un reintento concurrente queda esperando el lock de la fila hasta que la primera
+    # transacción confirme (ve el movimiento ya registrado) o se deshaga (la reserva pasa a ser suya).
+    # Las asignaciones del UPDATE se evalúan en orden: fecha_expiracion va última para que las
+    # anteriores todavía vean el valor viejo
+    await conn.execute(
+        query="""
+            INSERT INTO idempotency_keys (fk_usuario, clave, hash_solicitud, fk_movimiento, fecha_expiracion)
+            VALUES (:fk_usuario, :clave, :hash_solicitud, NULL, :fecha_expiracion)
+            ON DUPLICATE KEY UPDATE
+                hash_solicitud = IF(fecha_expiracion <= :ahora, VALUES(hash_solicitud), hash_solicitud),
+                fk_movimiento = IF(fecha_expiracion <= :ahora, NULL, fk_movimiento),
+                fecha_creacion = IF(fecha_expiracion <= :ahora, CURRENT_TIMESTAMP, fecha_creacion),
+                fecha_expiracion = IF(fecha_expiracion <= :ahora, VALUES(fecha_expiracion), fecha_expiracion)
+        """,
+        values={
+            "fk_usuario": fk_usuario,
+            "clave": clave,
+            "hash_solicitud": hash_solicitud,
+            "fecha_expiracion": expira,
+            "ahora": datetime.now(),
+        },
+    )
+    # Lectura con lock (no de snapshot) para ver la fila tal como quedó después del INSERT
+    return await conn.fetch_one(
+        query="""
+            SELECT hash_solicitud, fk_movimiento, fecha_expiracion
+            FROM idempotency_keys
+            WHERE fk_usuario = :fk_usuario AND clave = :clave
+            FOR UPDATE
+        """,
+        values={"fk_usuario": fk_usuario, "clave": clave},
+    )
+
+
+async def create_movimiento_idempotente(
+    clave: str, movimiento: MovimientoInventarioIn, usuario_actual
+) -> MovimientoInventarioOut:  # POST - Registra el movimiento una sola vez por Idempotency-Key; los reintentos reciben el movimiento original
+
+    validar_permiso_movimiento(movimiento, usuario_actual)
+
+    clave = clave.strip()
+    if not clave or len(clave) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key inválida")
+
+    clave_lru = (usuario_actual["id"], clave)
+    hash_solicitud = _hash_solicitud(movimiento)
+
+    existente = _buscar_en_lru(clave_lru)
+    if existente:
+        _validar_hash(existente[0], hash_solicitud)
+        return await get_movimiento_by_id(existente[1])
+
+    try:
+        # La reserva de la clave y el movimiento van en la misma transacción: o quedan los dos o ninguno.
+        # Por eso este camino no usa el SP ni el group commit (ver ejecutar_sp_movimiento)
+        creado = None
+        async with db.connection() as conn:
+            async with conn.transaction():
+                expira = datetime.now() + timedelta(hours=IDEMPOTENCIA_TTL_HORAS)
+                reserva = await _reservar_clave(conn, usuario_actual["id"], clave, hash_solicitud, expira)
+
+                if reserva["fk_movimiento"] is not None:  # Otra request ya registró el movimiento con esta clave
+                    _validar_hash(reserva["hash_solicitud"], hash_solicitud)
+                    movimiento_id = reserva["fk_movimiento"]
+                    expira = reserva["fecha_expiracion"]
+                else:
+                    error = (await validar_referencias(conn, [movimiento]))[0]
+                    if error:
+                        raise HTTPException(status_code=400, detail=error)
+
+                    stock = await bloquear_stock(
+                        conn, [(movimiento.fk_producto, movimiento.fk_almacen)], omitir_faltantes=True
+                    )
+                    movimiento_id = await registrar_movimiento(conn, stock, movimiento)
+                    await actualizar_stock(conn, stock)
+
+                    creado = (await get_movimientos_by_ids(conn, [movimiento_id]))[0]
+                    await sumar_al_resumen(conn, [creado])
+                    await conn.execute(
+                        query="""
+                            UPDATE idempotency_keys SET fk_movimiento = :fk_movimiento
+                            WHERE fk_usuario = :fk_usuario AND clave = :clave
+                        """,
+                        values={"fk_movimiento": movimiento_id, "fk_usuario": usuario_actual["id"], "clave": clave},
+                    )
+
+        _guardar_en_lru(clave_lru, hash_solicitud, movimiento_id, expira.timestamp())
+        if creado is None:
+            return await get_movimiento_by_id(movimiento_id)
+
+        notificar_movimientos([creado])
+        return creado
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al procesar movimiento idempotente: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail="Error al procesar el movimiento. Intente nuevamente.",
+        )
+
+
+async def barrer_claves_vencidas() -> int:  # Borra en bloque las claves vencidas; devuelve cuántas tandas hicieron falta
+    ahora = datetime.now()
+    tandas = 0
+    while True:
+        await db.execute(
+            query="DELETE FROM idempotency_keys WHERE fecha_expiracion <= :ahora LIMIT :limite",
+            values={"ahora": ahora, "limite": IDEMPOTENCIA_BARRIDO_LOTE},
+        )
+        tandas += 1
+        quedan = await db.fetch_one(
+            query="SELECT 1 FROM idempotency_keys WHERE fecha_expiracion <= :ahora LIMIT 1",
+            values={"ahora": ahora},
+        )
+        if not quedan:
+            return tandas
+        await asyncio.sleep(0)  # Deja pasar otras requests entre tanda y tanda
+
+
+# Tarea en segundo plano
+
+
+async def _loop_barrido():
+    while True:
+        await asyncio.sleep(IDEMPOTENCIA_BARRIDO_MINUTOS * 60)
+        try:
+            await barrer_claves_vencidas()
+        except Exception as e:
+            print(f"❌Error al limpiar claves de idempotencia: {e}")
+
+
+def iniciar_barrido_idempotencia():
+    global _tarea_barrido
+    _tarea_barrido = asyncio.create_task(_loop_barrido())
+
+
+async def detener_barrido_idempotencia():
+    if _tarea_barrido:
+        _tarea_barrido.cancel()
@@ -0,0 +1,144 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from app.config.database import db
+from app.services import reporte_cache
+
+load_dotenv()
+
+# Horizonte en días: lo más viejo pasa a movimientos_inventario_archivo (0 = la tarea periódica no archiva)
+ARCHIVO_HORIZONTE_DIAS = int(os.getenv("MOVIMIENTOS_ARCHIVO_HORIZONTE_DIAS", "0"))
+ARCHIVO_INTERVALO_MINUTOS = int(os.getenv("MOVIMIENTOS_ARCHIVO_INTERVALO_MINUTOS", "1440"))
+ARCHIVO_LOTE = int(os.getenv("MOVIMIENTOS_ARCHIVO_LOTE", "5000"))  # Rango de ids movido por transacción
+
+_tarea_archivo: asyncio.Task | None = None
+
+
+async def get_corte_archivo(conn=None) -> dict | None:  # Última corrida: hasta qué id y fecha cubren los saldos de apertura
+    row = await (conn or db).fetch_one(
+        """
+        SELECT fecha_corte, ultimo_movimiento_id
+        FROM movimientos_archivo_corridas
+        ORDER BY id DESC
+        LIMIT 1
+        """
+    )
+    return dict(row) if row and row["ultimo_movimiento_id"] else None
+
+
+async def archivar_movimientos(horizonte_dias: int) -> dict:  # Mueve al archivo los movimientos anteriores al horizonte
+    if horizonte_dias < 1:
+        raise ValueError("El horizonte debe ser de al menos 1 día")
+
+    corte = datetime.now() - timedelta(days=horizonte_dias)
+    rango = await db.fetch_one(
+        query="""
+            SELECT COALESCE(MIN(id), 0) AS desde, COALESCE(MAX(id), 0) AS hasta
+            FROM movimientos_inventario
+            WHERE fecha_movimiento < :corte
+        """,
+        values={"corte": corte},
+    )
+    anterior = await get_corte_archivo()
+    resultado = {
+        "movimientos_archivados": 0,
+        "ultimo_movimiento_id": anterior["ultimo_movimiento_id"] if anterior else 0,
+        "fecha_corte": anterior["fecha_corte"] if anterior else None,
+    }
+    if not rango["hasta"]:
+        return resultado
+
+    corrida_id = await db.execute(
+        query="""
+            INSERT INTO movimientos_archivo_corridas (fecha_archivo, fecha_corte, ultimo_movimiento_id)
+            VALUES (:fecha_archivo, :fecha_corte, :ultimo_movimiento_id)
+        """,
+        values={
+            "fecha_archivo": datetime.now(),
+            "fecha_corte": resultado["fecha_corte"],
+            "ultimo_movimiento_id": resultado["ultimo_movimiento_id"],
+        },
+    )
+
+    # Se archiva por rangos de id: los movimientos nuevos siempre tienen ids mayores, así que no compiten con el job
+    for inicio in range(rango["desde"] - 1, rango["hasta"], ARCHIVO_LOTE):
+        values = {"desde": inicio, "hasta": min(inicio + ARCHIVO_LOTE, rango["hasta"])}
+        async with db.connection() as conn:
+            async with conn.transaction():
+                # Saldo de apertura + archivo + borrado en la misma transacción: el libro nunca queda a medias
+                await conn.execute(
+                    query="""
+                        INSERT INTO saldos_apertura (fk_producto, fk_almacen, cantidad)
+                        SELECT fk_producto, fk_almacen, SUM(cantidad_nueva - cantidad_anterior)
+                        FROM movimientos_inventario
+                        WHERE id > :desde AND id <= :hasta
+                        GROUP BY fk_producto, fk_almacen
+                        ON DUPLICATE KEY UPDATE cantidad = cantidad + VALUES(cantidad)
+                    """,
+                    values=values,
+                )
+                lote = await conn.fetch_one(
+                    query="""
+                        SELECT COUNT(*) AS movimientos, MAX(fecha_movimiento) AS fecha_corte
+                        FROM movimientos_inventario
+                        WHERE id > :desde AND id <= :hasta
+                    """,
+                    values=values,
+                )
+                await conn.execute(
+                    query="""
+                        INSERT INTO movimientos_inventario_archivo
+                        SELECT * FROM movimientos_inventario WHERE id > :desde AND id <= :hasta
+                    """,
+                    values=values,
+                )
+                await conn.execute(
+                    query="DELETE FROM movimientos_inventario WHERE id > :desde AND id <= :hasta",
+                    values=values,
+                )
+                await conn.execute(
+                    query="""
+                        UPDATE movimientos_archivo_corridas
+                        SET ultimo_movimiento_id = :hasta,
+                            fecha_corte = GREATEST(COALESCE(fecha_corte, :fecha_lote), :fecha_lote),
+                            movimientos_archivados = movimientos_archivados + :movimientos
+                        WHERE id = :corrida_id
+                    """,
+                    values={
+                        "hasta": values["hasta"],
+                        "fecha_lote": lote["fecha_corte"] or corte,
+                        "movimientos": lote["movimientos"],
+                        "corrida_id": corrida_id,
+                    },
+                )
+
+        resultado["movimientos_archivados"] += lote["movimientos"]
+        reporte_cache.invalidar_reportes()  # El reporte de movimientos ya no incluye los archivados
+        await asyncio.sleep(0)  # Deja pasar otras requests entre lote y lote
+
+    return {**resultado, **(await get_corte_archivo())}
+
+
+# Tarea en segundo plano
+
+
+async def _loop_archivo():
+    while True:
+        await asyncio.sleep(ARCHIVO_INTERVALO_MINUTOS * 60)
+        try:
+            resultado = await archivar_movimientos(ARCHIVO_HORIZONTE_DIAS)
+            print(f"🗄️ {resultado['movimientos_archivados']} movimientos archivados")
+        except Exception as e:
+            print(f"❌Error al archivar movimientos: {e}")
+
+
+def iniciar_archivo_movimientos():
+    global _tarea_archivo
+    if ARCHIVO_HORIZONTE_DIAS > 0:
+        _tarea_archivo = asyncio.create_task(_loop_archivo())
+
+
+async def detener_archivo_movimientos():
+    if _tarea_archivo:
+        _tarea_archivo.cancel()
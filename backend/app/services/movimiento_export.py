@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import date
+from typing import AsyncIterator
+from fastapi import HTTPException
+from app.config.database import db
+from app.services.reportes import query_movimientos
+
+FORMATOS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+COLUMNAS = [
+    "id",
+    "fecha_movimiento",
+    "tipo_movimiento",
+    "codigo_producto",
+    "producto",
+    "almacen",
+    "usuario",
+    "cantidad",
+    "cantidad_anterior",
+    "cantidad_nueva",
+    "motivo",
+    "proveedor",
+]
+
+FILAS_POR_CHUNK = 500  # Cuántas filas se juntan antes de mandar un chunk al cliente
+
+
+def _valor(row, columna):
+    valor = row[columna]
+    return valor.isoformat() if columna == "fecha_movimiento" and valor else valor
+
+
+def _vaciar(buffer: io.StringIO) -> bytes:  # Devuelve lo acumulado y deja el buffer vacío para el próximo chunk
+    contenido = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return contenido
+
+
+async def _stream_csv(rows) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNAS)
+    yield _vaciar(buffer)  # El encabezado sale enseguida, antes de la primera fila
+    pendientes = 0
+
+    async for row in rows:
+        writer.writerow([_valor(row, c) for c in COLUMNAS])
+        pendientes += 1
+        if pendientes >= FILAS_POR_CHUNK:
+            yield _vaciar(buffer)
+            pendientes = 0
+
+    yield _vaciar(buffer)
+
+
+async def _stream_ndjson(rows) -> AsyncIterator[bytes]:
+    lineas = []
+    async for row in rows:
+        lineas.append(json.dumps({c: _valor(row, c) for c in COLUMNAS}, ensure_ascii=False))
+        if len(lineas) >= FILAS_POR_CHUNK:
+            yield ("\n".join(lineas) + "\n").encode()
+            lineas = []
+
+    if lineas:
+        yield ("\n".join(lineas) + "\n").encode()
+
+
+def exportar_movimientos(
+    formato: str, fecha_inicio: date = None, fecha_fin: date = None
+) -> AsyncIterator[bytes]:  # Exporta movimientos en CSV o NDJSON recorriendo el cursor de la BD (memoria constante)
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="El formato debe ser 'csv' o 'ndjson'")
+
+    query, values = query_movimientos(fecha_inicio, fecha_fin)
+    rows = db.iterate(query=query, values=values)
+    return _stream_csv(rows) if formato == "csv" else _stream_ndjson(rows)
@@ -0,0 +1,168 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import AsyncIterator
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.movimiento_inventario import FeedMovimientosOut, MovimientoInventarioOut
+
+FEED_LIMITE_MAXIMO = 1000
+FEED_ESPERA_MAXIMA_SEGUNDOS = 60
+SSE_KEEPALIVE_SEGUNDOS = 15
+
+load_dotenv()
+
+# Los ids se asignan al insertar pero las transacciones commitean en cualquier orden: un lote grande
+# puede tener el id 100 sin confirmar mientras el 101 ya es visible. El feed solo entrega los movimientos
+# "asentados" (ver limite_asentado) y corta en el primero que no lo está, para que el cursor nunca pase por
+# encima de un id todavía sin confirmar
+# Sin permiso PROCESS para leer information_schema.innodb_trx se usa un margen fijo, que tiene que ser mayor
+# que la transacción de movimientos más larga (un /lote o /conteo grande conviene partirlo con tamano_chunk)
+FEED_MARGEN_SEGUNDOS = int(os.getenv("MOVIMIENTOS_FEED_MARGEN_SEGUNDOS", "10"))
+FEED_GUARDA_SEGUNDOS = 2  # Un INSERT que ya tomó su id pero todavía no figura como modificación en innodb_trx
+# El aviso de abajo solo llega a las conexiones de este proceso: los movimientos de otros workers
+# se descubren consultando cada FEED_POLL_SEGUNDOS
+FEED_POLL_SEGUNDOS = float(os.getenv("MOVIMIENTOS_FEED_POLL_SEGUNDOS", "2"))
+
+_sin_innodb_trx = False  # Se probó y no hay permiso: se usa directamente el margen fijo
+
+
+async def limite_asentado(margen_fijo: int = FEED_MARGEN_SEGUNDOS, conn=None) -> datetime:  # Los movimientos con fecha_movimiento anterior a esto no pueden tener un id menor sin confirmar
+    # Un id sin confirmar pertenece a una transacción de escritura abierta, que empezó antes de tomarlo: todo
+    # movimiento con fecha anterior al inicio de la transacción de escritura más vieja (de cualquier worker)
+    # tomó su id antes que cualquier id pendiente. Sin transacciones abiertas el límite es casi NOW()
+    global _sin_innodb_trx
+    ejecutor = conn or db
+    if not _sin_innodb_trx:
+        try:
+            row = await ejecutor.fetch_one(
+                query="""
+                    SELECT LEAST(
+                        NOW() - INTERVAL :guarda SECOND,
+                        COALESCE(
+                            (SELECT MIN(trx_started) FROM information_schema.innodb_trx
+                             WHERE trx_rows_modified > 0 AND trx_mysql_thread_id <> CONNECTION_ID()),
+                            NOW()
+                        )
+                    ) AS limite
+                """,
+                values={"guarda": FEED_GUARDA_SEGUNDOS},
+            )
+            return row["limite"]
+        except Exception as e:
+            _sin_innodb_trx = True
+            print(f"⚠️ Sin acceso a information_schema.innodb_trx ({e}): se usan márgenes fijos para los movimientos nuevos")
+
+    row = await ejecutor.fetch_one(
+        query="SELECT NOW() - INTERVAL :margen SECOND AS limite", values={"margen": margen_fijo}
+    )
+    return row["limite"]
+
+
+# Se reemplaza en cada aviso: los que esperan se despiertan todos juntos y vuelven a consultar desde su cursor
+_evento_nuevos = asyncio.Event()
+
+
+def avisar_movimientos_nuevos() -> None:  # Lo llama notificar_movimientos después de cada commit
+    global _evento_nuevos
+    evento, _evento_nuevos = _evento_nuevos, asyncio.Event()
+    evento.set()
+
+
+async def _esperar_movimientos(evento: asyncio.Event, segundos: float) -> bool:  # True si llegó un aviso antes del timeout
+    try:
+        await asyncio.wait_for(evento.wait(), timeout=segundos)
+        return True
+    except asyncio.TimeoutError:
+        return False
+
+
+async def _leer_desde(cursor: int, limite: int) -> list:
+    # Solo por PK: id > cursor es un range scan sobre el índice primario, barato aunque la tabla sea enorme.
+    # "asentado" se calcula con el reloj de la BD (el mismo que puso fecha_movimiento)
+    query = """
+        SELECT *, fecha_movimiento < :limite_asentado AS asentado
+        FROM movimientos_inventario
+        WHERE id > :cursor
+        ORDER BY id
+        LIMIT :limite
+    """
+    rows = await db.fetch_all(
+        query=query, values={"cursor": cursor, "limite": limite, "limite_asentado": await limite_asentado()}
+    )
+
+    movimientos = []
+    for row in rows:
+        if not row["asentado"]:  # Se corta acá aunque haya ids mayores ya asentados: el cursor no puede saltearlo
+            break
+        movimiento = dict(row)
+        movimiento.pop("asentado")
+        movimientos.append(movimiento)
+    return movimientos
+
+
+async def _leer_con_espera(cursor: int, limite: int, segundos: float) -> list:  # Long-poll: lee hasta que haya movimientos o venza el plazo
+    loop = asyncio.get_running_loop()
+    fin = loop.time() + segundos
+    while True:
+        evento = _evento_nuevos  # Se toma antes de leer: un aviso que llega entre la lectura y la espera no se pierde
+        rows = await _leer_desde(cursor, limite)
+        restante = fin - loop.time()
+        if rows or restante <= 0:
+            return rows
+        await _esperar_movimientos(evento, min(restante, FEED_POLL_SEGUNDOS))
+
+
+def _validar(usuario_actual, cursor: int, limite: int):
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para leer el feed de movimientos")
+    if cursor < 0:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+    if not 1 <= limite <= FEED_LIMITE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"El límite debe estar entre 1 y {FEED_LIMITE_MAXIMO}")
+
+
+async def get_feed_movimientos(
+    usuario_actual, cursor: int = 0, limite: int = 500, espera: int = 0
+) -> FeedMovimientosOut:  # GET - Movimientos con id > cursor; con espera > 0 hace long-poll hasta que haya alguno
+    _validar(usuario_actual, cursor, limite)
+    espera = min(max(espera, 0), FEED_ESPERA_MAXIMA_SEGUNDOS)
+
+    try:
+        rows = await _leer_con_espera(cursor, limite, espera)
+
+        siguiente_cursor = rows[-1]["id"] if rows else cursor
+        return {"movimientos": rows, "siguiente_cursor": siguiente_cursor}
+
+    except Exception as e:
+        print(f"Error al leer el feed de movimientos: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al leer el feed de movimientos: {e}")
+
+
+async def stream_feed_movimientos(
+    usuario_actual, request, cursor: int = 0, limite: int = 500
+) -> AsyncIterator[str]:  # Server-Sent Events: manda cada movimiento nuevo apenas se confirma
+    _validar(usuario_actual, cursor, limite)
+
+    async def eventos():
+        loop = asyncio.get_running_loop()
+        ultimo = cursor
+        ultimo_envio = loop.time()
+        while not await request.is_disconnected():
+            evento = _evento_nuevos  # Antes de leer, igual que en el long-poll
+            rows = await _leer_desde(ultimo, limite)
+            for row in rows:
+                data = MovimientoInventarioOut.model_validate(row).model_dump_json()
+                # El "id" del evento es el cursor: si el cliente se reconecta, lo manda en Last-Event-ID
+                yield f"id: {row['id']}\nevent: movimiento\ndata: {data}\n\n"
+                ultimo = row["id"]
+                ultimo_envio = loop.time()
+
+            if len(rows) < limite:
+                await _esperar_movimientos(evento, FEED_POLL_SEGUNDOS)
+                if loop.time() - ultimo_envio >= SSE_KEEPALIVE_SEGUNDOS:
+                    yield ": keep-alive\n\n"
+                    ultimo_envio = loop.time()
+
+    return eventos()
@@ -0,0 +1,141 @@
+import asyncio
+import os
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.movimiento_inventario import MovimientoInventarioIn, MovimientoInventarioOut
+from app.services.movimiento_resumen import sumar_al_resumen
+from app.services.movimiento_inventario import (
+    actualizar_stock,
+    bloquear_stock,
+    get_movimientos_by_ids,
+    notificar_movimientos,
+    registrar_movimiento,
+    validar_permiso_movimiento,
+    validar_referencias,
+)
+
+load_dotenv()
+
+# Group commit: los movimientos concurrentes sobre el mismo (producto, almacén) se juntan durante unos
+# milisegundos y se aplican con UNA sola adquisición del lock de la fila de stock_almacen.
+# Es opcional (MOVIMIENTOS_GROUP_COMMIT=true): en ese modo el movimiento se calcula en Python y no pasa por el SP
+GROUP_COMMIT_HABILITADO = os.getenv("MOVIMIENTOS_GROUP_COMMIT", "false").lower() == "true"
+GROUP_COMMIT_VENTANA_MS = int(os.getenv("MOVIMIENTOS_GROUP_COMMIT_VENTANA_MS", "5"))
+GROUP_COMMIT_MAX_LOTE = int(os.getenv("MOVIMIENTOS_GROUP_COMMIT_MAX_LOTE", "200"))
+
+_pendientes = {}  # (fk_producto, fk_almacen) -> lista de (movimiento, future) esperando su lote
+_estadisticas = {"movimientos": 0, "lotes": 0, "lote_maximo": 0}
+_tareas = set()  # Referencias a las tareas de flush para que el GC no las corte a mitad de camino
+
+
+def _lanzar(coro):
+    tarea = asyncio.create_task(coro)
+    _tareas.add(tarea)
+    tarea.add_done_callback(_tareas.discard)
+
+
+async def create_movimiento(
+    movimiento: MovimientoInventarioIn, usuario_actual
+) -> MovimientoInventarioOut:  # POST - Igual que create_movimiento, pero agrupando con los concurrentes del mismo SKU
+    validar_permiso_movimiento(movimiento, usuario_actual)
+    return await encolar_movimiento(movimiento)
+
+
+async def encolar_movimiento(movimiento: MovimientoInventarioIn) -> MovimientoInventarioOut:  # Espera a que su lote se aplique y devuelve su propio movimiento
+    clave = (movimiento.fk_producto, movimiento.fk_almacen)
+    future = asyncio.get_running_loop().create_future()
+
+    cola = _pendientes.get(clave)
+    if cola is None:
+        # El primero de la ventana programa el flush; los que llegan después solo se suman a la lista
+        cola = _pendientes[clave] = []
+        _lanzar(_flush_despues_de_ventana(clave))
+    cola.append((movimiento, future))
+
+    if len(cola) >= GROUP_COMMIT_MAX_LOTE:  # Lote lleno: se cierra ya, el próximo empieza una ventana nueva
+        _pendientes.pop(clave, None)
+        _lanzar(_aplicar_lote(cola))
+
+    return await future
+
+
+async def _flush_despues_de_ventana(clave):
+    await asyncio.sleep(GROUP_COMMIT_VENTANA_MS / 1000)
+    cola = _pendientes.pop(clave, None)
+    if cola:
+        await _aplicar_lote(cola)
+
+
+async def _aplicar_lote(cola):  # Aplica todos los movimientos del lote bajo un mismo lock
+    clave = (cola[0][0].fk_producto, cola[0][0].fk_almacen)
+    errores = {}  # indice -> HTTPException de ese movimiento
+    ids = {}  # indice -> id del movimiento creado
+
+    try:
+        async with db.connection() as conn:
+            async with conn.transaction():
+                # Mismos chequeos de existencia que hace el SP en el camino normal
+                movimientos_in = [m for m, _ in cola]
+                for indice, error in enumerate(await validar_referencias(conn, movimientos_in)):
+                    if error:
+                        errores[indice] = HTTPException(status_code=400, detail=error)
+
+                # La fila se bloquea una sola vez; si no existe, la crea el primer movimiento que la necesita,
+                # dentro de su savepoint (si todos fallan no queda una fila vacía en stock_almacen)
+                stock = await bloquear_stock(conn, [clave], omitir_faltantes=True)
+
+                # En orden de llegada: cada uno ve como "anterior" el resultado del previo
+                for indice, (movimiento, _) in enumerate(cola):
+                    if indice in errores:
+                        continue
+                    try:
+                        ids[indice] = await registrar_movimiento(conn, stock, movimiento)
+                    except HTTPException as e:
+                        errores[indice] = e
+                    except Exception as e:
+                        print(f"Error al procesar movimiento en group commit: {e}")
+                        errores[indice] = HTTPException(
+                            status_code=400, detail=f"No se pudo registrar el movimiento: {e}"
+                        )
+
+                await actualizar_stock(conn, stock)  # Una sola escritura de la fila de stock para todo el lote
+                creados = await get_movimientos_by_ids(conn, list(ids.values()))
+                await sumar_al_resumen(conn, creados)
+
+    except Exception as e:
+        print(f"Error al aplicar lote de group commit: {e}")
+        error = e if isinstance(e, HTTPException) else HTTPException(
+            status_code=500, detail="Error al procesar el movimiento. Intente nuevamente."
+        )
+        for _, future in cola:
+            if not future.done():
+                future.set_exception(error)
+        return
+
+    _estadisticas["movimientos"] += len(cola)
+    _estadisticas["lotes"] += 1
+    _estadisticas["lote_maximo"] = max(_estadisticas["lote_maximo"], len(cola))
+
+    notificar_movimientos(creados)
+    por_id = {m["id"]: m for m in creados}
+    for indice, (_, future) in enumerate(cola):
+        if future.done():  # El cliente canceló la request
+            continue
+        if indice in errores:
+            future.set_exception(errores[indice])
+        else:
+            future.set_result(por_id[ids[indice]])
+
+
+def get_metricas(usuario_actual) -> dict:  # GET - Métricas del group commit (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver estas métricas")
+
+    lotes = _estadisticas["lotes"]
+    return {
+        "habilitado": GROUP_COMMIT_HABILITADO,
+        "ventana_ms": GROUP_COMMIT_VENTANA_MS,
+        **_estadisticas,
+        "promedio_por_lote": round(_estadisticas["movimientos"] / lotes, 2) if lotes else 0.0,
+    }
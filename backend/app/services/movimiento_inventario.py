@@ -1,7 +1,20 @@
+import time
+from datetime import datetime
 from typing import List
 from fastapi import HTTPException
 from app.config.database import db
-from app.schemas.movimiento_inventario import MovimientoInventarioIn, MovimientoInventarioOut
+from app.services import reporte_cache, stock_cache
+from app.services.movimiento_resumen import sumar_al_resumen
+from app.services.movimiento_feed import avisar_movimientos_nuevos
+from app.schemas.movimiento_inventario import (
+    LoteMovimientosIn,
+    LoteMovimientosOut,
+    MovimientoFiltros,
+    MovimientoInventarioIn,
+    MovimientoInventarioOut,
+    TransferenciaIn,
+    TransferenciaOut,
+)
 
 
 # Función auxiliar
@@ -27,52 +40,360 @@ async def get_movimiento_by_id(
         raise HTTPException(status_code=500, detail=f"Error al obtener movimiento: {e}")
 
 
+# Funciones auxiliares para procesar movimientos desde Python
+# (se usan cuando hay que aplicar varios movimientos dentro de una misma transacción)
+
+
+def validar_permiso_movimiento(movimiento: MovimientoInventarioIn | TransferenciaIn, usuario_actual):  # Solo admin o el mismo usuario pueden registrar el movimiento
+    if (
+        usuario_actual["rol"] != "admin"
+        and usuario_actual["id"] != movimiento.fk_usuario
+    ):
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para crear un movimiento para otro usuario",
+        )
+
+
+def placeholders(prefijo: str, valores: list) -> tuple[str, dict]:  # Arma ":p0, :p1, ..." para usar en un IN (...)
+    nombres = [f"{prefijo}{i}" for i in range(len(valores))]
+    return ", ".join(f":{n}" for n in nombres), dict(zip(nombres, valores))
+
+
+def calcular_cantidad_nueva(tipo_movimiento: str, cantidad_anterior: int, cantidad: int) -> int:  # Mismas reglas que procesar_movimiento_inventario
+    if cantidad < 0 or (cantidad == 0 and tipo_movimiento != "ajuste"):
+        raise HTTPException(status_code=400, detail="La cantidad debe ser mayor a 0")
+
+    if tipo_movimiento in ("entrada", "devolucion"):
+        return cantidad_anterior + cantidad
+
+    if tipo_movimiento == "salida":
+        if cantidad > cantidad_anterior:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Stock insuficiente: disponible {cantidad_anterior}, solicitado {cantidad}",
+            )
+        return cantidad_anterior - cantidad
+
+    if tipo_movimiento == "ajuste":  # El ajuste fija la cantidad disponible
+        return cantidad
+
+    raise HTTPException(status_code=400, detail=f"Tipo de movimiento inválido: {tipo_movimiento}")
+
+
+async def bloquear_stock(conn, claves, crear_faltantes=(), omitir_faltantes=False) -> dict:  # Bloquea (FOR UPDATE) las filas de stock_almacen indicadas
+    # Se bloquean de a una y SIEMPRE en el mismo orden (fk_producto, fk_almacen):
+    # dos transacciones que tocan las mismas filas nunca se esperan en forma cruzada, así que no hay deadlocks
+    stock = {}
+    for fk_producto, fk_almacen in sorted(set(claves)):
+        query = """
+            SELECT id, cantidad_disponible
+            FROM stock_almacen
+            WHERE fk_producto = :fk_producto AND fk_almacen = :fk_almacen
+            FOR UPDATE
+        """
+        values = {"fk_producto": fk_producto, "fk_almacen": fk_almacen}
+        row = await conn.fetch_one(query=query, values=values)
+
+        if not row:
+            if omitir_faltantes and (fk_producto, fk_almacen) not in crear_faltantes:
+                continue  # Se crea después, si hace falta, dentro del savepoint del movimiento (ver registrar_movimiento)
+            if (fk_producto, fk_almacen) not in crear_faltantes:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"No existe stock del producto {fk_producto} en el almacén {fk_almacen}",
+                )
+            insert_query = """
+                INSERT INTO stock_almacen (fk_producto, fk_almacen, cantidad_disponible, cantidad_reservada)
+                VALUES (:fk_producto, :fk_almacen, 0, 0)
+            """
+            nuevo_id = await conn.execute(query=insert_query, values=values)
+            stock[(fk_producto, fk_almacen)] = {"id": nuevo_id, "cantidad_disponible": 0}
+        else:
+            stock[(fk_producto, fk_almacen)] = dict(row)
+
+    return stock
+
+
+async def insertar_movimiento(conn, values: dict) -> int:  # Inserta la fila del movimiento (el stock se actualiza aparte)
+    values = {"fk_proveedor": None, "motivo": None, **values}
+    columnas = [
+        "fk_producto", "fk_almacen", "tipo_movimiento", "cantidad", "cantidad_anterior",
+        "cantidad_nueva", "motivo", "fk_usuario", "fk_proveedor",
+    ]
+    # fk_transferencia solo la llevan las transferencias (columna de sql/movimientos_transferencia.sql):
+    # el resto de los caminos de escritura no depende de esa migración
+    if values.get("fk_transferencia") is not None:
+        columnas.append("fk_transferencia")
+    query = f"""
+        INSERT INTO movimientos_inventario ({", ".join(columnas)})
+        VALUES ({", ".join(":" + c for c in columnas)})
+    """
+    return await conn.execute(query=query, values={c: values[c] for c in columnas})
+
+
+async def validar_referencias(conn, movimientos: List[MovimientoInventarioIn]) -> List[str | None]:  # Producto, almacén, usuario y proveedor existentes y activos: un error (o None) por movimiento
+    # Son los chequeos de existencia que hace el SP, para los caminos que aplican movimientos desde Python
+    async def activos(tabla: str, ids: set) -> set:
+        if not ids:
+            return set()
+        en, values = placeholders("id", sorted(ids))
+        rows = await conn.fetch_all(
+            query=f"SELECT id FROM {tabla} WHERE activo = true AND id IN ({en})", values=values
+        )
+        return {row["id"] for row in rows}
+
+    productos = await activos("productos", {m.fk_producto for m in movimientos})
+    almacenes = await activos("almacenes", {m.fk_almacen for m in movimientos})
+    usuarios = await activos("usuarios", {m.fk_usuario for m in movimientos})
+    proveedores = await activos("proveedores", {m.fk_proveedor for m in movimientos if m.fk_proveedor is not None})
+
+    errores = []
+    for m in movimientos:
+        if m.fk_producto not in productos:
+            errores.append(f"Producto {m.fk_producto} no encontrado o inactivo")
+        elif m.fk_almacen not in almacenes:
+            errores.append(f"Almacén {m.fk_almacen} no encontrado o inactivo")
+        elif m.fk_usuario not in usuarios:
+            errores.append(f"Usuario {m.fk_usuario} no encontrado o inactivo")
+        elif m.fk_proveedor is not None and m.fk_proveedor not in proveedores:
+            errores.append(f"Proveedor {m.fk_proveedor} no encontrado o inactivo")
+        else:
+            errores.append(None)
+    return errores
+
+
+async def registrar_movimiento(conn, stock: dict, movimiento: MovimientoInventarioIn) -> int:  # Aplica un movimiento con las filas ya bloqueadas en stock (sin el SP)
+    tipo = movimiento.tipo_movimiento.lower()
+    clave = (movimiento.fk_producto, movimiento.fk_almacen)
+    creada = clave not in stock
+
+    try:
+        # Savepoint: si el movimiento falla se deshace entero, incluida la fila de stock que se haya creado para él
+        async with conn.transaction():
+            if creada:
+                if tipo == "salida":
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"No existe stock del producto {clave[0]} en el almacén {clave[1]}",
+                    )
+                stock.update(await bloquear_stock(conn, [clave], crear_faltantes={clave}))
+
+            anterior = stock[clave]["cantidad_disponible"]
+            nueva = calcular_cantidad_nueva(tipo, anterior, movimiento.cantidad)
+            movimiento_id = await insertar_movimiento(
+                conn,
+                {
+                    "fk_producto": movimiento.fk_producto,
+                    "fk_almacen": movimiento.fk_almacen,
+                    "tipo_movimiento": tipo,
+                    "cantidad": movimiento.cantidad,
+                    "cantidad_anterior": anterior,
+                    "cantidad_nueva": nueva,
+                    "motivo": movimiento.motivo,
+                    "fk_usuario": movimiento.fk_usuario,
+                    "fk_proveedor": movimiento.fk_proveedor,
+                },
+            )
+    except Exception:
+        if creada:
+            stock.pop(clave, None)
+        raise
+
+    stock[clave]["cantidad_disponible"] = nueva
+    return movimiento_id
+
+
+async def actualizar_stock(conn, stock: dict) -> None:  # Guarda las cantidades finales de las filas bloqueadas
+    query = "UPDATE stock_almacen SET cantidad_disponible = :cantidad_disponible WHERE id = :id"
+    for fila in stock.values():
+        await conn.execute(
+            query=query,
+            values={"id": fila["id"], "cantidad_disponible": fila["cantidad_disponible"]},
+        )
+
+
+async def ejecutar_sp_movimiento(conn, movimiento: MovimientoInventarioIn) -> tuple[str, int | None]:  # CALL al SP + lectura de sus variables de salida en la MISMA conexión
+    # SUPUESTO NO VERIFICADO: procesar_movimiento_inventario no abre ni confirma su propia transacción
+    # (no hace START TRANSACTION / COMMIT; su código no está en este repo). Las llamadas de acá lo invocan
+    # dentro de conn.transaction() y dan por hecho que el COMMIT/ROLLBACK de esa transacción incluye lo que
+    # hizo el SP. Si el SP confirmara por su cuenta, el movimiento quedaría grabado aunque después falle
+    # algo de la misma transacción (ej: sumar_al_resumen). Por eso lo que necesita atomicidad garantizada
+    # (lote, group commit, idempotencia) aplica los movimientos desde Python con registrar_movimiento
+    query = """
+        CALL procesar_movimiento_inventario(
+            :p_fk_producto,
+            :p_fk_almacen,
+            :p_tipo_movimiento,
+            :p_cantidad,
+            :p_motivo,
+            :p_fk_usuario,
+            :p_fk_proveedor,
+            @p_resultado,
+            @p_nuevo_movimiento_id
+        )
+    """
+    await conn.execute(
+        query=query,
+        values={
+            "p_fk_producto": movimiento.fk_producto,
+            "p_fk_almacen": movimiento.fk_almacen,
+            "p_tipo_movimiento": movimiento.tipo_movimiento.lower(),
+            "p_cantidad": movimiento.cantidad,
+            "p_motivo": movimiento.motivo,
+            "p_fk_usuario": movimiento.fk_usuario,
+            "p_fk_proveedor": movimiento.fk_proveedor,
+        },
+    )
+    result = await conn.fetch_one(
+        "SELECT @p_resultado as resultado, @p_nuevo_movimiento_id as movimiento_id"
+    )
+    return result["resultado"], result["movimiento_id"]
+
+
+def notificar_movimientos(movimientos) -> None:  # Se llama después del commit de cualquier movimiento registrado
+    for movimiento in movimientos:
+        stock_cache.actualizar_desde_movimiento(movimiento)
+    if movimientos:
+        reporte_cache.invalidar_reportes()
+        avisar_movimientos_nuevos()  # Despierta a los clientes del feed (long-poll / SSE)
+
+
+async def get_movimientos_by_ids(conn, ids: List[int]) -> List[dict]:  # Trae varios movimientos respetando el orden de ids
+    if not ids:
+        return []
+    en, values = placeholders("id", ids)
+    rows = await conn.fetch_all(
+        query=f"SELECT * FROM movimientos_inventario WHERE id IN ({en})", values=values
+    )
+    por_id = {row["id"]: row for row in rows}
+    return [por_id[i] for i in ids]
+
+
 # CRUD MOVIMIENTOS INVENTARIO
 
-async def get_all_movimientos(usuario_actual) -> List[dict]: # GET - Trae todos los movimientos de inventario con nombre de usuario
+def armar_cursor_movimientos(row) -> str:  # Cursor de la página siguiente a partir de la última fila de esta
+    return f"{row['fecha_movimiento'].isoformat()}|{row['id']}"
+
+
+def parsear_cursor_movimientos(cursor: str | None) -> tuple[datetime, int] | None:  # El cursor es "fecha_movimiento|id" de la última fila vista
+    if not cursor:
+        return None
+    try:
+        fecha, id = cursor.rsplit("|", 1)
+        return datetime.fromisoformat(fecha), int(id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def filtros_movimientos(filtros: MovimientoFiltros | None, alias: str = "mi") -> tuple[list, dict]:  # Condiciones WHERE de los filtros de movimientos
+    condiciones = []
+    values = {}
+    if filtros is None:
+        return condiciones, values
+
+    for campo in ("fk_producto", "fk_almacen", "fk_proveedor"):
+        valor = getattr(filtros, campo)
+        if valor is not None:
+            condiciones.append(f"{alias}.{campo} = :{campo}")
+            values[campo] = valor
+    if filtros.tipo_movimiento:
+        condiciones.append(f"{alias}.tipo_movimiento = :tipo_movimiento")
+        values["tipo_movimiento"] = filtros.tipo_movimiento.lower()
+    # Comparaciones directas sobre la columna (sin DATE()) para que se use el índice
+    if filtros.fecha_desde:
+        condiciones.append(f"{alias}.fecha_movimiento >= :fecha_desde")
+        values["fecha_desde"] = filtros.fecha_desde
+    if filtros.fecha_hasta:
+        condiciones.append(f"{alias}.fecha_movimiento < :fecha_hasta")
+        values["fecha_hasta"] = filtros.fecha_hasta
+
+    return condiciones, values
+
+
+async def _listar_movimientos(
+    condiciones: list, values: dict, cursor: str | None, limite: int | None
+) -> dict:  # Listado paginado por keyset (fecha_movimiento, id), del más nuevo al más viejo
+    cursor_valores = parsear_cursor_movimientos(cursor)
+    if cursor_valores:
+        condiciones = condiciones + [
+            "(mi.fecha_movimiento < :cursor_fecha OR (mi.fecha_movimiento = :cursor_fecha AND mi.id < :cursor_id))"
+        ]
+        values = {**values, "cursor_fecha": cursor_valores[0], "cursor_id": cursor_valores[1]}
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    limit = ""
+    if limite is not None:
+        limit = "LIMIT :limite"
+        values = {**values, "limite": limite + 1}  # Uno de más para saber si hay página siguiente
+
+    # La página se resuelve primero sobre movimientos_inventario (índices) y el JOIN con usuarios
+    # se hace solo sobre las filas de la página
+    query = f"""
+        SELECT 
+            mi.*,
+            u.nombre AS nombre_usuario
+        FROM (
+            SELECT *
+            FROM movimientos_inventario mi
+            {where}
+            ORDER BY mi.fecha_movimiento DESC, mi.id DESC
+            {limit}
+        ) mi
+        LEFT JOIN usuarios u ON mi.fk_usuario = u.id
+        ORDER BY mi.fecha_movimiento DESC, mi.id DESC
+    """
+    rows = await db.fetch_all(query=query, values=values)
+
+    siguiente_cursor = None
+    if limite is not None and len(rows) > limite:
+        rows = rows[:limite]
+        siguiente_cursor = armar_cursor_movimientos(rows[-1])
+
+    return {"movimientos": rows, "siguiente_cursor": siguiente_cursor}
+
+
+async def get_all_movimientos(
+    usuario_actual,
+    filtros: MovimientoFiltros | None = None,
+    cursor: str | None = None,
+    limite: int | None = None,
+) -> dict: # GET - Trae los movimientos de inventario con nombre de usuario (filtrados y paginados)
     
     if usuario_actual["rol"] != "admin":
         raise HTTPException(status_code=403, detail="No tienes permiso para ver los movimientos de inventario")
     
     try:
-        
-        query = """
-            SELECT 
-                mi.*,
-                u.nombre AS nombre_usuario
-            FROM movimientos_inventario mi
-            LEFT JOIN usuarios u ON mi.fk_usuario = u.id
-            ORDER BY mi.fecha_movimiento DESC
-        """
-        rows = await db.fetch_all(query=query)
-        return rows
+        condiciones, values = filtros_movimientos(filtros)
+        return await _listar_movimientos(condiciones, values, cursor, limite)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error al obtener movimientos: {e}")
         raise HTTPException(
             status_code=500, detail=f"Error al obtener movimientos: {e}"
         )
 
-async def get_movimientos_por_usuario(fk_usuario: int, usuario_actual) -> List[dict]: # GET - Trae todos los movimientos de inventario de un usuario específico con nombre
+async def get_movimientos_por_usuario(
+    fk_usuario: int,
+    usuario_actual,
+    filtros: MovimientoFiltros | None = None,
+    cursor: str | None = None,
+    limite: int | None = None,
+) -> dict: # GET - Trae los movimientos de inventario de un usuario específico con nombre (filtrados y paginados)
    
     if usuario_actual["rol"] != "admin" and usuario_actual["id"] != fk_usuario:  # Solo admin o el mismo usuario pueden ver sus movimientos
         raise HTTPException(status_code=403, detail="No tienes permiso para ver los movimientos de este usuario")
 
     try:
-        
-        query = """
-            SELECT 
-                mi.*,
-                u.nombre AS nombre_usuario
-            FROM movimientos_inventario mi 
-            LEFT JOIN usuarios u ON mi.fk_usuario = u.id
-            WHERE mi.fk_usuario = :fk_usuario 
-            ORDER BY mi.fecha_movimiento DESC
-        """
-        rows = await db.fetch_all(query=query, values={"fk_usuario": fk_usuario})
-        return rows
-        
+        condiciones, values = filtros_movimientos(filtros)
+        condiciones.append("mi.fk_usuario = :fk_usuario")
+        values["fk_usuario"] = fk_usuario
+        return await _listar_movimientos(condiciones, values, cursor, limite)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error al obtener movimientos del usuario {fk_usuario}: {e}")
         raise HTTPException(
@@ -84,63 +405,241 @@ async def create_movimiento(
     movimiento: MovimientoInventarioIn, usuario_actual
 ) -> MovimientoInventarioOut:   # POST - Crea un nuevo movimiento de inventario usando un stored procedure
 
-    # Validación de permiso para crear movimiento
-    if (
-        usuario_actual["rol"] != "admin"
-        and usuario_actual["id"] != movimiento.fk_usuario
-    ):
+    validar_permiso_movimiento(movimiento, usuario_actual)
+
+    try:
+        # El CALL, la lectura de @p_resultado/@p_nuevo_movimiento_id y el SELECT del movimiento van en una
+        # conexión fija y dentro de una transacción: con el pool, otra request no puede pisar las variables de sesión
+        async with db.connection() as conn:
+            async with conn.transaction():
+                resultado, movimiento_id = await ejecutar_sp_movimiento(conn, movimiento)
+
+                # Si el SP retornó un error, lanzar excepción con el mensaje
+                if resultado != "SUCCESS":
+                    raise HTTPException(status_code=400, detail=resultado)
+
+                creado = await conn.fetch_one(
+                    query="SELECT * FROM movimientos_inventario WHERE id = :id",
+                    values={"id": movimiento_id},
+                )
+                await sumar_al_resumen(conn, [creado])
+
+        # Retornar el movimiento creado
+        notificar_movimientos([creado])
+        return creado
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al procesar movimiento: {e}")
         raise HTTPException(
-            status_code=403,
-            detail="No tienes permiso para crear un movimiento para otro usuario",
+            status_code=500,
+            detail="Error al procesar el movimiento. Intente nuevamente.",
         )
 
-    try:
-        # Llamar al stored procedure
-        query = """
-            CALL procesar_movimiento_inventario(
-                :p_fk_producto,
-                :p_fk_almacen,
-                :p_tipo_movimiento,
-                :p_cantidad,
-                :p_motivo,
-                :p_fk_usuario,
-                :p_fk_proveedor,
-                @p_resultado,
-                @p_nuevo_movimiento_id
+
+async def transferir_stock(
+    transferencia: TransferenciaIn, usuario_actual
+) -> TransferenciaOut:  # POST - Transfiere stock entre almacenes (salida + entrada) en una sola transacción
+
+    validar_permiso_movimiento(transferencia, usuario_actual)
+
+    if not transferencia.lineas:
+        raise HTTPException(status_code=400, detail="La transferencia no tiene líneas")
+
+    for linea in transferencia.lineas:
+        if linea.fk_almacen_origen == linea.fk_almacen_destino:
+            raise HTTPException(
+                status_code=400,
+                detail="El almacén de origen y el de destino deben ser distintos",
             )
-        """
+        if linea.cantidad <= 0:
+            raise HTTPException(status_code=400, detail="La cantidad debe ser mayor a 0")
 
-        await db.execute(
-            query=query,
-            values={
-                "p_fk_producto": movimiento.fk_producto,
-                "p_fk_almacen": movimiento.fk_almacen,
-                "p_tipo_movimiento": movimiento.tipo_movimiento.lower(),
-                "p_cantidad": movimiento.cantidad,
-                "p_motivo": movimiento.motivo,
-                "p_fk_usuario": movimiento.fk_usuario,
-                "p_fk_proveedor": movimiento.fk_proveedor,
-            },
+    origenes = [(l.fk_producto, l.fk_almacen_origen) for l in transferencia.lineas]
+    destinos = [(l.fk_producto, l.fk_almacen_destino) for l in transferencia.lineas]
+    # Cada línea como sus dos movimientos, para los mismos chequeos de existencia que el resto de los caminos
+    movimientos_in = [
+        MovimientoInventarioIn(
+            fk_producto=linea.fk_producto,
+            fk_almacen=fk_almacen,
+            tipo_movimiento=tipo,
+            cantidad=linea.cantidad,
+            fk_usuario=transferencia.fk_usuario,
         )
+        for linea in transferencia.lineas
+        for tipo, fk_almacen in (("salida", linea.fk_almacen_origen), ("entrada", linea.fk_almacen_destino))
+    ]
 
-        # Obtener los valores de salida del SP
-        result_query = (
-            "SELECT @p_resultado as resultado, @p_nuevo_movimiento_id as movimiento_id"
-        )
-        result = await db.fetch_one(result_query)
+    try:
+        async with db.connection() as conn:
+            async with conn.transaction():  # Si algo falla se deshace todo: nunca queda la salida sin su entrada
+                # Antes de bloquear: bloquear_stock crea las filas de destino que falten
+                for error in await validar_referencias(conn, movimientos_in):
+                    if error:
+                        raise HTTPException(status_code=400, detail=error)
 
-        # Si el SP retornó un error, lanzar excepción con el mensaje
-        if result["resultado"] != "SUCCESS":
-            raise HTTPException(status_code=400, detail=result["resultado"])
+                stock = await bloquear_stock(conn, origenes + destinos, crear_faltantes=set(destinos))
 
-        # Retornar el movimiento creado
-        return await get_movimiento_by_id(result["movimiento_id"])
+                ids = []
+                for linea in transferencia.lineas:
+                    motivo = (
+                        transferencia.motivo
+                        or f"Transferencia almacén {linea.fk_almacen_origen} -> {linea.fk_almacen_destino}"
+                    )
+                    fk_transferencia = None  # La salida y su entrada quedan enlazadas por el id de la salida (ver valuación)
+                    for tipo, fk_almacen in (
+                        ("salida", linea.fk_almacen_origen),
+                        ("entrada", linea.fk_almacen_destino),
+                    ):
+                        fila = stock[(linea.fk_producto, fk_almacen)]
+                        anterior = fila["cantidad_disponible"]
+                        nueva = calcular_cantidad_nueva(tipo, anterior, linea.cantidad)
+                        fila["cantidad_disponible"] = nueva
+
+                        movimiento_id = await insertar_movimiento(
+                            conn,
+                            {
+                                "fk_producto": linea.fk_producto,
+                                "fk_almacen": fk_almacen,
+                                "tipo_movimiento": tipo,
+                                "cantidad": linea.cantidad,
+                                "cantidad_anterior": anterior,
+                                "cantidad_nueva": nueva,
+                                "motivo": motivo,
+                                "fk_usuario": transferencia.fk_usuario,
+                                "fk_transferencia": fk_transferencia,
+                            },
+                        )
+                        if fk_transferencia is None:
+                            fk_transferencia = movimiento_id
+                            await conn.execute(
+                                query="UPDATE movimientos_inventario SET fk_transferencia = :id WHERE id = :id",
+                                values={"id": movimiento_id},
+                            )
+                        ids.append(movimiento_id)
+
+                await actualizar_stock(conn, stock)
+                movimientos = await get_movimientos_by_ids(conn, ids)
+                await sumar_al_resumen(conn, movimientos)
+
+        notificar_movimientos(movimientos)
+        return {"movimientos": movimientos}
 
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error al procesar movimiento: {e}")
+        print(f"Error al procesar transferencia: {e}")
         raise HTTPException(
             status_code=500,
-            detail="Error al procesar el movimiento. Intente nuevamente.",
+            detail="Error al procesar la transferencia. Intente nuevamente.",
+        )
+
+
+LOTE_MAX_MOVIMIENTOS = 5000  # Tope de líneas por request
+
+
+async def create_movimientos_lote(
+    lote: LoteMovimientosIn, usuario_actual
+) -> LoteMovimientosOut:  # POST - Procesa un lote de movimientos (ej: toda la descarga de un camión) en una o varias transacciones
+
+    if not lote.movimientos:
+        raise HTTPException(status_code=400, detail="El lote no tiene movimientos")
+
+    if len(lote.movimientos) > LOTE_MAX_MOVIMIENTOS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El lote no puede tener más de {LOTE_MAX_MOVIMIENTOS} movimientos",
         )
+
+    if lote.tamano_chunk is not None and lote.tamano_chunk <= 0:
+        raise HTTPException(status_code=400, detail="El tamaño de chunk debe ser mayor a 0")
+
+    # Mismo permiso que en create_movimiento, validado para todas las líneas antes de tocar la BD
+    if usuario_actual["rol"] != "admin" and any(
+        m.fk_usuario != usuario_actual["id"] for m in lote.movimientos
+    ):
+        raise HTTPException(
+            status_code=403,
+            detail="No tienes permiso para crear un movimiento para otro usuario",
+        )
+
+    tamano_chunk = lote.tamano_chunk or len(lote.movimientos)
+    resultados = []
+    inicio = time.perf_counter()
+
+    for desde in range(0, len(lote.movimientos), tamano_chunk):
+        chunk = list(enumerate(lote.movimientos[desde:desde + tamano_chunk], start=desde))
+        resultados.extend(await _procesar_chunk(chunk, lote.atomico))
+
+    duracion = time.perf_counter() - inicio
+    exitosos = sum(1 for r in resultados if r["ok"])
+
+    return {
+        "resultados": resultados,
+        "total": len(resultados),
+        "exitosos": exitosos,
+        "fallidos": len(resultados) - exitosos,
+        "duracion_ms": round(duracion * 1000, 2),
+        "movimientos_por_segundo": round(exitosos / duracion, 2) if duracion > 0 else 0.0,
+    }
+
+
+async def _procesar_chunk(chunk, atomico: bool) -> List[dict]:  # Un chunk = una transacción en una conexión fija
+    # Se aplica desde Python (registrar_movimiento) y no con el SP: así el rollback del chunk está garantizado
+    # aunque el SP hiciera su propio COMMIT, y cada línea usa un savepoint propio
+    resultados = []
+    try:
+        async with db.connection() as conn:
+            transaction = await conn.transaction().start()
+            try:
+                movimientos_in = [movimiento for _, movimiento in chunk]
+                errores = await validar_referencias(conn, movimientos_in)
+                # Las filas existentes se bloquean de entrada y ordenadas (sin deadlocks entre chunks concurrentes)
+                stock = await bloquear_stock(
+                    conn, [(m.fk_producto, m.fk_almacen) for m in movimientos_in], omitir_faltantes=True
+                )
+
+                for (indice, movimiento), error in zip(chunk, errores):
+                    if error:
+                        resultados.append({"indice": indice, "ok": False, "error": error})
+                        continue
+                    try:
+                        movimiento_id = await registrar_movimiento(conn, stock, movimiento)
+                        resultados.append({"indice": indice, "ok": True, "movimiento_id": movimiento_id})
+                    except HTTPException as e:
+                        resultados.append({"indice": indice, "ok": False, "error": e.detail})
+
+                if atomico and any(not r["ok"] for r in resultados):
+                    # Todo o nada: se deshace el chunk y las líneas que habían salido bien quedan sin aplicar
+                    await transaction.rollback()
+                    return [
+                        r if not r["ok"] else {"indice": r["indice"], "ok": False, "error": "Revertido: otra línea del chunk falló"}
+                        for r in resultados
+                    ]
+
+                await actualizar_stock(conn, stock)
+
+                # Una sola consulta para traer todos los movimientos creados del chunk
+                ids = [r["movimiento_id"] for r in resultados if r["ok"]]
+                movimientos = await get_movimientos_by_ids(conn, ids)
+                await sumar_al_resumen(conn, movimientos)
+            except Exception:
+                await transaction.rollback()
+                raise
+            else:
+                await transaction.commit()
+
+        notificar_movimientos(movimientos)
+        por_id = {m["id"]: m for m in movimientos}
+        for r in resultados:
+            if r["ok"]:
+                r["movimiento"] = por_id[r.pop("movimiento_id")]
+        return resultados
+
+    except Exception as e:
+        print(f"Error al procesar lote de movimientos: {e}")
+        return [
+            {"indice": indice, "ok": False, "error": "Error al procesar el movimiento. Intente nuevamente."}
+            for indice, _ in chunk
+        ]
@@ -0,0 +1,157 @@
+from datetime import date
+from typing import List
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.movimiento_inventario import ResumenMovimientosOut
+
+
+# Expresión SQL que lleva cada fecha al inicio de su período
+PERIODOS = {
+    "dia": "r.fecha",
+    "semana": "DATE_SUB(r.fecha, INTERVAL WEEKDAY(r.fecha) DAY)",  # Lunes de la semana
+    "mes": "DATE_SUB(r.fecha, INTERVAL DAYOFMONTH(r.fecha) - 1 DAY)",  # Primer día del mes
+}
+
+
+async def sumar_al_resumen(conn, movimientos) -> None:  # Suma los movimientos nuevos al resumen diario, en la misma transacción que los crea
+    totales = {}
+    for m in movimientos:
+        clave = (m["fecha_movimiento"].date(), m["fk_producto"], m["fk_almacen"], m["tipo_movimiento"])
+        cantidad, total, neto = totales.get(clave, (0, 0, 0))
+        totales[clave] = (
+            cantidad + 1,
+            total + m["cantidad"],
+            neto + m["cantidad_nueva"] - m["cantidad_anterior"],
+        )
+
+    if not totales:
+        return
+
+    query = """
+        INSERT INTO movimientos_resumen_diario (
+            fecha, fk_producto, fk_almacen, tipo_movimiento, cantidad_movimientos, cantidad_total, cambio_neto
+        )
+        VALUES (:fecha, :fk_producto, :fk_almacen, :tipo_movimiento, :cantidad_movimientos, :cantidad_total, :cambio_neto)
+        ON DUPLICATE KEY UPDATE
+            cantidad_movimientos = cantidad_movimientos + VALUES(cantidad_movimientos),
+            cantidad_total = cantidad_total + VALUES(cantidad_total),
+            cambio_neto = cambio_neto + VALUES(cambio_neto)
+    """
+    await conn.execute_many(
+        query=query,
+        values=[
+            {
+                "fecha": fecha,
+                "fk_producto": fk_producto,
+                "fk_almacen": fk_almacen,
+                "tipo_movimiento": tipo,
+                "cantidad_movimientos": cantidad,
+                "cantidad_total": total,
+                "cambio_neto": neto,
+            }
+            for (fecha, fk_producto, fk_almacen, tipo), (cantidad, total, neto) in totales.items()
+        ],
+    )
+
+
+async def reconstruir_resumen_diario(fecha_desde: date | None = None, fecha_hasta: date | None = None) -> None:  # Recalcula el resumen desde movimientos_inventario (y su archivo)
+    condicion_resumen = ""
+    condicion_movimientos = ""  # Mismo rango como timestamps, para usar el índice de fecha_movimiento
+    values = {}
+    if fecha_desde:
+        condicion_resumen += " AND fecha >= :fecha_desde"
+        condicion_movimientos += " AND fecha_movimiento >= :fecha_desde"
+        values["fecha_desde"] = fecha_desde
+    if fecha_hasta:
+        condicion_resumen += " AND fecha <= :fecha_hasta"
+        condicion_movimientos += " AND fecha_movimiento < DATE_ADD(:fecha_hasta, INTERVAL 1 DAY)"
+        values["fecha_hasta"] = fecha_hasta
+
+    async with db.connection() as conn:
+        async with conn.transaction():
+            await conn.execute(
+                query=f"DELETE FROM movimientos_resumen_diario WHERE 1=1 {condicion_resumen}", values=values
+            )
+            await conn.execute(
+                query=f"""
+                    INSERT INTO movimientos_resumen_diario (
+                        fecha, fk_producto, fk_almacen, tipo_movimiento, cantidad_movimientos, cantidad_total, cambio_neto
+                    )
+                    SELECT
+                        DATE(fecha_movimiento),
+                        fk_producto,
+                        fk_almacen,
+                        tipo_movimiento,
+                        COUNT(*),
+                        SUM(cantidad),
+                        SUM(cantidad_nueva - cantidad_anterior)
+                    FROM (
+                        SELECT fecha_movimiento, fk_producto, fk_almacen, tipo_movimiento, cantidad, cantidad_anterior, cantidad_nueva
+                        FROM movimientos_inventario
+                        WHERE 1=1 {condicion_movimientos}
+                        UNION ALL
+                        SELECT fecha_movimiento, fk_producto, fk_almacen, tipo_movimiento, cantidad, cantidad_anterior, cantidad_nueva
+                        FROM movimientos_inventario_archivo
+                        WHERE 1=1 {condicion_movimientos}
+                    ) m
+                    GROUP BY DATE(fecha_movimiento), fk_producto, fk_almacen, tipo_movimiento
+                """,
+                values=values,
+            )
+
+
+async def get_resumen_movimientos(
+    granularidad: str,
+    fecha_desde: date | None = None,
+    fecha_hasta: date | None = None,
+    fk_producto: int | None = None,
+    fk_almacen: int | None = None,
+    tipo_movimiento: str | None = None,
+) -> List[ResumenMovimientosOut]:  # GET - Serie por día, semana o mes leída del resumen (no de la tabla de movimientos)
+    if granularidad not in PERIODOS:
+        raise HTTPException(
+            status_code=400, detail="La granularidad debe ser 'dia', 'semana' o 'mes'"
+        )
+
+    try:
+        condiciones = []
+        values = {}
+        if fecha_desde:
+            condiciones.append("r.fecha >= :fecha_desde")
+            values["fecha_desde"] = fecha_desde
+        if fecha_hasta:
+            condiciones.append("r.fecha <= :fecha_hasta")
+            values["fecha_hasta"] = fecha_hasta
+        if fk_producto is not None:
+            condiciones.append("r.fk_producto = :fk_producto")
+            values["fk_producto"] = fk_producto
+        if fk_almacen is not None:
+            condiciones.append("r.fk_almacen = :fk_almacen")
+            values["fk_almacen"] = fk_almacen
+        if tipo_movimiento:
+            condiciones.append("r.tipo_movimiento = :tipo_movimiento")
+            values["tipo_movimiento"] = tipo_movimiento.lower()
+
+        where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+        periodo = PERIODOS[granularidad]
+        query = f"""
+            SELECT
+                {periodo} AS periodo,
+                r.fk_producto,
+                r.fk_almacen,
+                r.tipo_movimiento,
+                CAST(SUM(r.cantidad_movimientos) AS SIGNED) AS cantidad_movimientos,
+                CAST(SUM(r.cantidad_total) AS SIGNED) AS cantidad_total,
+                CAST(SUM(r.cambio_neto) AS SIGNED) AS cambio_neto
+            FROM movimientos_resumen_diario r
+            {where}
+            GROUP BY periodo, r.fk_producto, r.fk_almacen, r.tipo_movimiento
+            ORDER BY periodo, r.fk_producto, r.fk_almacen, r.tipo_movimiento
+        """
+        return await db.fetch_all(query=query, values=values)
+
+    except Exception as e:
+        print(f"Error al obtener resumen de movimientos: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al obtener el resumen de movimientos: {e}"
+        )
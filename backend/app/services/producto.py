@@ -1,6 +1,7 @@
 from typing import List
 from fastapi import HTTPException
 from app.config.database import db
+from app.services import reporte_cache, stock_cache
 from app.schemas.producto import ProductoIn, ProductoOut
 
 
@@ -198,7 +199,21 @@ async def update_producto(
             WHERE id = :id
         """
         values = {**producto.dict(), "id": producto_id}
-        await db.execute(query=query, values=values)
+        async with db.connection() as conn:
+            async with conn.transaction():
+                # Si cambia el precio de compra se guarda el anterior y hasta cuándo rigió (costo de las entradas en la valuación)
+                await conn.execute(
+                    query="""
+                        INSERT INTO productos_precios_compra (fk_producto, precio_compra, fecha_hasta)
+                        SELECT id, precio_compra, NOW()
+                        FROM productos
+                        WHERE id = :id AND precio_compra <> :precio_compra
+                    """,
+                    values={"id": producto_id, "precio_compra": producto.precio_compra},
+                )
+                await conn.execute(query=query, values=values)
+        stock_cache.invalidar_producto(producto_id)  # El stock cacheado incluye nombre y código del producto
+        reporte_cache.invalidar_reportes()
         return await get_producto_by_id(producto_id)
 
     except Exception as e:
@@ -224,6 +239,7 @@ async def delete_producto(
     try:
         query = "UPDATE productos SET activo = false WHERE id = :id"
         await db.execute(query=query, values={"id": id})
+        reporte_cache.invalidar_reportes()  # Los reportes solo muestran productos activos
         return {"message": f"Producto con id {id} eliminado correctamente"}
 
     except Exception as e:
@@ -249,6 +265,7 @@ async def restore_producto(
     try:
         query = "UPDATE productos SET activo = true WHERE id = :id"
         await db.execute(query=query, values={"id": id})
+        reporte_cache.invalidar_reportes()
         return {"message": f"Producto con id {id} restaurado correctamente"}
 
     except Exception as e:
@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+
+load_dotenv()
+
+# Caché en disco (por proceso) de los reportes ya generados.
+# La clave incluye una "versión de datos" que suben las escrituras de movimientos, stock y catálogo:
+# mientras no cambie nada, el mismo reporte se sirve desde disco sin volver a consultar ni armar el PDF.
+# La versión tiene una parte local (exacta para las escrituras de este proceso) y una compartida en la tabla
+# reportes_version (sql/reportes_version.sql), que cada proceso sube al invalidar y lee antes de servir un reporte:
+# así una escritura atendida por otro worker también invalida los PDF de este.
+# La versión compartida se sube como mucho una vez cada VERSION_INTERVALO_SEGUNDOS por proceso (la fila es una sola
+# y cada UPDATE la bloquea hasta el commit): una escritura atendida por otro worker puede tardar ese intervalo
+# en invalidar los PDF de este.
+# Es opcional: se activa con REPORTES_CACHE_HABILITADO=true
+CACHE_HABILITADO = os.getenv("REPORTES_CACHE_HABILITADO", "false").lower() == "true"
+CACHE_DIRECTORIO = os.getenv("REPORTES_CACHE_DIRECTORIO", os.path.join(tempfile.gettempdir(), "inventario_reportes"))
+CACHE_MAX_MB = int(os.getenv("REPORTES_CACHE_MAX_MB", "200"))  # Tamaño total máximo de los archivos cacheados
+CACHE_TTL_SEGUNDOS = int(os.getenv("REPORTES_CACHE_TTL_SEGUNDOS", "3600"))  # Red de seguridad para cambios hechos por fuera de la API
+VERSION_INTERVALO_SEGUNDOS = float(os.getenv("REPORTES_VERSION_INTERVALO_SEGUNDOS", "1"))
+
+_version_datos = 0  # Invalidaciones hechas por este proceso
+_version_compartida = 0  # Última versión leída de reportes_version (la suben todos los procesos)
+_publicaciones = set()  # Tareas que suben la versión compartida (referencia para que no las recolecte el GC)
+_publicacion_pendiente: asyncio.Task | None = None  # Publicación ya programada: cubre todas las invalidaciones hasta que corra
+_ultima_publicacion = 0.0
+_compartir = CACHE_HABILITADO  # Si se mantiene la versión compartida (también la usan los reportes programados)
+
+
+def compartir_version():  # Activa la versión compartida aunque la caché esté deshabilitada
+    global _compartir
+    _compartir = True
+
+
+def invalidar_reportes():  # Lo llaman las escrituras que cambian el contenido de algún reporte
+    global _version_datos, _publicacion_pendiente
+    _version_datos += 1
+    if not _compartir or _publicacion_pendiente is not None:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:  # Fuera de un event loop no hay a quién avisar
+        return
+    tarea = _publicacion_pendiente = loop.create_task(_publicar_invalidacion())
+    _publicaciones.add(tarea)
+    tarea.add_done_callback(_publicaciones.discard)
+
+
+async def _publicar_invalidacion():  # Sube la versión compartida para que los demás procesos dejen de servir sus copias
+    global _publicacion_pendiente, _ultima_publicacion
+    try:
+        espera = _ultima_publicacion + VERSION_INTERVALO_SEGUNDOS - time.monotonic()
+        if espera > 0:
+            await asyncio.sleep(espera)
+        # Desde acá las invalidaciones nuevas programan otra publicación (no las cubre este UPDATE si llegan durante él)
+        _publicacion_pendiente = None
+        _ultima_publicacion = time.monotonic()
+        await db.execute("UPDATE reportes_version SET version = version + 1 WHERE id = 1")
+    except Exception as e:  # Queda el TTL como red de seguridad
+        print(f"Error al publicar la invalidación de reportes: {e}")
+    finally:
+        if _publicacion_pendiente is asyncio.current_task():  # Cancelada durante la espera
+            _publicacion_pendiente = None
+
+
+async def sincronizar_version():  # Lee la versión compartida; llamarla antes de version_datos() al servir o generar
+    global _version_compartida
+    if not _compartir:
+        return
+    try:
+        row = await db.fetch_one("SELECT version FROM reportes_version WHERE id = 1")
+        if row:
+            _version_compartida = row["version"]
+    except Exception as e:  # Se sigue con la última versión conocida
+        print(f"Error al leer la versión de los reportes: {e}")
+
+
+def version_datos() -> tuple:
+    return _version_compartida, _version_datos
+
+
+def version_compartida() -> int:  # La única parte de la versión que se puede comparar entre procesos
+    return _version_compartida
+
+
+class CacheReportes:
+    # clave -> archivo en disco, con desalojo LRU por tamaño total (no por cantidad de entradas)
+
+    def __init__(self, directorio: str, max_bytes: int, ttl_segundos: int):
+        self.directorio = directorio
+        self.max_bytes = max_bytes
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()  # clave -> {"ruta", "tamano", "creado_en"}
+        self._bytes = 0
+        self._preparado = False
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def _preparar(self):  # Crea el directorio y borra lo que haya quedado de una ejecución anterior
+        if self._preparado:
+            return
+        os.makedirs(self.directorio, exist_ok=True)
+        for nombre in os.listdir(self.directorio):
+            if nombre.endswith((".cache", ".envio")):  # Entradas y copias de envío que no se llegaron a borrar
+                os.remove(os.path.join(self.directorio, nombre))
+        _borrar_directorios_huerfanos(os.path.dirname(self.directorio))
+        self._preparado = True
+
+    def obtener(self, clave) -> str | None:  # Ruta del archivo cacheado o None
+        entrada = self._entradas.get(clave)
+        if entrada is None or time.monotonic() - entrada["creado_en"] > self.ttl_segundos:
+            if entrada is not None:
+                self._quitar(clave)
+            self.fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)
+        self.aciertos += 1
+        return entrada["ruta"]
+
+    def guardar(self, clave, archivo: str) -> str | None:  # Mueve el archivo generado a la caché; None si no entra
+        tamano = os.path.getsize(archivo)
+        if tamano > self.max_bytes:  # No entra ni vaciando la caché
+            return None
+
+        self._preparar()
+        ruta = os.path.join(self.directorio, hashlib.sha256(repr(clave).encode()).hexdigest() + ".cache")
+        temporal = ruta + ".tmp"
+        shutil.move(archivo, temporal)  # Mismo disco: es solo un rename
+        os.replace(temporal, ruta)  # Quien esté leyendo la versión anterior no ve un archivo a medio escribir
+
+        self._quitar(clave, borrar=False)
+        self._entradas[clave] = {"ruta": ruta, "tamano": tamano, "creado_en": time.monotonic()}
+        self._bytes += tamano
+
+        while self._bytes > self.max_bytes:
+            self._quitar(next(iter(self._entradas)))
+            self.desalojos += 1
+        return ruta
+
+    def olvidar(self, clave):  # Saca la entrada sin tocar el archivo (ya no existe)
+        self._quitar(clave, borrar=False)
+
+    def _quitar(self, clave, borrar: bool = True):
+        entrada = self._entradas.pop(clave, None)
+        if entrada is None:
+            return
+        self._bytes -= entrada["tamano"]
+        if borrar:
+            try:
+                os.remove(entrada["ruta"])
+            except FileNotFoundError:
+                pass
+
+    def metricas(self) -> dict:
+        lecturas = self.aciertos + self.fallos
+        return {
+            "habilitado": CACHE_HABILITADO,
+            "version_datos": {"compartida": _version_compartida, "local": _version_datos},
+            "entradas": len(self._entradas),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_segundos": self.ttl_segundos,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / lecturas, 4) if lecturas else 0.0,
+            "desalojos": self.desalojos,
+        }
+
+
+def _proceso_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)  # No manda ninguna señal: solo verifica que el proceso exista
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Existe, pero es de otro usuario
+        return True
+    return True
+
+
+def _borrar_directorios_huerfanos(directorio: str):  # Subdirectorios de procesos que ya terminaron (reinicios anteriores)
+    try:
+        nombres = os.listdir(directorio)
+    except FileNotFoundError:
+        return
+    for nombre in nombres:
+        if not nombre.isdigit() or int(nombre) == os.getpid() or _proceso_vivo(int(nombre)):
+            continue
+        shutil.rmtree(os.path.join(directorio, nombre), ignore_errors=True)
+
+
+# Cada proceso en su subdirectorio: al arrancar, un worker no borra los archivos de los otros
+# (los de procesos que ya no existen sí, ver _borrar_directorios_huerfanos)
+cache_reportes = CacheReportes(
+    os.path.join(CACHE_DIRECTORIO, str(os.getpid())), CACHE_MAX_MB * 1024 * 1024, CACHE_TTL_SEGUNDOS
+)
+_en_curso = {}  # clave -> tarea generando ese reporte, para que pedidos simultáneos lo armen una sola vez
+
+
+def clave_params(params: dict) -> tuple:  # Forma canónica de los parámetros de un reporte (para usarlos como clave)
+    return tuple(sorted((k, str(v)) for k, v in params.items() if v is not None))
+
+
+def _clave(tipo: str, params: dict, version: tuple):
+    return (tipo, clave_params(params), version)
+
+
+def copia_propia(ruta: str) -> str:  # Copia (hard link si se puede) que el que la recibe puede borrar sin afectar a nadie
+    # Un hard link no copia datos, y el contenido sigue en disco aunque la caché o la retención borren el original.
+    # Van al directorio de este proceso, que se limpia al arrancar si alguna quedó sin borrar
+    cache_reportes._preparar()
+    copia = os.path.join(cache_reportes.directorio, f"{uuid.uuid4().hex}.envio")
+    try:
+        os.link(ruta, copia)
+    except OSError:
+        shutil.copyfile(ruta, copia)
+    return copia
+
+
+async def obtener_o_generar(tipo: str, params: dict, generar) -> str:  # Ruta de un PDF propio: quien la recibe la borra después de enviarla
+    if not CACHE_HABILITADO:
+        return await generar()
+
+    await sincronizar_version()
+    clave = _clave(tipo, params, version_datos())  # Versión leída ANTES de consultar: si algo cambia en el medio, esta clave ya queda vieja
+    ruta = cache_reportes.obtener(clave)
+    if ruta:
+        try:  # Nunca la ruta de la caché: se puede desalojar mientras se envía
+            return copia_propia(ruta)
+        except FileNotFoundError:  # Alguien borró el archivo por fuera de la caché: se vuelve a generar
+            cache_reportes.olvidar(clave)
+
+    entrada = _en_curso.get(clave)
+    if entrada is None:
+        entrada = _en_curso[clave] = {"tarea": asyncio.ensure_future(_generar_y_guardar(clave, generar)), "esperando": 0}
+        entrada["tarea"].add_done_callback(lambda _: _en_curso.pop(clave, None))
+        entrada["tarea"].add_done_callback(lambda tarea: _soltar(entrada))
+
+    entrada["esperando"] += 1
+    try:
+        ruta = await asyncio.shield(entrada["tarea"])  # Si un cliente se desconecta, el reporte sigue armándose para los demás
+        return copia_propia(ruta)
+    finally:
+        entrada["esperando"] -= 1
+        _soltar(entrada)
+
+
+def _soltar(entrada):  # El PDF generado se borra cuando todos los que lo esperaban ya tienen su copia
+    tarea = entrada["tarea"]
+    if entrada["esperando"] or not tarea.done() or tarea.cancelled() or tarea.exception():
+        return
+    ruta = tarea.result()
+    if os.path.exists(ruta):
+        os.remove(ruta)
+
+
+async def _generar_y_guardar(clave, generar) -> str:  # PDF generado; la caché guarda su propia copia, que puede desalojar cuando quiera
+    archivo = await generar()
+    copia = copia_propia(archivo)
+    if not cache_reportes.guardar(clave, copia):  # No entra en la caché
+        os.remove(copia)
+    return archivo
+
+
+def get_metricas(usuario_actual) -> dict:  # GET - Métricas de la caché de reportes (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver estas métricas")
+    return cache_reportes.metricas()
@@ -0,0 +1,250 @@
+import csv
+import io
+import re
+import zipfile
+from datetime import datetime
+from decimal import Decimal
+from typing import AsyncIterator
+from xml.sax.saxutils import escape
+from fastapi import HTTPException
+from app.config.database import db
+import app.services.reportes as reportes
+
+# CSV y XLSX de los reportes: mismas consultas que los PDF, recorridas con el cursor de la BD
+# y escritas fila por fila (memoria constante, sin armado de páginas)
+FORMATOS = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+FILAS_POR_CHUNK = 500  # Cuántas filas se juntan antes de mandar un chunk al cliente
+
+# Columnas de cada reporte: (columna de la consulta, título)
+COLUMNAS = {
+    "stock-bajo": [
+        ("codigo", "Código"),
+        ("producto", "Producto"),
+        ("almacen", "Almacén"),
+        ("stock_actual", "Stock Actual"),
+        ("stock_minimo", "Mínimo"),
+        ("deficit", "Déficit"),
+        ("estado", "Estado"),
+    ],
+    "inventario-general": [
+        ("codigo", "Código"),
+        ("producto", "Producto"),
+        ("categoria", "Categoría"),
+        ("almacen", "Almacén"),
+        ("disponible", "Disponible"),
+        ("reservada", "Reservada"),
+        ("total", "Total"),
+        ("precio", "Precio"),
+        ("valor_stock", "Valor"),
+    ],
+    "movimientos": [
+        ("fecha_movimiento", "Fecha"),
+        ("tipo_movimiento", "Tipo"),
+        ("codigo_producto", "Código"),
+        ("producto", "Producto"),
+        ("almacen", "Almacén"),
+        ("usuario", "Usuario"),
+        ("cantidad", "Cantidad"),
+        ("cantidad_anterior", "Stock Anterior"),
+        ("cantidad_nueva", "Stock Nuevo"),
+        ("motivo", "Motivo"),
+        ("proveedor", "Proveedor"),
+    ],
+}
+
+
+class SalidaZip:  # Destino sin seek para zipfile: junta lo escrito hasta que el generador lo manda al cliente
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos) -> int:
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self) -> bytes:
+        datos = b"".join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def _consulta_resumen(tipo: str, params: dict) -> tuple[str, dict]:  # Query de resumen del reporte (la misma del PDF)
+    almacen_id = params.get("almacen_id")
+    if tipo == "stock-bajo":
+        return reportes.query_resumen_stock_bajo(almacen_id)
+    if tipo == "inventario-general":
+        return reportes.query_resumen_inventario_general(almacen_id)
+    return reportes.query_resumen_movimientos(params.get("fecha_inicio"), params.get("fecha_fin"), almacen_id)
+
+
+def _consulta(tipo: str, params: dict) -> tuple[str, dict]:  # Query de detalle del reporte (la misma del PDF)
+    almacen_id = params.get("almacen_id")
+    if tipo == "stock-bajo":
+        return reportes.query_stock_bajo(almacen_id)
+    if tipo == "inventario-general":
+        return reportes.query_inventario_general(almacen_id)
+    return reportes.query_movimientos(params.get("fecha_inicio"), params.get("fecha_fin"), almacen_id)
+
+
+async def exportar_reporte(tipo: str, params: dict, formato: str) -> tuple[AsyncIterator[bytes], str]:  # GET - Reporte en CSV o XLSX (streaming) y su nombre de descarga
+    if tipo not in COLUMNAS:
+        raise HTTPException(status_code=400, detail=f"Tipo de reporte inválido. Opciones: {', '.join(COLUMNAS)}")
+    if formato not in FORMATOS:
+        raise HTTPException(status_code=400, detail="El formato debe ser 'pdf', 'csv' o 'xlsx'")
+
+    params = {k: v for k, v in params.items() if k != "solo_resumen"}  # La planilla es siempre el detalle
+    query, values = _consulta(tipo, params)  # Valida los parámetros antes de empezar a responder
+
+    # Mismas validaciones que el PDF (después del primer byte ya no se puede devolver un error):
+    # 404 si el almacén no existe o si el reporte no tiene datos
+    await reportes.get_nombre_almacen(params.get("almacen_id"))
+    try:
+        resumen_rows = [dict(row) for row in await db.fetch_all(*_consulta_resumen(tipo, params))]
+    except Exception as e:
+        print(f"Error al exportar reporte: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al generar el reporte: {str(e)}")
+    reportes.armar_resumen(tipo, resumen_rows)
+
+    rows = db.iterate(query=query, values=values)
+    columnas = COLUMNAS[tipo]
+    contenido = _stream_csv(rows, columnas) if formato == "csv" else _stream_xlsx(rows, columnas)
+    return contenido, reportes.nombre_archivo_reporte(tipo, params, extension=formato)
+
+
+# CSV
+
+
+def _valor_csv(valor):
+    return valor.isoformat() if isinstance(valor, datetime) else valor
+
+
+def _vaciar(buffer: io.StringIO) -> bytes:  # Devuelve lo acumulado y deja el buffer vacío para el próximo chunk
+    contenido = buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+    return contenido
+
+
+async def _stream_csv(rows, columnas) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    buffer.write("\ufeff")  # BOM para que Excel abra los acentos bien
+    writer = csv.writer(buffer)
+    writer.writerow([titulo for _, titulo in columnas])
+    yield _vaciar(buffer)
+    pendientes = 0
+
+    async for row in rows:
+        writer.writerow([_valor_csv(row[c]) for c, _ in columnas])
+        pendientes += 1
+        if pendientes >= FILAS_POR_CHUNK:
+            yield _vaciar(buffer)
+            pendientes = 0
+
+    yield _vaciar(buffer)
+
+
+# XLSX: SpreadsheetML escrito a mano dentro de un ZIP en streaming (una sola hoja, strings inline,
+# sin tabla de strings compartidos), así no hace falta tener la planilla entera en memoria
+
+
+_XLSX_FIJOS = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        "</Types>"
+    ),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        "</Relationships>"
+    ),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Reporte" sheetId="1" r:id="rId1"/></sheets>'
+        "</workbook>"
+    ),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+        "</Relationships>"
+    ),
+    # Estilos: 0 = normal, 1 = fecha y hora, 2 = encabezado en negrita
+    "xl/styles.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+        '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+        '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="3"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+        '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+        '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/></cellXfs>'
+        "</styleSheet>"
+    ),
+}
+
+_INICIO_HOJA = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<sheetViews><sheetView workbookViewId="0">'
+    '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+    "</sheetView></sheetViews><sheetData>"
+)
+_FIN_HOJA = "</sheetData></worksheet>"
+
+_CARACTERES_INVALIDOS = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")  # No se pueden representar en XML 1.0
+_EPOCH_EXCEL = datetime(1899, 12, 30)
+
+
+def _celda(valor, estilo: int = 0) -> str:
+    if valor is None:
+        return "<c/>"
+    if isinstance(valor, datetime):  # Número de serie de Excel, con formato de fecha
+        return f'<c s="1"><v>{(valor - _EPOCH_EXCEL).total_seconds() / 86400}</v></c>'
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return f"<c><v>{valor}</v></c>"
+    texto = escape(_CARACTERES_INVALIDOS.sub("", str(valor)))
+    estilo_attr = f' s="{estilo}"' if estilo else ""
+    return f'<c t="inlineStr"{estilo_attr}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+async def _stream_xlsx(rows, columnas) -> AsyncIterator[bytes]:
+    salida = SalidaZip()
+    with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for nombre, contenido in _XLSX_FIJOS.items():
+            zf.writestr(nombre, contenido)
+
+        with zf.open("xl/worksheets/sheet1.xml", "w") as hoja:
+            encabezado = "".join(_celda(titulo, 2) for _, titulo in columnas)
+            hoja.write(f"{_INICIO_HOJA}<row>{encabezado}</row>".encode())
+            yield salida.vaciar()
+
+            filas = []
+            async for row in rows:
+                filas.append("<row>" + "".join(_celda(row[c]) for c, _ in columnas) + "</row>")
+                if len(filas) >= FILAS_POR_CHUNK:
+                    hoja.write("".join(filas).encode())
+                    filas = []
+                    yield salida.vaciar()
+
+            hoja.write(("".join(filas) + _FIN_HOJA).encode())
+
+    yield salida.vaciar()
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.reporte import ReporteJobIn, ReporteJobOut
+from app.services import reporte_cache
+import app.services.reportes as reportes
+
+load_dotenv()
+
+# Reportes generados en segundo plano: el cliente pide el job, consulta el estado y descarga el archivo
+# cuando está listo, sin depender del timeout de la request. El estado vive en la tabla reportes_jobs
+# (sql/reportes_jobs.sql) y el archivo en JOBS_DIRECTORIO, así cualquier worker puede responder el polling y la
+# descarga. Con workers en más de un servidor, JOBS_DIRECTORIO tiene que ser un disco compartido
+JOBS_DIRECTORIO = os.getenv("REPORTES_JOBS_DIRECTORIO", os.path.join(tempfile.gettempdir(), "inventario_reportes_jobs"))
+JOBS_TTL_MINUTOS = int(os.getenv("REPORTES_JOBS_TTL_MINUTOS", "60"))  # Cuánto se conserva el archivo después de terminar
+JOBS_MAX_POR_USUARIO = int(os.getenv("REPORTES_JOBS_MAX_POR_USUARIO", "3"))  # Jobs sin terminar por usuario
+JOBS_TIMEOUT_MINUTOS = int(os.getenv("REPORTES_JOBS_TIMEOUT_MINUTOS", "120"))  # Sin terminar después de esto: el proceso que lo armaba se cayó
+
+PROGRESO = {"en_cola": 0, "consultando": 10, "armando": 50, "terminado": 100, "error": 100}
+
+_tareas = set()  # Referencias a las tareas en curso para que el GC no las corte
+_tarea_limpieza: asyncio.Task | None = None
+
+
+def params_reporte(job_in: ReporteJobIn) -> dict:  # Mismos parámetros (y misma clave de caché) que las rutas síncronas
+    params = {"solo_resumen": job_in.solo_resumen, "almacen_id": job_in.almacen_id}
+    if job_in.tipo == "movimientos":
+        params.update(fecha_inicio=job_in.fecha_inicio, fecha_fin=job_in.fecha_fin)
+    return params
+
+
+def _salida(job: dict) -> dict:
+    return {
+        **{k: v for k, v in job.items() if k not in ("fk_usuario", "ruta", "pedido")},
+        "progreso": PROGRESO[job["estado"]],
+    }
+
+
+async def _get_job(job_id: str, usuario_actual) -> dict:  # Solo el dueño del job (o un admin) puede verlo
+    row = await db.fetch_one(query="SELECT * FROM reportes_jobs WHERE id = :id", values={"id": job_id})
+    if not row or (row["fk_usuario"] != usuario_actual["id"] and usuario_actual["rol"] != "admin"):
+        raise HTTPException(status_code=404, detail="Job de reporte no encontrado o vencido")
+    return dict(row)
+
+
+async def _actualizar(job_id: str, condicion: str = "", **cambios):  # UPDATE de las columnas indicadas
+    columnas = ", ".join(f"{k} = :{k}" for k in cambios)
+    await db.execute(
+        query=f"UPDATE reportes_jobs SET {columnas} WHERE id = :id{condicion}", values={**cambios, "id": job_id}
+    )
+
+
+async def crear_job(job_in: ReporteJobIn, usuario_actual) -> ReporteJobOut:  # POST - Encola un reporte y devuelve el id del job
+    try:
+        row = await db.fetch_one(
+            query="""
+                SELECT COUNT(*) AS activos FROM reportes_jobs
+                WHERE fk_usuario = :fk_usuario AND estado NOT IN ('terminado', 'error')
+            """,
+            values={"fk_usuario": usuario_actual["id"]},
+        )
+        if row["activos"] >= JOBS_MAX_POR_USUARIO:
+            raise HTTPException(
+                status_code=429, detail="Ya tienes demasiados reportes en preparación. Espera a que terminen."
+            )
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "tipo": job_in.tipo,
+            "estado": "en_cola",
+            "filas": None,
+            "tamano_bytes": None,
+            "error": None,
+            "fecha_creacion": datetime.now(),
+            "fecha_fin": None,
+            "fecha_expiracion": None,
+        }
+        await db.execute(
+            query="""
+                INSERT INTO reportes_jobs (id, fk_usuario, tipo, pedido, estado, fecha_creacion)
+                VALUES (:id, :fk_usuario, :tipo, :pedido, :estado, :fecha_creacion)
+            """,
+            values={
+                "id": job["id"],
+                "fk_usuario": usuario_actual["id"],
+                "tipo": job["tipo"],
+                "pedido": job_in.model_dump_json(),
+                "estado": job["estado"],
+                "fecha_creacion": job["fecha_creacion"],
+            },
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al crear job de reporte: {e}")
+        raise HTTPException(status_code=500, detail="Error al crear el job de reporte")
+
+    tarea = asyncio.create_task(_ejecutar(job["id"], job_in))
+    _tareas.add(tarea)
+    tarea.add_done_callback(_tareas.discard)
+    return _salida(job)
+
+
+async def _ejecutar(job_id: str, job_in: ReporteJobIn):
+    def al_consultar(filas: int):  # Lo llama el generador (sincrónico): el UPDATE va en su propia tarea
+        tarea = asyncio.create_task(
+            _actualizar(job_id, " AND estado = 'consultando'", estado="armando", filas=filas)  # Nunca pisa el estado final
+        )
+        _tareas.add(tarea)
+        tarea.add_done_callback(_tareas.discard)
+
+    cambios = {}
+    try:
+        await _actualizar(job_id, estado="consultando")
+        params = params_reporte(job_in)
+        ruta_pdf = await reporte_cache.obtener_o_generar(
+            job_in.tipo, params, lambda: reportes.generar_reporte_pdf(job_in.tipo, params, al_consultar)
+        )
+
+        os.makedirs(JOBS_DIRECTORIO, exist_ok=True)
+        ruta = os.path.join(JOBS_DIRECTORIO, f"{job_id}.pdf")
+        shutil.move(ruta_pdf, ruta)  # Es una copia propia (aunque venga de la caché)
+        cambios = {"estado": "terminado", "error": None, "ruta": ruta, "tamano_bytes": os.path.getsize(ruta)}
+
+    except HTTPException as e:
+        cambios = {"estado": "error", "error": str(e.detail)[:500]}
+    except Exception as e:
+        print(f"Error en job de reporte {job_id}: {e}")
+        cambios = {"estado": "error", "error": "Error al generar el reporte"}
+
+    fecha_fin = datetime.now()
+    try:
+        await _actualizar(
+            job_id, **cambios, fecha_fin=fecha_fin, fecha_expiracion=fecha_fin + timedelta(minutes=JOBS_TTL_MINUTOS)
+        )
+    except Exception as e:  # El job queda sin terminar hasta JOBS_TIMEOUT_MINUTOS; el archivo lo borra la limpieza
+        print(f"Error al guardar el estado del job de reporte {job_id}: {e}")
+
+
+async def get_job(job_id: str, usuario_actual) -> ReporteJobOut:  # GET - Estado y progreso del job
+    return _salida(await _get_job(job_id, usuario_actual))
+
+
+async def get_archivo_job(job_id: str, usuario_actual) -> tuple[str, str]:  # GET - Copia propia del reporte terminado y su nombre de descarga
+    job = await _get_job(job_id, usuario_actual)
+    if job["estado"] == "error":
+        raise HTTPException(status_code=409, detail=f"El reporte falló: {job['error']}")
+    if job["estado"] != "terminado":
+        raise HTTPException(status_code=409, detail="El reporte todavía se está generando")
+
+    try:  # La descarga lleva su propia referencia: la limpieza puede borrar el original mientras se envía
+        ruta = reporte_cache.copia_propia(job["ruta"])
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job de reporte no encontrado o vencido")
+
+    job_in = ReporteJobIn.model_validate_json(job["pedido"])
+    return ruta, reportes.nombre_archivo_reporte(job_in.tipo, params_reporte(job_in))
+
+
+async def limpiar_jobs_vencidos() -> int:  # Borra los jobs (y sus archivos) que pasaron su fecha de expiración
+    ahora = datetime.now()
+
+    # Jobs que quedaron a medias porque se cayó el proceso que los armaba: no cuentan más para el límite por usuario
+    await db.execute(
+        query="""
+            UPDATE reportes_jobs
+            SET estado = 'error', error = 'El reporte se interrumpió', fecha_fin = :ahora, fecha_expiracion = :expira
+            WHERE estado NOT IN ('terminado', 'error') AND fecha_creacion < :limite
+        """,
+        values={
+            "ahora": ahora,
+            "expira": ahora + timedelta(minutes=JOBS_TTL_MINUTOS),
+            "limite": ahora - timedelta(minutes=JOBS_TIMEOUT_MINUTOS),
+        },
+    )
+
+    vencidos = await db.fetch_all(
+        query="SELECT id, ruta FROM reportes_jobs WHERE fecha_expiracion <= :ahora", values={"ahora": ahora}
+    )
+    for job in vencidos:  # Todos los workers limpian: el que llega segundo no encuentra nada
+        if job["ruta"]:
+            try:
+                os.remove(job["ruta"])
+            except FileNotFoundError:
+                pass
+        await db.execute(query="DELETE FROM reportes_jobs WHERE id = :id", values={"id": job["id"]})
+    return len(vencidos)
+
+
+# Tarea en segundo plano
+
+
+async def _loop_limpieza():
+    while True:
+        await asyncio.sleep(60)
+        try:
+            await limpiar_jobs_vencidos()
+        except Exception as e:
+            print(f"❌Error al limpiar jobs de reportes: {e}")
+
+
+def iniciar_limpieza_jobs():
+    global _tarea_limpieza
+    _tarea_limpieza = asyncio.create_task(_loop_limpieza())
+
+
+async def detener_limpieza_jobs():
+    if _tarea_limpieza:
+        _tarea_limpieza.cancel()
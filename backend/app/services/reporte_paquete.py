@@ -0,0 +1,110 @@
+import asyncio
+import os
+import re
+import zipfile
+from typing import AsyncIterator, List
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.services import reporte_cache
+from app.services.reporte_pool import REPORTES_PROCESOS, esperar_turno
+from app.services.reporte_export import SalidaZip
+import app.services.reportes as reportes
+
+load_dotenv()
+
+# Paquete de reportes por almacén: un PDF por almacén, armados en paralelo en el pool de procesos,
+# y un ZIP que se va enviando a medida que cada PDF termina (no al final de todos)
+PAQUETE_CONCURRENCIA = int(os.getenv("REPORTES_PAQUETE_CONCURRENCIA", str(REPORTES_PROCESOS)))  # Almacenes generándose a la vez
+PAQUETE_CHUNK_BYTES = 256 * 1024
+
+
+def _nombre_seguro(texto: str) -> str:
+    return re.sub(r"[^\w-]+", "_", texto).strip("_") or "almacen"
+
+
+async def _generar_almacen(tipo: str, params: dict, almacen: dict, semaforo: asyncio.Semaphore):  # (almacen, ruta propia | None, error | None)
+    params_almacen = {**params, "almacen_id": almacen["id"]}
+    esperar_turno.set(True)  # El paquete ya limita su concurrencia: si el pool está lleno espera, no se omite el almacén con un 503
+    async with semaforo:
+        try:
+            pdf = await reporte_cache.obtener_o_generar(
+                tipo, params_almacen, lambda: reportes.generar_reporte_pdf(tipo, params_almacen)
+            )
+            return almacen, pdf, None
+        except HTTPException as e:  # Ej: 404 porque ese almacén no tiene stock bajo
+            return almacen, None, e.detail
+        except Exception as e:
+            print(f"Error al generar reporte del almacén {almacen['id']} para el paquete: {e}")
+            return almacen, None, "Error al generar el reporte"
+
+
+async def generar_paquete(
+    tipo: str, params: dict, almacen_ids: List[int] | None = None
+) -> tuple[AsyncIterator[bytes], str]:  # GET - ZIP con un reporte por almacén y su nombre de descarga
+    if tipo not in reportes.TIPOS_REPORTE:
+        raise HTTPException(status_code=400, detail=f"Tipo de reporte inválido. Opciones: {', '.join(reportes.TIPOS_REPORTE)}")
+
+    # Validaciones antes de empezar a responder (después del primer byte ya no se puede devolver un error)
+    if tipo == "movimientos":
+        reportes.filtro_fechas_movimientos(params.get("fecha_inicio"), params.get("fecha_fin"))
+    else:
+        params = {"solo_resumen": params.get("solo_resumen")}
+
+    rows = await db.fetch_all("SELECT id, nombre FROM almacenes WHERE activo = true ORDER BY nombre")
+    almacenes = [dict(row) for row in rows]
+    if almacen_ids:
+        pedidos = set(almacen_ids)
+        almacenes = [a for a in almacenes if a["id"] in pedidos]
+        faltantes = pedidos - {a["id"] for a in almacenes}
+        if faltantes:
+            raise HTTPException(
+                status_code=404, detail=f"Almacenes no encontrados: {', '.join(map(str, sorted(faltantes)))}"
+            )
+    if not almacenes:
+        raise HTTPException(status_code=404, detail="No hay almacenes activos")
+
+    nombre = reportes.nombre_archivo_reporte(tipo, params, extension="zip").replace("reporte_", "reportes_", 1)
+    return _stream_paquete(tipo, params, almacenes), nombre
+
+
+async def _stream_paquete(tipo: str, params: dict, almacenes: List[dict]) -> AsyncIterator[bytes]:
+    semaforo = asyncio.Semaphore(PAQUETE_CONCURRENCIA)
+    tareas = [asyncio.create_task(_generar_almacen(tipo, params, a, semaforo)) for a in almacenes]
+    salida = SalidaZip()
+    omitidos = []
+
+    try:
+        # Sin seek, zipfile escribe el tamaño de cada entrada después de sus datos: cada PDF sale apenas está listo
+        with zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for completada in asyncio.as_completed(tareas):
+                almacen, pdf, error = await completada
+                if error:
+                    omitidos.append(f"{almacen['nombre']} (id {almacen['id']}): {error}")
+                    continue
+
+                ruta = pdf
+                nombre = f"{_nombre_seguro(almacen['nombre'])}_{reportes.nombre_archivo_reporte(tipo, {**params, 'almacen_id': almacen['id']})}"
+                try:
+                    with open(ruta, "rb") as origen, zf.open(nombre, "w") as destino:
+                        while bloque := origen.read(PAQUETE_CHUNK_BYTES):
+                            destino.write(bloque)
+                            yield salida.vaciar()
+                finally:
+                    os.remove(ruta)
+                yield salida.vaciar()
+
+            if omitidos:  # Los almacenes sin datos no cortan el paquete; quedan listados aparte
+                zf.writestr("omitidos.txt", "\n".join(omitidos) + "\n")
+
+        yield salida.vaciar()  # Directorio central del ZIP
+
+    finally:
+        # Si el cliente cortó la descarga: cancelar lo pendiente y borrar los PDF que ya no se van a enviar
+        for tarea in tareas:
+            if not tarea.done():
+                tarea.cancel()
+            elif not tarea.cancelled():
+                _, pdf, _ = tarea.result()
+                if pdf and os.path.exists(pdf):
+                    os.remove(pdf)
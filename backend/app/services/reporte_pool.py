@@ -0,0 +1,125 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from contextvars import ContextVar
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+# El armado de los PDF (ReportLab) es CPU puro y bloquearía el event loop: se ejecuta en un pool de procesos.
+# Solo la consulta SQL queda en el loop; al pool viaja la ruta del archivo con el detalle ya leído
+REPORTES_PROCESOS = int(os.getenv("REPORTES_PROCESOS", "2"))  # Reportes armándose a la vez
+REPORTES_COLA_MAXIMA = int(os.getenv("REPORTES_COLA_MAXIMA", "20"))  # Esperando turno; más allá se responde 503
+
+# Los pedidos que ya limitan su propia concurrencia (ej: los paquetes por almacén) esperan turno en vez de
+# recibir 503. Se activa con esperar_turno.set(True) dentro de la tarea; las tareas que cree después lo heredan
+esperar_turno: ContextVar[bool] = ContextVar("reportes_esperar_turno", default=False)
+
+_pool: ProcessPoolExecutor | None = None
+_semaforo: asyncio.Semaphore | None = None
+_estadisticas = {
+    "en_cola": 0,
+    "en_proceso": 0,
+    "completados": 0,
+    "errores": 0,
+    "rechazados": 0,
+    "espera_total_ms": 0.0,
+    "espera_maxima_ms": 0.0,
+    "render_total_ms": 0.0,
+}
+
+
+def _get_pool() -> ProcessPoolExecutor:  # Se crea al primer uso; "spawn" evita heredar conexiones y el loop del proceso principal
+    global _pool, _semaforo
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=REPORTES_PROCESOS, mp_context=multiprocessing.get_context("spawn")
+        )
+        _semaforo = asyncio.Semaphore(REPORTES_PROCESOS)
+    return _pool
+
+
+async def renderizar_pdf(funcion, *args) -> str:  # Ejecuta funcion(*args) en el pool y devuelve la ruta del PDF
+    pool = _get_pool()
+
+    if _estadisticas["en_cola"] >= REPORTES_COLA_MAXIMA and not esperar_turno.get():
+        _estadisticas["rechazados"] += 1
+        raise HTTPException(
+            status_code=503, detail="Hay demasiados reportes en preparación. Intente nuevamente en unos minutos."
+        )
+
+    _estadisticas["en_cola"] += 1
+    inicio = time.perf_counter()
+    try:
+        await _semaforo.acquire()
+    finally:
+        _estadisticas["en_cola"] -= 1
+
+    espera_ms = (time.perf_counter() - inicio) * 1000
+    _estadisticas["espera_total_ms"] += espera_ms
+    _estadisticas["espera_maxima_ms"] = max(_estadisticas["espera_maxima_ms"], espera_ms)
+
+    _estadisticas["en_proceso"] += 1
+    inicio = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    futuro = pool.submit(funcion, *args)
+    cancelado = False
+    try:
+        resultado = await asyncio.wrap_future(futuro)
+        _estadisticas["completados"] += 1
+        return resultado
+    except asyncio.CancelledError:  # El proceso no se puede interrumpir: el PDF se termina igual y se borra al terminar
+        cancelado = True
+        futuro.add_done_callback(lambda f: _descartar(f, loop))
+        raise
+    except Exception:
+        _estadisticas["errores"] += 1
+        raise
+    finally:
+        _estadisticas["render_total_ms"] += (time.perf_counter() - inicio) * 1000
+        _estadisticas["en_proceso"] -= 1
+        if not cancelado:
+            _semaforo.release()
+
+
+def _descartar(futuro: Future, loop):  # Fin de un render cuyo pedido se canceló (corre en un hilo del pool)
+    try:
+        loop.call_soon_threadsafe(_semaforo.release)  # Recién ahora el proceso queda libre
+    except RuntimeError:  # El loop ya se cerró (apagado)
+        pass
+    if futuro.cancelled() or futuro.exception():
+        return
+    try:
+        os.remove(futuro.result())
+    except FileNotFoundError:
+        pass
+
+
+def get_metricas(usuario_actual) -> dict:  # GET - Estado del pool de reportes (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver estas métricas")
+
+    terminados = _estadisticas["completados"] + _estadisticas["errores"]
+    atendidos = terminados + _estadisticas["en_proceso"]
+    return {
+        "procesos": REPORTES_PROCESOS,
+        "cola_maxima": REPORTES_COLA_MAXIMA,
+        "en_cola": _estadisticas["en_cola"],
+        "en_proceso": _estadisticas["en_proceso"],
+        "completados": _estadisticas["completados"],
+        "errores": _estadisticas["errores"],
+        "rechazados": _estadisticas["rechazados"],
+        "espera_promedio_ms": round(_estadisticas["espera_total_ms"] / atendidos, 2) if atendidos else 0.0,
+        "espera_maxima_ms": round(_estadisticas["espera_maxima_ms"], 2),
+        "render_promedio_ms": round(_estadisticas["render_total_ms"] / terminados, 2) if terminados else 0.0,
+    }
+
+
+def detener_pool_reportes():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
@@ -0,0 +1,292 @@
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from typing import List
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.reporte import ReporteProgramadoIn, ReporteProgramadoOut
+from app.services import reporte_cache
+from app.services.reporte_jobs import params_reporte
+import app.services.reportes as reportes
+
+load_dotenv()
+
+# Pre-generación de reportes en horarios tranquilos (ej: antes de que empiece el día).
+# REPORTES_PROGRAMADOS es un array JSON de {"tipo", "cron", parámetros opcionales, "frescura_minutos"}, ej:
+#   [{"tipo": "stock-bajo", "cron": "0 6 * * *"}, {"tipo": "inventario-general", "cron": "30 5 * * 1-5"}]
+# Las rutas de /reportes sirven la última copia mientras siga fresca.
+# Las copias las arma un solo proceso (el que tiene el lock PROGRAMADOS_LOCK de MySQL); los demás las leen del
+# directorio, que tiene que ser compartido si los workers corren en más de un servidor
+REPORTES_PROGRAMADOS = os.getenv("REPORTES_PROGRAMADOS", "[]")
+PROGRAMADOS_DIRECTORIO = os.getenv(
+    "REPORTES_PROGRAMADOS_DIRECTORIO", os.path.join(tempfile.gettempdir(), "inventario_reportes_programados")
+)
+PROGRAMADOS_RETENCION_DIAS = int(os.getenv("REPORTES_PROGRAMADOS_RETENCION_DIAS", "7"))
+PROGRAMADOS_LOCK = "inventario_reportes_programados"
+PROGRAMADOS_INTERVALO_SEGUNDOS = 30  # La resolución de cron es de un minuto
+
+_programados = []  # Entradas de la configuración con su próxima ejecución y el último error
+_tarea_programados: asyncio.Task | None = None
+
+
+# Expresiones cron (5 campos: minuto, hora, día del mes, mes, día de la semana con 0 = domingo)
+
+
+def _parsear_campo(texto: str, minimo: int, maximo: int) -> set:
+    valores = set()
+    for parte in texto.split(","):
+        rango, _, paso = parte.partition("/")
+        if rango == "*":
+            inicio, fin = minimo, maximo
+        elif "-" in rango:
+            inicio, fin = (int(v) for v in rango.split("-"))
+        else:
+            inicio = fin = int(rango)
+            if paso:  # "5/15" = desde 5 hasta el máximo, de a 15
+                fin = maximo
+        if inicio < minimo or fin > maximo or inicio > fin:
+            raise ValueError(f"valor fuera de rango en '{texto}'")
+        valores.update(range(inicio, fin + 1, int(paso) if paso else 1))
+    return valores
+
+
+def parsear_cron(expresion: str) -> dict:
+    campos = expresion.split()
+    if len(campos) != 5:
+        raise ValueError(f"la expresión cron '{expresion}' debe tener 5 campos")
+    dias_semana = {d % 7 for d in _parsear_campo(campos[4], 0, 7)}  # 7 también es domingo
+    return {
+        "minutos": _parsear_campo(campos[0], 0, 59),
+        "horas": _parsear_campo(campos[1], 0, 23),
+        "dias": _parsear_campo(campos[2], 1, 31),
+        "meses": _parsear_campo(campos[3], 1, 12),
+        "dias_semana": dias_semana,
+        # Como en cron: si se restringen día del mes y día de la semana, alcanza con que coincida uno
+        "dia_o_semana": campos[2] != "*" and campos[4] != "*",
+    }
+
+
+def _coincide_dia(cron: dict, fecha: datetime) -> bool:
+    if fecha.month not in cron["meses"]:
+        return False
+    dia = fecha.day in cron["dias"]
+    semana = (fecha.weekday() + 1) % 7 in cron["dias_semana"]
+    return (dia or semana) if cron["dia_o_semana"] else (dia and semana)
+
+
+def proxima_ejecucion(cron: dict, desde: datetime) -> datetime:  # Primer minuto posterior a "desde" que cumple la expresión
+    fecha = desde.replace(second=0, microsecond=0) + timedelta(minutes=1)
+    limite = fecha + timedelta(days=366 * 4)  # Ej: 29 de febrero
+    while fecha < limite:
+        if not _coincide_dia(cron, fecha):
+            fecha = (fecha + timedelta(days=1)).replace(hour=0, minute=0)
+        elif fecha.hour not in cron["horas"]:
+            fecha = (fecha + timedelta(hours=1)).replace(minute=0)
+        elif fecha.minute not in cron["minutos"]:
+            fecha += timedelta(minutes=1)
+        else:
+            return fecha
+    raise ValueError("la expresión cron nunca se cumple")
+
+
+# Copias pre-generadas
+# Nombre: {slug}_{AAAAMMDDHHMMSS}_v{versión compartida de los datos}.pdf, así cualquier proceso sabe si sigue vigente
+
+
+def _slug(tipo: str, params: dict) -> str:
+    return hashlib.sha256(repr((tipo, reporte_cache.clave_params(params))).encode()).hexdigest()[:16]
+
+
+def _ultima_copia(slug: str) -> dict | None:  # La copia más nueva de ese reporte en el directorio (de cualquier proceso)
+    try:
+        nombres = sorted(
+            n for n in os.listdir(PROGRAMADOS_DIRECTORIO) if n.startswith(slug + "_") and n.endswith(".pdf")
+        )
+    except FileNotFoundError:
+        return None
+    if not nombres:
+        return None
+
+    fecha, _, version = nombres[-1][len(slug) + 1:-4].partition("_v")
+    return {
+        "ruta": os.path.join(PROGRAMADOS_DIRECTORIO, nombres[-1]),
+        "version": int(version) if version else None,  # Copias de antes del formato con versión: solo por antigüedad
+        "generado_en": datetime.strptime(fecha, "%Y%m%d%H%M%S"),
+    }
+
+
+def cargar_programados():  # Lee la configuración de REPORTES_PROGRAMADOS
+    _programados.clear()
+    try:
+        entradas = [ReporteProgramadoIn(**e) for e in json.loads(REPORTES_PROGRAMADOS)]
+    except Exception as e:
+        print(f"❌REPORTES_PROGRAMADOS inválido: {e}")
+        return
+
+    os.makedirs(PROGRAMADOS_DIRECTORIO, exist_ok=True)
+    ahora = datetime.now()
+
+    for entrada in entradas:
+        try:
+            cron = parsear_cron(entrada.cron)
+        except ValueError as e:
+            print(f"❌Reporte programado '{entrada.tipo}' ignorado: {e}")
+            continue
+
+        params = params_reporte(entrada)
+        _programados.append(
+            {
+                "entrada": entrada,
+                "params": params,
+                "slug": _slug(entrada.tipo, params),
+                "cron": cron,
+                "proxima": proxima_ejecucion(cron, ahora),
+                "error": None,
+            }
+        )
+
+
+def obtener_prearmado(tipo: str, params: dict) -> str | None:  # Copia propia de la última pre-generada si sigue fresca (quien la recibe la borra)
+    # Llamar antes a reporte_cache.sincronizar_version()
+    clave = reporte_cache.clave_params(params)
+    for programado in _programados:
+        if programado["entrada"].tipo != tipo or reporte_cache.clave_params(programado["params"]) != clave:
+            continue
+        ultimo = _ultima_copia(programado["slug"])
+        if not ultimo:
+            return None
+        edad = datetime.now() - ultimo["generado_en"]
+        if ultimo["version"] == reporte_cache.version_compartida() or edad < timedelta(
+            minutes=programado["entrada"].frescura_minutos
+        ):  # Nada cambió desde que se generó, o todavía es lo bastante reciente
+            try:  # La retención puede borrar el original mientras se envía
+                return reporte_cache.copia_propia(ultimo["ruta"])
+            except FileNotFoundError:
+                return None
+    return None
+
+
+async def generar_programado(programado: dict):
+    tipo = programado["entrada"].tipo
+    await reporte_cache.sincronizar_version()
+    version = reporte_cache.version_compartida()  # Leída antes de consultar, igual que en la caché
+    archivo = await reportes.generar_reporte_pdf(tipo, programado["params"])
+
+    ruta = os.path.join(PROGRAMADOS_DIRECTORIO, f"{programado['slug']}_{datetime.now():%Y%m%d%H%M%S}_v{version}.pdf")
+    os.makedirs(PROGRAMADOS_DIRECTORIO, exist_ok=True)
+    shutil.move(archivo, ruta + ".tmp")  # Puede ser otro disco: los demás procesos no ven el archivo a medio copiar
+    os.replace(ruta + ".tmp", ruta)
+
+
+def limpiar_programados_viejos() -> int:  # Retención: borra las copias viejas, pero nunca la última de cada reporte
+    vigentes = {ultimo["ruta"] for p in _programados if (ultimo := _ultima_copia(p["slug"]))}
+    limite = datetime.now() - timedelta(days=PROGRAMADOS_RETENCION_DIAS)
+    borrados = 0
+    for nombre in os.listdir(PROGRAMADOS_DIRECTORIO):
+        ruta = os.path.join(PROGRAMADOS_DIRECTORIO, nombre)
+        if ruta in vigentes or not nombre.endswith((".pdf", ".tmp")):
+            continue
+        if datetime.fromtimestamp(os.path.getmtime(ruta)) < limite:
+            os.remove(ruta)
+            borrados += 1
+    return borrados
+
+
+def get_programados(usuario_actual) -> List[ReporteProgramadoOut]:  # GET - Reportes programados y su estado (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver los reportes programados")
+
+    ahora = datetime.now()
+    salida = []
+    for p in _programados:
+        ultimo = _ultima_copia(p["slug"])
+        salida.append(
+            {
+                "tipo": p["entrada"].tipo,
+                "params": p["params"],
+                "cron": p["entrada"].cron,
+                "frescura_minutos": p["entrada"].frescura_minutos,
+                "proxima_ejecucion": p["proxima"] if p["proxima"] > ahora else proxima_ejecucion(p["cron"], ahora),
+                "ultima_generacion": ultimo["generado_en"] if ultimo else None,
+                "ultimo_error": p["error"],  # Solo lo conoce el proceso que los ejecuta
+            }
+        )
+    return salida
+
+
+# Tarea en segundo plano
+# Todos los procesos corren el loop, pero solo ejecuta los programados el que tiene el lock de MySQL (GET_LOCK).
+# El lock es de la conexión: si ese proceso se cae, MySQL lo libera y lo toma otro en la vuelta siguiente
+
+
+async def _ejecutar_vencidos():
+    ahora = datetime.now()
+    for programado in _programados:
+        if programado["proxima"] > ahora:
+            continue
+        programado["proxima"] = proxima_ejecucion(programado["cron"], ahora)
+        try:
+            await generar_programado(programado)
+            programado["error"] = None
+            print(f"🗓️ Reporte programado '{programado['entrada'].tipo}' generado")
+        except Exception as e:  # Ej: 404 porque no hay stock bajo; se reintenta en la próxima ejecución
+            programado["error"] = getattr(e, "detail", None) or str(e)
+            print(f"❌Error al generar reporte programado '{programado['entrada'].tipo}': {programado['error']}")
+    try:
+        limpiar_programados_viejos()
+    except Exception as e:
+        print(f"❌Error al limpiar reportes programados: {e}")
+
+
+async def _sigo_con_el_lock(conn) -> bool:  # También mantiene viva la conexión (wait_timeout)
+    row = await conn.fetch_one(
+        query="SELECT IS_USED_LOCK(:nombre) = CONNECTION_ID() AS propio", values={"nombre": PROGRAMADOS_LOCK}
+    )
+    return bool(row["propio"])
+
+
+async def _loop_programados():
+    while True:
+        await asyncio.sleep(PROGRAMADOS_INTERVALO_SEGUNDOS)
+        try:
+            async with db.connection() as conn:  # Conexión fija: el lock vive mientras ella siga abierta
+                row = await conn.fetch_one(
+                    query="SELECT GET_LOCK(:nombre, 0) AS tomado", values={"nombre": PROGRAMADOS_LOCK}
+                )
+                if not row["tomado"]:  # Otro proceso los ejecuta
+                    continue
+
+                print("🗓️ Este proceso ejecuta los reportes programados")
+                ahora = datetime.now()
+                for programado in _programados:  # Lo que venció mientras los ejecutaba otro ya se hizo
+                    programado["proxima"] = proxima_ejecucion(programado["cron"], ahora)
+                try:
+                    while await _sigo_con_el_lock(conn):
+                        await _ejecutar_vencidos()
+                        await asyncio.sleep(PROGRAMADOS_INTERVALO_SEGUNDOS)
+                    print("⚠️ Se perdió el lock de los reportes programados")
+                finally:
+                    try:
+                        await conn.execute(query="DO RELEASE_LOCK(:nombre)", values={"nombre": PROGRAMADOS_LOCK})
+                    except Exception:  # La conexión ya se cerró: el lock se liberó con ella
+                        pass
+        except Exception as e:
+            print(f"❌Error en el loop de reportes programados: {e}")
+
+
+def iniciar_reportes_programados():
+    global _tarea_programados
+    cargar_programados()
+    if _programados:
+        reporte_cache.compartir_version()  # Las copias se validan contra la versión de todos los procesos
+        _tarea_programados = asyncio.create_task(_loop_programados())
+
+
+async def detener_reportes_programados():
+    if _tarea_programados:
+        _tarea_programados.cancel()
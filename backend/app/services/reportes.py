@@ -1,5 +1,8 @@
-from io import BytesIO
-from datetime import datetime
+import os
+import pickle
+import tempfile
+from datetime import date, datetime, time, timedelta
+from dotenv import load_dotenv
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -14,180 +17,286 @@ from reportlab.platypus import (
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 from fastapi import HTTPException
 from app.config.database import db
-
-
-async def generar_reporte_stock_bajo_pdf() -> BytesIO: # Genera un reporte PDF de productos con stock bajo en todos los almacenes
-    try:
-        query = """
-            SELECT 
-                p.codigo AS codigo,
-                p.nombre AS producto,
-                a.nombre AS almacen,
-                sa.cantidad_disponible AS stock_actual,
-                p.stock_minimo AS stock_minimo,
-                (p.stock_minimo - sa.cantidad_disponible) AS deficit,
-                CASE 
-                    WHEN sa.cantidad_disponible = 0 THEN 'CRÍTICO'
-                    WHEN sa.cantidad_disponible < (p.stock_minimo * 0.5) THEN 'URGENTE'
-                    ELSE 'BAJO'
-                END AS estado
+from app.services.reporte_pool import renderizar_pdf
+
+load_dotenv()
+
+# Los PDF se escriben en archivos temporales (no en memoria); quien recibe la ruta se encarga de moverlo o borrarlo
+REPORTES_TEMP_DIRECTORIO = os.getenv("REPORTES_TEMP_DIRECTORIO", tempfile.gettempdir())
+REPORTES_FILAS_POR_TABLA = int(os.getenv("REPORTES_FILAS_POR_TABLA", "500"))  # Filas por tabla de detalle
+
+
+# Consultas de cada reporte: detalle y resumen por separado, así el resumen se calcula en la BD
+# y el modo "solo resumen" no necesita traer las filas de detalle
+
+
+ESTADO_STOCK_BAJO = """
+    CASE 
+        WHEN sa.cantidad_disponible = 0 THEN 'CRÍTICO'
+        WHEN sa.cantidad_disponible < (p.stock_minimo * 0.5) THEN 'URGENTE'
+        ELSE 'BAJO'
+    END
+"""
+
+
+def filtro_almacen(columna: str, almacen_id: int = None) -> tuple[str, dict]:  # Condición opcional para el reporte de un solo almacén
+    if almacen_id is None:
+        return "", {}
+    return f" AND {columna} = :almacen_id", {"almacen_id": almacen_id}
+
+
+def query_stock_bajo(almacen_id: int = None) -> tuple[str, dict]:  # Detalle de productos con stock bajo (todos los almacenes o uno)
+    condicion, values = filtro_almacen("sa.fk_almacen", almacen_id)
+    query = f"""
+        SELECT 
+            p.codigo AS codigo,
+            p.nombre AS producto,
+            a.nombre AS almacen,
+            sa.cantidad_disponible AS stock_actual,
+            p.stock_minimo AS stock_minimo,
+            (p.stock_minimo - sa.cantidad_disponible) AS deficit,
+            {ESTADO_STOCK_BAJO} AS estado
+        FROM stock_almacen sa
+        INNER JOIN productos p ON sa.fk_producto = p.id
+        INNER JOIN almacenes a ON sa.fk_almacen = a.id
+        WHERE sa.cantidad_disponible < p.stock_minimo
+        AND p.activo = 1{condicion}
+        ORDER BY 
+            CASE 
+                WHEN sa.cantidad_disponible = 0 THEN 1
+                WHEN sa.cantidad_disponible < (p.stock_minimo * 0.5) THEN 2
+                ELSE 3
+            END,
+            a.nombre,
+            p.nombre
+    """
+    return query, values
+
+
+def query_resumen_stock_bajo(almacen_id: int = None) -> tuple[str, dict]:  # Cantidad por estado; la fila del ROLLUP (estado NULL) es el total
+    condicion, values = filtro_almacen("sa.fk_almacen", almacen_id)
+    query = f"""
+        SELECT t.estado, COUNT(*) AS cantidad
+        FROM (
+            SELECT {ESTADO_STOCK_BAJO} AS estado
             FROM stock_almacen sa
             INNER JOIN productos p ON sa.fk_producto = p.id
             INNER JOIN almacenes a ON sa.fk_almacen = a.id
             WHERE sa.cantidad_disponible < p.stock_minimo
-            AND p.activo = 1
-            ORDER BY 
-                CASE 
-                    WHEN sa.cantidad_disponible = 0 THEN 1
-                    WHEN sa.cantidad_disponible < (p.stock_minimo * 0.5) THEN 2
-                    ELSE 3
-                END,
-                a.nombre,
-                p.nombre
-        """
-
-        rows = await db.fetch_all(query=query)
-
-        if not rows:
-            raise HTTPException(
-                status_code=404, detail="No se encontraron productos con stock bajo"
-            )
-
-        # Crear PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=30,
-            leftMargin=30,
-            topMargin=30,
-            bottomMargin=30,
-        )
-
-        elements = []
-        styles = getSampleStyleSheet()
-
-        #  ENCABEZADO
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=18,
-            textColor=colors.HexColor("#1a237e"),
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName="Helvetica-Bold",
-        )
-
-        subtitle_style = ParagraphStyle(
-            "CustomSubtitle",
-            parent=styles["Normal"],
-            fontSize=11,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-        )
-
-        titulo = Paragraph("Reporte de Stock Bajo", title_style)
-        elements.append(titulo)
-
-        fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
-        fecha = Paragraph(f"Generado el: {fecha_actual}", subtitle_style)
-        elements.append(fecha)
-        elements.append(Spacer(1, 20))
-
-        # RESUMEN 
-        total_productos = len(rows)
-        criticos = sum(1 for r in rows if r["estado"] == "CRÍTICO")
-        urgentes = sum(1 for r in rows if r["estado"] == "URGENTE")
-        bajos = sum(1 for r in rows if r["estado"] == "BAJO")
-
-        resumen_data = [
-            ["Estado", "Cantidad"],
-            ["CRÍTICO (sin stock)", str(criticos)],
-            ["URGENTE (< 50% mínimo)", str(urgentes)],
-            ["BAJO (< stock mínimo)", str(bajos)],
-            ["TOTAL", str(total_productos)],
-        ]
-
-        resumen_table = Table(resumen_data, colWidths=[3 * inch, 1.5 * inch])
-        resumen_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 12),
-                    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                    ("GRID", (0, 0), (-1, -1), 1, colors.black),
-                    ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
-                    ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e0e0e0")),
-                ]
-            )
+            AND p.activo = 1{condicion}
+        ) t
+        GROUP BY t.estado WITH ROLLUP
+    """
+    return query, values
+
+
+def query_inventario_general(almacen_id: int = None) -> tuple[str, dict]:  # Detalle del inventario general (todos los almacenes o uno)
+    condicion, values = filtro_almacen("sa.fk_almacen", almacen_id)
+    query = f"""
+        SELECT 
+            p.codigo AS codigo,
+            p.nombre AS producto,
+            c.nombre AS categoria,
+            a.nombre AS almacen,
+            sa.cantidad_disponible AS disponible,
+            sa.cantidad_reservada AS reservada,
+            (sa.cantidad_disponible + sa.cantidad_reservada) AS total,
+            p.precio_venta AS precio,
+            (sa.cantidad_disponible * p.precio_venta) AS valor_stock
+        FROM stock_almacen sa
+        INNER JOIN productos p ON sa.fk_producto = p.id
+        INNER JOIN almacenes a ON sa.fk_almacen = a.id
+        INNER JOIN categorias c ON p.fk_categoria = c.id
+        WHERE p.activo = 1{condicion}
+        ORDER BY a.nombre, c.nombre, p.nombre
+    """
+    return query, values
+
+
+def query_resumen_inventario_general(almacen_id: int = None) -> tuple[str, dict]:
+    condicion, values = filtro_almacen("sa.fk_almacen", almacen_id)
+    query = f"""
+        SELECT
+            COUNT(*) AS filas,
+            COALESCE(SUM(sa.cantidad_disponible * p.precio_venta), 0) AS valor_total
+        FROM stock_almacen sa
+        INNER JOIN productos p ON sa.fk_producto = p.id
+        INNER JOIN almacenes a ON sa.fk_almacen = a.id
+        INNER JOIN categorias c ON p.fk_categoria = c.id
+        WHERE p.activo = 1{condicion}
+    """
+    return query, values
+
+
+def filtro_fechas_movimientos(fecha_inicio: date = None, fecha_fin: date = None) -> tuple[str, dict]:  # Condiciones de fecha sobre mi.fecha_movimiento
+    if fecha_inicio and fecha_fin and fecha_inicio > fecha_fin:
+        raise HTTPException(status_code=400, detail="La fecha de inicio no puede ser posterior a la fecha de fin")
+
+    condiciones = ""
+    values = {}
+
+    # Filtros opcionales solo por fecha, como rango semiabierto [inicio 00:00, día siguiente al fin 00:00)
+    # sobre la columna sin funciones, para que use idx_movimientos_fecha
+    if fecha_inicio:
+        condiciones += " AND mi.fecha_movimiento >= :fecha_desde"
+        values["fecha_desde"] = datetime.combine(fecha_inicio, time.min)
+
+    if fecha_fin:
+        condiciones += " AND mi.fecha_movimiento < :fecha_hasta"
+        values["fecha_hasta"] = datetime.combine(fecha_fin + timedelta(days=1), time.min)
+
+    return condiciones, values
+
+
+def query_movimientos(
+    fecha_inicio: date = None, fecha_fin: date = None, almacen_id: int = None
+) -> tuple[str, dict]:  # Query de movimientos con filtros de fecha y almacén (la usan el PDF y la exportación CSV/NDJSON)
+    condiciones, values = filtro_fechas_movimientos(fecha_inicio, fecha_fin)
+    condicion_almacen, values_almacen = filtro_almacen("mi.fk_almacen", almacen_id)
+    condiciones += condicion_almacen
+    values.update(values_almacen)
+
+    # Query general de movimientos
+    query = f"""
+        SELECT 
+            mi.id,
+            mi.fecha_movimiento,
+            DATE_FORMAT(mi.fecha_movimiento, '%d/%m/%Y %H:%i') AS fecha,
+            mi.tipo_movimiento,
+            p.codigo AS codigo_producto,
+            p.nombre AS producto,
+            a.nombre AS almacen,
+            u.nombre AS usuario,
+            mi.cantidad,
+            mi.cantidad_anterior,
+            mi.cantidad_nueva,
+            mi.motivo,
+            prov.nombre AS proveedor
+        FROM movimientos_inventario mi
+        INNER JOIN productos p ON mi.fk_producto = p.id
+        INNER JOIN almacenes a ON mi.fk_almacen = a.id
+        INNER JOIN usuarios u ON mi.fk_usuario = u.id
+        LEFT JOIN proveedores prov ON mi.fk_proveedor = prov.id
+        WHERE 1=1 {condiciones}
+        ORDER BY mi.fecha_movimiento DESC
+    """
+    return query, values
+
+
+def query_resumen_movimientos(
+    fecha_inicio: date = None, fecha_fin: date = None, almacen_id: int = None
+) -> tuple[str, dict]:  # Totales por tipo, almacenes y usuarios en una sola pasada
+    condiciones, values = filtro_fechas_movimientos(fecha_inicio, fecha_fin)
+    condicion_almacen, values_almacen = filtro_almacen("mi.fk_almacen", almacen_id)
+    condiciones += condicion_almacen
+    values.update(values_almacen)
+    query = f"""
+        SELECT
+            COUNT(*) AS total,
+            CAST(COALESCE(SUM(mi.tipo_movimiento = 'entrada'), 0) AS SIGNED) AS entradas,
+            CAST(COALESCE(SUM(mi.tipo_movimiento = 'salida'), 0) AS SIGNED) AS salidas,
+            CAST(COALESCE(SUM(mi.tipo_movimiento = 'ajuste'), 0) AS SIGNED) AS ajustes,
+            CAST(COALESCE(SUM(mi.tipo_movimiento = 'devolucion'), 0) AS SIGNED) AS devoluciones,
+            COUNT(DISTINCT mi.fk_almacen) AS almacenes,
+            COUNT(DISTINCT mi.fk_usuario) AS usuarios
+        FROM movimientos_inventario mi
+        INNER JOIN productos p ON mi.fk_producto = p.id
+        INNER JOIN almacenes a ON mi.fk_almacen = a.id
+        INNER JOIN usuarios u ON mi.fk_usuario = u.id
+        WHERE 1=1 {condiciones}
+    """
+    return query, values
+
+
+async def _leer_reporte(consulta_resumen, consulta_detalle=None) -> tuple[list, str | None, int]:  # Resumen y detalle de la misma foto de la BD
+    # El detalle no se arma en memoria: se recorre con iterate y se escribe a un archivo temporal en bloques de
+    # REPORTES_FILAS_POR_TABLA filas (uno por tabla del PDF). El proceso que arma el PDF lo lee bloque por bloque.
+    # Devuelve (resumen, ruta del detalle o None, filas del detalle); quien recibe la ruta la borra
+    async with db.connection() as conn:
+        async with conn.transaction():
+            resumen = [dict(row) for row in await conn.fetch_all(*consulta_resumen)]
+            if not consulta_detalle:
+                return resumen, None, 0
+
+            ruta = _archivo_temporal(".detalle")
+            filas = 0
+            try:
+                with open(ruta, "wb") as archivo:
+                    bloque = []
+                    async for row in conn.iterate(*consulta_detalle):
+                        bloque.append(dict(row))
+                        if len(bloque) == REPORTES_FILAS_POR_TABLA:
+                            pickle.dump(bloque, archivo)
+                            filas += len(bloque)
+                            bloque = []
+                    if bloque:
+                        pickle.dump(bloque, archivo)
+                        filas += len(bloque)
+            except BaseException:  # También si cancelan la request en medio de la lectura
+                _borrar(ruta)
+                raise
+    return resumen, ruta, filas
+
+
+def _leer_bloques(ruta: str | None):  # Bloques de filas del detalle, de a uno (corre en el proceso que arma el PDF)
+    if ruta is None:
+        return
+    with open(ruta, "rb") as archivo:
+        while True:
+            try:
+                yield pickle.load(archivo)
+            except EOFError:
+                return
+
+
+def _borrar(ruta: str | None):
+    if ruta:
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+
+
+async def get_nombre_almacen(almacen_id: int = None) -> str | None:  # Nombre para el encabezado de un reporte por almacén (404 si no existe)
+    if almacen_id is None:
+        return None
+    row = await db.fetch_one("SELECT nombre FROM almacenes WHERE id = :id", values={"id": almacen_id})
+    if not row:
+        raise HTTPException(status_code=404, detail="Almacen no encontrado")
+    return row["nombre"]
+
+
+def armar_resumen(tipo: str, resumen_rows: list) -> dict:  # Resumen de un reporte a partir de su consulta; 404 si no hay nada que mostrar (PDF y planillas)
+    if tipo == "stock-bajo":
+        resumen = {row["estado"] or "TOTAL": row["cantidad"] for row in resumen_rows}
+        if not resumen.get("TOTAL"):
+            raise HTTPException(status_code=404, detail="No se encontraron productos con stock bajo")
+        return resumen
+
+    resumen = resumen_rows[0]
+    if tipo == "inventario-general" and not resumen["filas"]:
+        raise HTTPException(status_code=404, detail="No se encontraron productos en el inventario")
+    if tipo == "movimientos" and not resumen["total"]:
+        raise HTTPException(status_code=404, detail="No se encontraron movimientos en el período especificado")
+    return resumen
+
+
+async def generar_reporte_stock_bajo_pdf(
+    solo_resumen: bool = False, al_consultar=None, almacen_id: int = None
+) -> str: # Genera un reporte PDF de productos con stock bajo en todos los almacenes (o en uno)
+    try:
+        almacen = await get_nombre_almacen(almacen_id)
+        resumen_rows, detalle, filas = await _leer_reporte(
+            query_resumen_stock_bajo(almacen_id), None if solo_resumen else query_stock_bajo(almacen_id)
         )
+        try:
+            resumen = armar_resumen("stock-bajo", resumen_rows)
 
-        elements.append(resumen_table)
-        elements.append(Spacer(1, 30))
-
-        # DETALLE
-        detalle_titulo = Paragraph("Detalle de Productos", title_style)
-        elements.append(detalle_titulo)
-        elements.append(Spacer(1, 12))
-
-        data = [
-            [
-                "Código",
-                "Producto",
-                "Almacén",
-                "Stock Actual",
-                "Mínimo",
-                "Déficit",
-                "Estado",
-            ]
-        ]
-
-        for row in rows:
-            data.append(
-                [
-                    str(row["codigo"]),
-                    str(row["producto"]),
-                    str(row["almacen"]),
-                    str(row["stock_actual"]),
-                    str(row["stock_minimo"]),
-                    str(row["deficit"]),
-                    str(row["estado"]),
-                ]
-            )
-
-        table = Table(data, colWidths=[None] * len(data[0]))  
-
-        table_style = [
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 10),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("FONTSIZE", (0, 1), (-1, -1), 8),
-            ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
-        ]
-
-        # Colorear columna de estado
-        for i, row in enumerate(rows, start=1):
-            if row["estado"] == "CRÍTICO":
-                table_style.append(("BACKGROUND", (-1, i), (-1, i), colors.red))
-                table_style.append(("TEXTCOLOR", (-1, i), (-1, i), colors.white))
-            elif row["estado"] == "URGENTE":
-                table_style.append(("BACKGROUND", (-1, i), (-1, i), colors.orange))
-            else:
-                table_style.append(("BACKGROUND", (-1, i), (-1, i), colors.yellow))
-
-        table.setStyle(TableStyle(table_style))
-        elements.append(table)
-
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer
+            if al_consultar:  # Aviso de progreso (jobs de reportes): terminó la consulta, empieza el armado
+                al_consultar(filas)
+            return await renderizar_pdf(render_stock_bajo_pdf, resumen, detalle, almacen)
+        finally:
+            _borrar(detalle)
 
     except HTTPException:
         raise
@@ -198,141 +307,26 @@ async def generar_reporte_stock_bajo_pdf() -> BytesIO: # Genera un reporte PDF d
         )
 
 
-async def generar_reporte_inventario_general_pdf() -> BytesIO: # Genera un reporte PDF del inventario general 
+async def generar_reporte_inventario_general_pdf(
+    solo_resumen: bool = False, al_consultar=None, almacen_id: int = None
+) -> str: # Genera un reporte PDF del inventario general (o de un almacén)
     try:
-        query = """
-            SELECT 
-                p.codigo AS codigo,
-                p.nombre AS producto,
-                c.nombre AS categoria,
-                a.nombre AS almacen,
-                sa.cantidad_disponible AS disponible,
-                sa.cantidad_reservada AS reservada,
-                (sa.cantidad_disponible + sa.cantidad_reservada) AS total,
-                p.precio_venta AS precio,
-                (sa.cantidad_disponible * p.precio_venta) AS valor_stock
-            FROM stock_almacen sa
-            INNER JOIN productos p ON sa.fk_producto = p.id
-            INNER JOIN almacenes a ON sa.fk_almacen = a.id
-            INNER JOIN categorias c ON p.fk_categoria = c.id
-            WHERE p.activo = 1
-            ORDER BY a.nombre, c.nombre, p.nombre
-        """
-        rows = await db.fetch_all(query=query)
-
-        if not rows:
-            raise HTTPException(
-                status_code=404, detail="No se encontraron productos en el inventario"
-            )
-
-        # Crear PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=30,
-            leftMargin=30,
-            topMargin=30,
-            bottomMargin=30,
-        )
-
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Título
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=18,
-            textColor=colors.HexColor("#1a237e"),
-            spaceAfter=30,
-            alignment=TA_CENTER,
-            fontName="Helvetica-Bold",
-        )
-
-        titulo = Paragraph("Reporte de Inventario General", title_style)
-        elements.append(titulo)
-
-        fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
-        fecha = Paragraph(
-            f"Generado el: {fecha_actual}",
-            ParagraphStyle(
-                "subtitle", parent=styles["Normal"], fontSize=11, alignment=TA_LEFT
-            ),
-        )
-        elements.append(fecha)
-        elements.append(Spacer(1, 20))
-
-        # Resumen
-        valor_total = sum(float(r["valor_stock"]) for r in rows)
-
-        resumen = Paragraph(
-            f"<b>Valor total del inventario:</b> ${valor_total:,.2f}",
-            styles["Normal"],
-        )
-        elements.append(resumen)
-        elements.append(Spacer(1, 20))
-
-        # Tabla
-        data = [
-            [
-                "Código",
-                "Producto",
-                "Categoría",
-                "Almacén",
-                "Disponible",
-                "Reservada",
-                "Precio",
-                "Valor",
-            ]
-        ]
-
-        for row in rows:
-            data.append(
-                [
-                    str(row["codigo"]),
-                    str(row["producto"])[:20],
-                    str(row["categoria"])[:15],
-                    str(row["almacen"])[:15],
-                    str(row["disponible"]),
-                    str(row["reservada"]),
-                    f"${float(row['precio']):,.2f}",
-                    f"${float(row['valor_stock']):,.2f}",
-                ]
-            )
-
-        table = Table(
-            data,
-            colWidths=[None] * len(data[0])
-        )
-
-        table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 9),
-                    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                    ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-                    ("FONTSIZE", (0, 1), (-1, -1), 7),
-                    (
-                        "ROWBACKGROUNDS",
-                        (0, 1),
-                        (-1, -1),
-                        [colors.white, colors.lightgrey],
-                    ),
-                ]
-            )
+        almacen = await get_nombre_almacen(almacen_id)
+        resumen_rows, detalle, filas = await _leer_reporte(
+            query_resumen_inventario_general(almacen_id),
+            None if solo_resumen else query_inventario_general(almacen_id),
         )
+        try:
+            resumen = armar_resumen("inventario-general", resumen_rows)
 
-        elements.append(table)
-
-        doc.build(elements)
-        buffer.seek(0)
-        return buffer
+            if al_consultar:
+                al_consultar(filas)
+            return await renderizar_pdf(render_inventario_general_pdf, resumen, detalle, almacen)
+        finally:
+            _borrar(detalle)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error al generar reporte: {e}")
         raise HTTPException(
@@ -341,243 +335,581 @@ async def generar_reporte_inventario_general_pdf() -> BytesIO: # Genera un repor
 
 
 async def generar_reporte_movimientos_pdf(
-    fecha_inicio: str = None, fecha_fin: str = None
-) -> BytesIO:       # Genera un reporte PDF de movimientos de inventario según fechas
+    fecha_inicio: date = None,
+    fecha_fin: date = None,
+    solo_resumen: bool = False,
+    al_consultar=None,
+    almacen_id: int = None,
+) -> str:       # Genera un reporte PDF de movimientos de inventario según fechas (y almacén)
     try:
-        # Query general de movimientos
-        query = """
-            SELECT 
-                mi.id,
-                DATE_FORMAT(mi.fecha_movimiento, '%d/%m/%Y %H:%i') AS fecha,
-                mi.tipo_movimiento,
-                p.codigo AS codigo_producto,
-                p.nombre AS producto,
-                a.nombre AS almacen,
-                u.nombre AS usuario,
-                mi.cantidad,
-                mi.cantidad_anterior,
-                mi.cantidad_nueva,
-                mi.motivo,
-                prov.nombre AS proveedor
-            FROM movimientos_inventario mi
-            INNER JOIN productos p ON mi.fk_producto = p.id
-            INNER JOIN almacenes a ON mi.fk_almacen = a.id
-            INNER JOIN usuarios u ON mi.fk_usuario = u.id
-            LEFT JOIN proveedores prov ON mi.fk_proveedor = prov.id
-            WHERE 1=1
-        """
-
-        values = {}
-
-        # Filtros opcionales solo por fecha
-        if fecha_inicio:
-            query += " AND DATE(mi.fecha_movimiento) >= :fecha_inicio"
-            values["fecha_inicio"] = fecha_inicio
-
-        if fecha_fin:
-            query += " AND DATE(mi.fecha_movimiento) <= :fecha_fin"
-            values["fecha_fin"] = fecha_fin
-
-        query += " ORDER BY mi.fecha_movimiento DESC"
-
-        rows = await db.fetch_all(query=query, values=values)
-
-        if not rows:
-            raise HTTPException(
-                status_code=404,
-                detail="No se encontraron movimientos en el período especificado",
+        almacen = await get_nombre_almacen(almacen_id)
+        resumen_rows, detalle, filas = await _leer_reporte(
+            query_resumen_movimientos(fecha_inicio, fecha_fin, almacen_id),
+            None if solo_resumen else query_movimientos(fecha_inicio, fecha_fin, almacen_id),
+        )
+        try:
+            resumen = armar_resumen("movimientos", resumen_rows)
+
+            if al_consultar:
+                al_consultar(filas)
+            return await renderizar_pdf(
+                render_movimientos_pdf, resumen, detalle, fecha_inicio, fecha_fin, almacen
             )
+        finally:
+            _borrar(detalle)
 
-        # Crear PDF
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=30,
-            leftMargin=30,
-            topMargin=30,
-            bottomMargin=30,
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al generar reporte de movimientos: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al generar el reporte: {str(e)}"
         )
 
-        elements = []
-        styles = getSampleStyleSheet()
-
-        # Estilos personalizados
-        title_style = ParagraphStyle(
-            "CustomTitle",
-            parent=styles["Heading1"],
-            fontSize=18,
-            textColor=colors.HexColor("#1a237e"),
-            spaceAfter=20,
-            alignment=TA_CENTER,
-            fontName="Helvetica-Bold",
-        )
 
-        subtitle_style = ParagraphStyle(
-            "CustomSubtitle",
-            parent=styles["Normal"],
-            fontSize=10,
-            textColor=colors.black,
-            spaceAfter=12,
-            alignment=TA_CENTER,
-        )
+TIPOS_REPORTE = ("stock-bajo", "inventario-general", "movimientos")
+
 
-        # Título
-        titulo = Paragraph("Reporte General de Movimientos de Inventario", title_style)
-        elements.append(titulo)
+async def generar_reporte_pdf(tipo: str, params: dict, al_consultar=None) -> str:  # Genera cualquiera de los reportes a partir de su tipo y parámetros
+    solo_resumen = bool(params.get("solo_resumen"))
+    almacen_id = params.get("almacen_id")
+    if tipo == "stock-bajo":
+        return await generar_reporte_stock_bajo_pdf(solo_resumen, al_consultar, almacen_id)
+    if tipo == "inventario-general":
+        return await generar_reporte_inventario_general_pdf(solo_resumen, al_consultar, almacen_id)
+    return await generar_reporte_movimientos_pdf(
+        params.get("fecha_inicio"), params.get("fecha_fin"), solo_resumen, al_consultar, almacen_id
+    )
 
-        # Información del reporte
-        fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
-        info_reporte = f"Generado el: {fecha_actual}"
 
-        # Agregar período si se especificó
+def nombre_archivo_reporte(tipo: str, params: dict, extension: str = "pdf") -> str:  # Nombre de descarga según tipo y parámetros
+    nombre = f"reporte_{tipo.replace('-', '_')}"
+    if tipo == "movimientos":
+        fecha_inicio, fecha_fin = params.get("fecha_inicio"), params.get("fecha_fin")
+        # Nombre del archivo según fechas
         if fecha_inicio and fecha_fin:
-            info_reporte += f"<br/>Período: {fecha_inicio} al {fecha_fin}"
+            nombre += f"_{fecha_inicio}_al_{fecha_fin}"
         elif fecha_inicio:
-            info_reporte += f"<br/>Desde: {fecha_inicio}"
+            nombre += f"_desde_{fecha_inicio}"
         elif fecha_fin:
-            info_reporte += f"<br/>Hasta: {fecha_fin}"
+            nombre += f"_hasta_{fecha_fin}"
         else:
-            info_reporte += "<br/>Todos los movimientos registrados"
-
-        fecha_parrafo = Paragraph(info_reporte, subtitle_style)
-        elements.append(fecha_parrafo)
-        elements.append(Spacer(1, 20))
-
-        # Resumen estadístico
-        total_movimientos = len(rows)
-        entradas = sum(1 for r in rows if r["tipo_movimiento"] == "entrada")
-        salidas = sum(1 for r in rows if r["tipo_movimiento"] == "salida")
-        ajustes = sum(1 for r in rows if r["tipo_movimiento"] == "ajuste")
-        devoluciones = sum(1 for r in rows if r["tipo_movimiento"] == "devolucion")
-
-        # Contar almacenes únicos
-        almacenes_unicos = len(set(r["almacen"] for r in rows))
-        usuarios_unicos = len(set(r["usuario"] for r in rows))
-
-        resumen_data = [
-            ["Tipo de Movimiento", "Cantidad"],
-            ["Entradas", str(entradas)],
-            ["Salidas", str(salidas)],
-            ["Ajustes", str(ajustes)],
-            ["Devoluciones", str(devoluciones)],
-            ["TOTAL MOVIMIENTOS", str(total_movimientos)],
-            ["", ""],
-            ["Almacenes involucrados", str(almacenes_unicos)],
-            ["Usuarios que registraron", str(usuarios_unicos)],
-        ]
+            nombre += "_general"
+    if params.get("almacen_id") is not None:
+        nombre += f"_almacen_{params['almacen_id']}"
+    if params.get("solo_resumen"):
+        nombre += "_resumen"
+    return f"{nombre}.{extension}"
 
-        resumen_table = Table(resumen_data, colWidths=[3 * inch, 1.5 * inch])
-        resumen_table.setStyle(
-            TableStyle(
-                [
-                    ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
-                    ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-                    ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-                    ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-                    ("FONTSIZE", (0, 0), (-1, 0), 12),
-                    ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
-                    ("BACKGROUND", (0, 1), (-1, 5), colors.beige),
-                    ("GRID", (0, 0), (-1, 5), 1, colors.black),
-                    ("FONTNAME", (0, 5), (-1, 5), "Helvetica-Bold"),
-                    ("BACKGROUND", (0, 5), (-1, 5), colors.HexColor("#e0e0e0")),
-                    ("BACKGROUND", (0, 7), (-1, -1), colors.lightgrey),
-                    ("GRID", (0, 7), (-1, -1), 1, colors.black),
-                ]
-            )
-        )
 
-        elements.append(resumen_table)
-        elements.append(Spacer(1, 30))
+# Armado de los PDF: funciones sincrónicas de módulo para poder ejecutarlas en otro proceso
+
 
-        # Título de detalle
-        detalle_titulo = Paragraph("Detalle de Movimientos", title_style)
-        elements.append(detalle_titulo)
-        elements.append(Spacer(1, 12))
+def _archivo_temporal(sufijo: str = ".pdf") -> str:
+    fd, ruta = tempfile.mkstemp(suffix=sufijo, dir=REPORTES_TEMP_DIRECTORIO)
+    os.close(fd)
+    return ruta
 
-        # Tabla de movimientos
-        data = [
+
+def _en_archivo_temporal(armar, *args) -> str:  # Arma el PDF en un archivo temporal; si algo falla (en cualquier paso) se borra
+    ruta = _archivo_temporal()
+    try:
+        armar(ruta, *args)
+    except BaseException:
+        _borrar(ruta)
+        raise
+    return ruta
+
+
+class _ElementosPorBloques(list):  # Lista de flowables que se va completando a medida que ReportLab la consume
+    # doc.build() saca los elementos del principio de la lista de a uno: si las tablas del detalle se agregan
+    # recién cuando la lista se está por vaciar, en memoria solo hay unas pocas tablas a la vez
+    def __init__(self, elementos, pendientes):
+        super().__init__(elementos)
+        self._pendientes = pendientes
+
+    def _completar(self):
+        while self._pendientes is not None and list.__len__(self) < 3:
+            try:
+                self.append(next(self._pendientes))
+            except StopIteration:
+                self._pendientes = None
+
+    def __len__(self):
+        self._completar()
+        return list.__len__(self)
+
+    def __getitem__(self, indice):
+        self._completar()
+        return list.__getitem__(self, indice)
+
+
+def _tablas_por_bloques(encabezado, bloques, celdas, anchos, estilo, estilo_fila=None):  # Una tabla por bloque de REPORTES_FILAS_POR_TABLA filas
+    # Una sola Table con todas las filas hace que ReportLab la vuelva a medir y partir en cada página
+    # (costo y memoria crecen con el total). Con bloques chicos el trabajo por página queda acotado,
+    # y repeatRows=1 repite el encabezado cuando un bloque cruza de página
+    for bloque in bloques:
+        data = [encabezado] + [celdas(row) for row in bloque]
+        table_style = list(estilo)
+        if estilo_fila:
+            for i, row in enumerate(bloque, start=1):
+                table_style.extend(estilo_fila(i, row))
+        table = Table(data, colWidths=anchos, repeatRows=1)
+        table.setStyle(TableStyle(table_style))
+        yield table
+
+
+def render_stock_bajo_pdf(
+    resumen: dict, detalle: str | None = None, almacen: str = None
+) -> str:  # Arma el PDF de stock bajo (corre en el pool de procesos); sin detalle, solo el resumen
+    return _en_archivo_temporal(_armar_stock_bajo_pdf, resumen, detalle, almacen)
+
+
+def _armar_stock_bajo_pdf(ruta: str, resumen: dict, detalle: str | None, almacen: str | None):
+    doc = SimpleDocTemplate(
+        ruta,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30,
+    )
+
+    elements = []
+    styles = getSampleStyleSheet()
+
+    #  ENCABEZADO
+    title_style = ParagraphStyle(
+        "CustomTitle",
+        parent=styles["Heading1"],
+        fontSize=18,
+        textColor=colors.HexColor("#1a237e"),
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        fontName="Helvetica-Bold",
+    )
+
+    subtitle_style = ParagraphStyle(
+        "CustomSubtitle",
+        parent=styles["Normal"],
+        fontSize=11,
+        textColor=colors.black,
+        alignment=TA_CENTER,
+    )
+
+    titulo = Paragraph("Reporte de Stock Bajo", title_style)
+    elements.append(titulo)
+
+    fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
+    info_reporte = f"Generado el: {fecha_actual}"
+    if almacen:
+        info_reporte += f"<br/>Almacén: {almacen}"
+    fecha = Paragraph(info_reporte, subtitle_style)
+    elements.append(fecha)
+    elements.append(Spacer(1, 20))
+
+    # RESUMEN (calculado en la BD)
+    total_productos = resumen.get("TOTAL", 0)
+    criticos = resumen.get("CRÍTICO", 0)
+    urgentes = resumen.get("URGENTE", 0)
+    bajos = resumen.get("BAJO", 0)
+
+    resumen_data = [
+        ["Estado", "Cantidad"],
+        ["CRÍTICO (sin stock)", str(criticos)],
+        ["URGENTE (< 50% mínimo)", str(urgentes)],
+        ["BAJO (< stock mínimo)", str(bajos)],
+        ["TOTAL", str(total_productos)],
+    ]
+
+    resumen_table = Table(resumen_data, colWidths=[3 * inch, 1.5 * inch])
+    resumen_table.setStyle(
+        TableStyle(
             [
-                "Fecha",
-                "Tipo",
-                "Producto",
-                "Almacén",
-                "Cant.",
-                "Stock Ant.",
-                "Stock Nuevo",
-                "Usuario",
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, 0), 12),
+                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+                ("GRID", (0, 0), (-1, -1), 1, colors.black),
+                ("FONTNAME", (0, -1), (-1, -1), "Helvetica-Bold"),
+                ("BACKGROUND", (0, -1), (-1, -1), colors.HexColor("#e0e0e0")),
             ]
-        ]
+        )
+    )
 
-        for row in rows:
-            tipo = row["tipo_movimiento"].upper()
-
-            data.append(
-                [
-                    str(row["fecha"]),
-                    tipo[:3],  # Abreviado para ahorrar espacio
-                    str(row["producto"])[:20],
-                    str(row["almacen"])[:15],
-                    str(row["cantidad"]),
-                    str(row["cantidad_anterior"]),
-                    str(row["cantidad_nueva"]),
-                    str(row["usuario"])[:15],
-                ]
-            )
+    elements.append(resumen_table)
+    elements.append(Spacer(1, 30))
 
-        # Crear tabla con anchos ajustados
-        table = Table(
-            data,
-            colWidths=[
-                1.0 * inch,  # Fecha
-                0.5 * inch,  # Tipo
-                1.8 * inch,  # Producto
-                1.0 * inch,  # Almacén
-                0.5 * inch,  # Cantidad
-                0.7 * inch,  # Stock Ant
-                0.8 * inch,  # Stock Nuevo
-                1.0 * inch,  # Usuario
-            ],
-        )
+    if detalle is None:  # Modo solo resumen
+        doc.build(elements)
+        return
+
+    # DETALLE
+    detalle_titulo = Paragraph("Detalle de Productos", title_style)
+    elements.append(detalle_titulo)
+    elements.append(Spacer(1, 12))
+
+    encabezado = [
+        "Código",
+        "Producto",
+        "Almacén",
+        "Stock Actual",
+        "Mínimo",
+        "Déficit",
+        "Estado",
+    ]
+
+    def celdas(row):
+        return [
+            str(row["codigo"]),
+            str(row["producto"])[:28],
+            str(row["almacen"])[:18],
+            str(row["stock_actual"]),
+            str(row["stock_minimo"]),
+            str(row["deficit"]),
+            str(row["estado"]),
+        ]
 
-        # Estilo base de la tabla
-        table_style = [
-            ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
-            ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
-            ("ALIGN", (0, 0), (-1, -1), "CENTER"),
-            ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
-            ("FONTSIZE", (0, 0), (-1, 0), 8),
-            ("BOTTOMPADDING", (0, 0), (-1, 0), 10),
-            ("BACKGROUND", (0, 1), (-1, -1), colors.white),
-            ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
-            ("FONTSIZE", (0, 1), (-1, -1), 7),
-            ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    # Anchos fijos: cada bloque es una tabla aparte y tienen que quedar alineadas
+    anchos = [
+        0.8 * inch,  # Código
+        1.9 * inch,  # Producto
+        1.3 * inch,  # Almacén
+        0.8 * inch,  # Stock Actual
+        0.7 * inch,  # Mínimo
+        0.7 * inch,  # Déficit
+        0.8 * inch,  # Estado
+    ]
+
+    estilo = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 10),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("FONTSIZE", (0, 1), (-1, -1), 8),
+        ("ROWBACKGROUNDS", (0, 1), (-1, -1), [colors.white, colors.lightgrey]),
+    ]
+
+    # Colorear columna de estado
+    def estilo_fila(i, row):
+        if row["estado"] == "CRÍTICO":
+            return [
+                ("BACKGROUND", (-1, i), (-1, i), colors.red),
+                ("TEXTCOLOR", (-1, i), (-1, i), colors.white),
+            ]
+        if row["estado"] == "URGENTE":
+            return [("BACKGROUND", (-1, i), (-1, i), colors.orange)]
+        return [("BACKGROUND", (-1, i), (-1, i), colors.yellow)]
+
+    tablas = _tablas_por_bloques(encabezado, _leer_bloques(detalle), celdas, anchos, estilo, estilo_fila)
+    doc.build(_ElementosPorBloques(elements, tablas))
+
+
+def render_inventario_general_pdf(
+    resumen: dict, detalle: str | None = None, almacen: str = None
+) -> str:  # Arma el PDF de inventario general (corre en el pool de procesos); sin detalle, solo el resumen
+    return _en_archivo_temporal(_armar_inventario_general_pdf, resumen, detalle, almacen)
+
+
+def _armar_inventario_general_pdf(ruta: str, resumen: dict, detalle: str | None, almacen: str | None):
+    doc = SimpleDocTemplate(
+        ruta,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30,
+    )
+
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Título
+    title_style = ParagraphStyle(
+        "CustomTitle",
+        parent=styles["Heading1"],
+        fontSize=18,
+        textColor=colors.HexColor("#1a237e"),
+        spaceAfter=30,
+        alignment=TA_CENTER,
+        fontName="Helvetica-Bold",
+    )
+
+    titulo = Paragraph("Reporte de Inventario General", title_style)
+    elements.append(titulo)
+
+    fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
+    info_reporte = f"Generado el: {fecha_actual}"
+    if almacen:
+        info_reporte += f"<br/>Almacén: {almacen}"
+    fecha = Paragraph(
+        info_reporte,
+        ParagraphStyle(
+            "subtitle", parent=styles["Normal"], fontSize=11, alignment=TA_LEFT
+        ),
+    )
+    elements.append(fecha)
+    elements.append(Spacer(1, 20))
+
+    # Resumen (calculado en la BD)
+    valor_total = float(resumen["valor_total"])
+
+    resumen_parrafo = Paragraph(
+        f"<b>Valor total del inventario:</b> ${valor_total:,.2f}",
+        styles["Normal"],
+    )
+    elements.append(resumen_parrafo)
+    elements.append(Spacer(1, 20))
+
+    if detalle is None:  # Modo solo resumen
+        doc.build(elements)
+        return
+
+    # Tabla (anchos fijos para que todos los bloques queden alineados)
+    encabezado = [
+        "Código",
+        "Producto",
+        "Categoría",
+        "Almacén",
+        "Disponible",
+        "Reservada",
+        "Precio",
+        "Valor",
+    ]
+
+    def celdas(row):
+        return [
+            str(row["codigo"]),
+            str(row["producto"])[:20],
+            str(row["categoria"])[:15],
+            str(row["almacen"])[:15],
+            str(row["disponible"]),
+            str(row["reservada"]),
+            f"${float(row['precio']):,.2f}",
+            f"${float(row['valor_stock']):,.2f}",
         ]
 
-        # Colorear según tipo de movimiento
-        for i, row in enumerate(rows, start=1):
-            tipo = row["tipo_movimiento"]
-            if tipo == "entrada":
-                table_style.append(("BACKGROUND", (1, i), (1, i), colors.lightgreen))
-            elif tipo == "salida":
-                table_style.append(("BACKGROUND", (1, i), (1, i), colors.lightcoral))
-            elif tipo == "ajuste":
-                table_style.append(("BACKGROUND", (1, i), (1, i), colors.lightyellow))
-            elif tipo == "devolucion":
-                table_style.append(("BACKGROUND", (1, i), (1, i), colors.lightblue))
+    anchos = [
+        0.8 * inch,  # Código
+        1.5 * inch,  # Producto
+        1.0 * inch,  # Categoría
+        1.0 * inch,  # Almacén
+        0.7 * inch,  # Disponible
+        0.7 * inch,  # Reservada
+        0.8 * inch,  # Precio
+        0.9 * inch,  # Valor
+    ]
+
+    estilo = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 9),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("FONTSIZE", (0, 1), (-1, -1), 7),
+        (
+            "ROWBACKGROUNDS",
+            (0, 1),
+            (-1, -1),
+            [colors.white, colors.lightgrey],
+        ),
+    ]
+
+    tablas = _tablas_por_bloques(encabezado, _leer_bloques(detalle), celdas, anchos, estilo)
+    doc.build(_ElementosPorBloques(elements, tablas))
+
+
+def render_movimientos_pdf(
+    resumen: dict,
+    detalle: str | None = None,
+    fecha_inicio: date = None,
+    fecha_fin: date = None,
+    almacen: str = None,
+) -> str:  # Arma el PDF de movimientos (corre en el pool de procesos); sin detalle, solo el resumen
+    return _en_archivo_temporal(_armar_movimientos_pdf, resumen, detalle, fecha_inicio, fecha_fin, almacen)
+
+
+def _armar_movimientos_pdf(
+    ruta: str, resumen: dict, detalle: str | None, fecha_inicio: date, fecha_fin: date, almacen: str | None
+):
+    doc = SimpleDocTemplate(
+        ruta,
+        pagesize=A4,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30,
+    )
+
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Estilos personalizados
+    title_style = ParagraphStyle(
+        "CustomTitle",
+        parent=styles["Heading1"],
+        fontSize=18,
+        textColor=colors.HexColor("#1a237e"),
+        spaceAfter=20,
+        alignment=TA_CENTER,
+        fontName="Helvetica-Bold",
+    )
+
+    subtitle_style = ParagraphStyle(
+        "CustomSubtitle",
+        parent=styles["Normal"],
+        fontSize=10,
+        textColor=colors.black,
+        spaceAfter=12,
+        alignment=TA_CENTER,
+    )
+
+    # Título
+    titulo = Paragraph("Reporte General de Movimientos de Inventario", title_style)
+    elements.append(titulo)
+
+    # Información del reporte
+    fecha_actual = datetime.now().strftime("%d/%m/%Y %H:%M")
+    info_reporte = f"Generado el: {fecha_actual}"
+
+    # Agregar período si se especificó
+    if fecha_inicio and fecha_fin:
+        info_reporte += f"<br/>Período: {fecha_inicio} al {fecha_fin}"
+    elif fecha_inicio:
+        info_reporte += f"<br/>Desde: {fecha_inicio}"
+    elif fecha_fin:
+        info_reporte += f"<br/>Hasta: {fecha_fin}"
+    else:
+        info_reporte += "<br/>Todos los movimientos registrados"
+
+    if almacen:
+        info_reporte += f"<br/>Almacén: {almacen}"
+
+    fecha_parrafo = Paragraph(info_reporte, subtitle_style)
+    elements.append(fecha_parrafo)
+    elements.append(Spacer(1, 20))
+
+    # Resumen estadístico (calculado en la BD)
+    total_movimientos = resumen["total"]
+    entradas = resumen["entradas"]
+    salidas = resumen["salidas"]
+    ajustes = resumen["ajustes"]
+    devoluciones = resumen["devoluciones"]
+    almacenes_unicos = resumen["almacenes"]
+    usuarios_unicos = resumen["usuarios"]
+
+    resumen_data = [
+        ["Tipo de Movimiento", "Cantidad"],
+        ["Entradas", str(entradas)],
+        ["Salidas", str(salidas)],
+        ["Ajustes", str(ajustes)],
+        ["Devoluciones", str(devoluciones)],
+        ["TOTAL MOVIMIENTOS", str(total_movimientos)],
+        ["", ""],
+        ["Almacenes involucrados", str(almacenes_unicos)],
+        ["Usuarios que registraron", str(usuarios_unicos)],
+    ]
+
+    resumen_table = Table(resumen_data, colWidths=[3 * inch, 1.5 * inch])
+    resumen_table.setStyle(
+        TableStyle(
+            [
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
+                ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+                ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+                ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+                ("FONTSIZE", (0, 0), (-1, 0), 12),
+                ("BOTTOMPADDING", (0, 0), (-1, 0), 12),
+                ("BACKGROUND", (0, 1), (-1, 5), colors.beige),
+                ("GRID", (0, 0), (-1, 5), 1, colors.black),
+                ("FONTNAME", (0, 5), (-1, 5), "Helvetica-Bold"),
+                ("BACKGROUND", (0, 5), (-1, 5), colors.HexColor("#e0e0e0")),
+                ("BACKGROUND", (0, 7), (-1, -1), colors.lightgrey),
+                ("GRID", (0, 7), (-1, -1), 1, colors.black),
+            ]
+        )
+    )
 
-        table.setStyle(TableStyle(table_style))
-        elements.append(table)
+    elements.append(resumen_table)
+    elements.append(Spacer(1, 30))
 
-        # Construir PDF
+    if detalle is None:  # Modo solo resumen
         doc.build(elements)
-        buffer.seek(0)
-        return buffer
+        return
+
+    # Título de detalle
+    detalle_titulo = Paragraph("Detalle de Movimientos", title_style)
+    elements.append(detalle_titulo)
+    elements.append(Spacer(1, 12))
+
+    # Tabla de movimientos
+    encabezado = [
+        "Fecha",
+        "Tipo",
+        "Producto",
+        "Almacén",
+        "Cant.",
+        "Stock Ant.",
+        "Stock Nuevo",
+        "Usuario",
+    ]
+
+    def celdas(row):
+        return [
+            str(row["fecha"]),
+            row["tipo_movimiento"].upper()[:3],  # Abreviado para ahorrar espacio
+            str(row["producto"])[:20],
+            str(row["almacen"])[:15],
+            str(row["cantidad"]),
+            str(row["cantidad_anterior"]),
+            str(row["cantidad_nueva"]),
+            str(row["usuario"])[:15],
+        ]
 
-    except HTTPException:
-        raise
-    except Exception as e:
-        print(f"Error al generar reporte de movimientos: {e}")
-        raise HTTPException(
-            status_code=500, detail=f"Error al generar el reporte: {str(e)}"
-        )
+    # Anchos ajustados
+    anchos = [
+        1.0 * inch,  # Fecha
+        0.5 * inch,  # Tipo
+        1.8 * inch,  # Producto
+        1.0 * inch,  # Almacén
+        0.5 * inch,  # Cantidad
+        0.7 * inch,  # Stock Ant
+        0.8 * inch,  # Stock Nuevo
+        1.0 * inch,  # Usuario
+    ]
+
+    # Estilo base de la tabla
+    estilo = [
+        ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#1a237e")),
+        ("TEXTCOLOR", (0, 0), (-1, 0), colors.whitesmoke),
+        ("ALIGN", (0, 0), (-1, -1), "CENTER"),
+        ("FONTNAME", (0, 0), (-1, 0), "Helvetica-Bold"),
+        ("FONTSIZE", (0, 0), (-1, 0), 8),
+        ("BOTTOMPADDING", (0, 0), (-1, 0), 10),
+        ("BACKGROUND", (0, 1), (-1, -1), colors.white),
+        ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+        ("FONTSIZE", (0, 1), (-1, -1), 7),
+        ("VALIGN", (0, 0), (-1, -1), "MIDDLE"),
+    ]
+
+    # Colorear según tipo de movimiento (solo dentro de cada bloque)
+    colores_tipo = {
+        "entrada": colors.lightgreen,
+        "salida": colors.lightcoral,
+        "ajuste": colors.lightyellow,
+        "devolucion": colors.lightblue,
+    }
+
+    def estilo_fila(i, row):
+        color = colores_tipo.get(row["tipo_movimiento"])
+        return [("BACKGROUND", (1, i), (1, i), color)] if color else []
+
+    tablas = _tablas_por_bloques(encabezado, _leer_bloques(detalle), celdas, anchos, estilo, estilo_fila)
+    doc.build(_ElementosPorBloques(elements, tablas))
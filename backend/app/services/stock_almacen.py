@@ -1,6 +1,7 @@
-from typing import List
+from typing import AsyncIterator, List
 from fastapi import HTTPException
 from app.config.database import db
+from app.services import reporte_cache, stock_cache
 from app.schemas.stock_almacen import Stock_AlmacenIn, Stock_AlmacenOut, StockConProductoOut, StockDetalladoOut, StockPorAlmacenOut, StockPorProductoOut
 
 
@@ -18,9 +19,60 @@ async def get_stock_almacen_by_id(id: int) -> Stock_AlmacenOut:  #Trae el stock_
 
 # CRUD STOCK_ALMACEN
 
-async def get_stock_detallado() -> List[StockDetalladoOut]: # OBTENER un reporte detallado del stock en todos los almacenes, incluyendo el nombre del producto y del almacén, y la cantidad total disponible y reservada por producto en cada almacén
-    query = """
+def armar_cursor_stock(row) -> str:  # Cursor de la página siguiente a partir de la última fila de esta
+    return f"{row['fk_producto']}:{row['fk_almacen']}"
+
+
+def parsear_cursor_stock(cursor: str | None) -> tuple[int, int] | None:  # El cursor es "fk_producto:fk_almacen" de la última fila vista
+    if not cursor:
+        return None
+    try:
+        fk_producto, fk_almacen = (int(v) for v in cursor.split(":"))
+        return fk_producto, fk_almacen
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _filtros_stock_detallado(
+    almacen_id: int | None,
+    categoria_id: int | None,
+    solo_con_stock: bool,
+    cursor: tuple[int, int] | None,
+) -> tuple[str, dict]:
+    condiciones = []
+    values = {}
+
+    if almacen_id is not None:
+        condiciones.append("sa.fk_almacen = :almacen_id")
+        values["almacen_id"] = almacen_id
+    if categoria_id is not None:
+        condiciones.append("p.fk_categoria = :categoria_id")
+        values["categoria_id"] = categoria_id
+    if solo_con_stock:
+        condiciones.append("sa.cantidad_disponible > 0")
+    if cursor:  # Keyset: seguir después de la última fila vista (sin OFFSET)
+        condiciones.append(
+            "(sa.fk_producto > :cursor_producto OR (sa.fk_producto = :cursor_producto AND sa.fk_almacen > :cursor_almacen))"
+        )
+        values["cursor_producto"], values["cursor_almacen"] = cursor
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    return where, values
+
+
+async def get_stock_detallado(
+    almacen_id: int | None = None,
+    categoria_id: int | None = None,
+    solo_con_stock: bool = False,
+    cursor: str | None = None,
+    limite: int | None = None,
+) -> AsyncIterator[StockDetalladoOut]:  # OBTENER un reporte detallado del stock en todos los almacenes, incluyendo el nombre del producto y del almacén, y la cantidad total disponible y reservada por producto en cada almacén
+    # Se agrupa por ids (dos productos con el mismo nombre ya no se mezclan) y las filas se devuelven de a una
+    where, values = _filtros_stock_detallado(almacen_id, categoria_id, solo_con_stock, parsear_cursor_stock(cursor))
+    query = f"""
         SELECT 
+            p.id AS fk_producto,
+            a.id AS fk_almacen,
             p.nombre AS producto,
             a.nombre AS almacen,
             SUM(sa.cantidad_disponible) AS total_disponible,
@@ -28,21 +80,63 @@ async def get_stock_detallado() -> List[StockDetalladoOut]: # OBTENER un reporte
         FROM stock_almacen sa
         INNER JOIN productos p ON sa.fk_producto = p.id
         INNER JOIN almacenes a ON sa.fk_almacen = a.id
-        GROUP BY p.nombre, a.nombre
-        ORDER BY p.nombre, a.nombre
+        {where}
+        GROUP BY p.id, a.id
+        ORDER BY p.id, a.id
     """
-    rows = await db.fetch_all(query=query)
-    return rows
+    if limite is not None:
+        query += " LIMIT :limite"
+        values["limite"] = limite
+
+    async for row in db.iterate(query=query, values=values):
+        yield row
+
+
+async def get_pagina_stock_detallado(
+    almacen_id: int | None = None,
+    categoria_id: int | None = None,
+    solo_con_stock: bool = False,
+    cursor: str | None = None,
+    limite: int = 100,
+) -> tuple[List[StockDetalladoOut], str | None]:  # OBTENER una página del stock detallado y el cursor de la siguiente (None si es la última)
+    # La misma consulta trae una fila de más: si llega, hay página siguiente y el cursor es la última fila de esta
+    filas = [
+        row
+        async for row in get_stock_detallado(almacen_id, categoria_id, solo_con_stock, cursor, limite + 1)
+    ]
+    if len(filas) <= limite:
+        return filas, None
+    filas = filas[:limite]
+    return filas, armar_cursor_stock(filas[-1])
+
+
+# Solo con la caché habilitada (es una subconsulta por fila). Sale del mismo SELECT que la cantidad:
+# la caché lo usa para ignorar write-through atrasados
+_ULTIMO_MOVIMIENTO_ID = """,
+    (
+        SELECT MAX(mi.id) FROM movimientos_inventario mi
+        WHERE mi.fk_producto = sa.fk_producto AND mi.fk_almacen = sa.fk_almacen
+    ) AS ultimo_movimiento_id
+"""
 
 
 async def get_stock_con_producto(producto_id: int) -> List[StockConProductoOut]:  # OBTENER el stock de un producto específico junto con su nombre
-    query = """
-        SELECT sa.*, p.nombre AS nombre_producto
+    cacheado = stock_cache.obtener_por_producto(producto_id)
+    if cacheado is not None:
+        return cacheado
+
+    generacion = stock_cache.generacion_por_producto(producto_id)  # Antes de leer: si hay una escritura en el medio, no se cachea
+    query = f"""
+        SELECT
+            sa.*,
+            p.nombre AS nombre_producto
+            {_ULTIMO_MOVIMIENTO_ID if stock_cache.CACHE_HABILITADO else ""}
         FROM stock_almacen sa
         INNER JOIN productos p ON sa.fk_producto = p.id
         WHERE p.id = :producto_id
     """
     rows = await db.fetch_all(query=query, values={"producto_id": producto_id})
+    stock_cache.guardar_por_producto(producto_id, rows, generacion)
     return rows
 
 
@@ -57,13 +151,19 @@ async def get_stock_por_producto() -> List[StockPorProductoOut]:   # OBTENER la
 
 
 async def get_stock_por_almacen(almacen_id: int) -> List[StockPorAlmacenOut]:   # OBTENER el stock de un almacén específico
-    query = """
+    cacheado = stock_cache.obtener_por_almacen(almacen_id)
+    if cacheado is not None:
+        return cacheado
+
+    generacion = stock_cache.generacion_por_almacen(almacen_id)
+    query = f"""
         SELECT 
             p.id AS fk_producto,
             p.codigo AS codigo_producto,
             p.nombre AS nombre_producto,
             sa.cantidad_disponible AS cantidad_disponible,
             sa.cantidad_reservada AS cantidad_reservada
+            {_ULTIMO_MOVIMIENTO_ID if stock_cache.CACHE_HABILITADO else ""}
         FROM stock_almacen sa
         INNER JOIN productos p ON sa.fk_producto = p.id
         WHERE sa.fk_almacen = :almacen_id
@@ -77,6 +177,7 @@ async def get_stock_por_almacen(almacen_id: int) -> List[StockPorAlmacenOut]:
             detail=f"No se encontró stock en el almacén con id {almacen_id}",
         )
 
+    stock_cache.guardar_por_almacen(almacen_id, rows, generacion)
     return rows
 
 
@@ -123,6 +224,8 @@ async def create_stock_almacen(stock_almacen: Stock_AlmacenIn, usuario_actual) -
             VALUES (:fk_producto, :fk_almacen, :cantidad_disponible, :cantidad_reservada)
         """
         last_record_id = await db.execute(query=query, values=stock_almacen.dict())  # Crea y retorna el nuevo stock_almacén
+        stock_cache.invalidar_stock(stock_almacen.fk_producto, stock_almacen.fk_almacen)
+        reporte_cache.invalidar_reportes()
         return await get_stock_almacen_by_id(last_record_id)
     except HTTPException:
         raise
@@ -188,9 +291,17 @@ async def update_stock_almacen(stock_almacen_id: int, stock_almacen: Stock_Almac
         """
         values = {**stock_almacen.dict(), "id": stock_almacen_id}
         await db.execute(query=query, values=values)
+        stock_cache.invalidar_stock(current["fk_producto"], current["fk_almacen"])
+        stock_cache.invalidar_stock(stock_almacen.fk_producto, stock_almacen.fk_almacen)
+        reporte_cache.invalidar_reportes()
         return await get_stock_almacen_by_id(stock_almacen_id)
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al actualizar stock_almacen: {e}")
 
+
+async def get_metricas_cache(usuario_actual) -> dict:  # OBTENER las métricas de la caché de stock (aciertos, antigüedad, etc.)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver las métricas de la caché")
+    return stock_cache.metricas()
@@ -0,0 +1,264 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from app.config.database import db
+from app.services.movimiento_feed import limite_asentado
+
+load_dotenv()
+
+# Caché en memoria (por proceso) de las filas de stock_almacen con el nombre del producto.
+# Es opcional: se activa con STOCK_CACHE_HABILITADO=true
+CACHE_HABILITADO = os.getenv("STOCK_CACHE_HABILITADO", "false").lower() == "true"
+CACHE_CAPACIDAD = int(os.getenv("STOCK_CACHE_CAPACIDAD", "1000"))  # Cantidad máxima de claves (producto o almacén)
+CACHE_TTL_SEGUNDOS = int(os.getenv("STOCK_CACHE_TTL_SEGUNDOS", "300"))  # Red de seguridad para cambios hechos por fuera de la API
+# Cada worker tiene su propia caché: los movimientos registrados por los otros se leen de la tabla cada tanto
+CACHE_SYNC_SEGUNDOS = float(os.getenv("STOCK_CACHE_SYNC_SEGUNDOS", "2"))
+# Los movimientos no asentados (ver movimiento_feed.limite_asentado) se vuelven a leer en la próxima consulta.
+# Este margen solo se usa si no se puede leer information_schema.innodb_trx
+CACHE_SYNC_MARGEN_SEGUNDOS = int(os.getenv("STOCK_CACHE_SYNC_MARGEN_SEGUNDOS", "10"))
+CACHE_SYNC_LOTE = 1000
+
+_tarea_sync: asyncio.Task | None = None
+
+
+class CacheStock:
+    # Guarda listas de filas bajo dos tipos de clave:
+    #   ("producto", id) -> lo que devuelve get_stock_con_producto
+    #   ("almacen", id)  -> lo que devuelve get_stock_por_almacen
+    # Las escrituras de stock actualizan las filas en el lugar (write-through) para que la caché no quede vieja.
+    # Cada fila lleva ultimo_movimiento_id (el último movimiento que refleja): un write-through más viejo que eso
+    # llegó tarde o fuera de orden y se ignora, así el valor nunca vuelve para atrás.
+    # Cada clave tiene además una generación que sube con cada escritura: una lectura de la BD que empezó antes
+    # de una escritura no se guarda (si no, podría pisar el write-through con datos de antes)
+
+    def __init__(self, capacidad: int, ttl_segundos: int):
+        self.capacidad = capacidad
+        self.ttl_segundos = ttl_segundos
+        self._entradas = OrderedDict()  # clave -> {"filas": [...], "cargado_en": t, "actualizado_en": t}
+        self._generaciones = {}  # clave -> escrituras vistas (también de claves que no están cargadas)
+        self._generacion_global = 0  # Sube con invalidar_tipo
+        self.aciertos = 0
+        self.fallos = 0
+        self.escrituras = 0
+        self.escrituras_viejas = 0
+        self.lecturas_descartadas = 0
+        self.invalidaciones = 0
+        self.desalojos = 0
+        self._edad_servida_total = 0.0
+        self._edad_servida_max = 0.0
+
+    def obtener(self, clave):  # Devuelve las filas cacheadas o None si hay que ir a la BD
+        entrada = self._entradas.get(clave)
+        ahora = time.monotonic()
+
+        if entrada is None or ahora - entrada["cargado_en"] > self.ttl_segundos:
+            self._entradas.pop(clave, None)
+            self.fallos += 1
+            return None
+
+        self._entradas.move_to_end(clave)  # LRU: la más usada pasa al final
+        self.aciertos += 1
+
+        # Antigüedad de lo servido desde la última vez que se confirmó contra la BD o una escritura
+        edad = ahora - entrada["actualizado_en"]
+        self._edad_servida_total += edad
+        self._edad_servida_max = max(self._edad_servida_max, edad)
+
+        return [dict(fila) for fila in entrada["filas"]]
+
+    def generacion(self, clave) -> tuple:  # Se toma ANTES de leer de la BD y se pasa a guardar()
+        return self._generacion_global, self._generaciones.get(clave, 0)
+
+    def _avanzar_generacion(self, clave):
+        self._generaciones[clave] = self._generaciones.get(clave, 0) + 1
+
+    def guardar(self, clave, filas, generacion: tuple | None = None):
+        if generacion is not None and generacion != self.generacion(clave):  # Hubo una escritura durante la lectura
+            self.lecturas_descartadas += 1
+            return
+        ahora = time.monotonic()
+        self._entradas[clave] = {
+            "filas": [dict(fila) for fila in filas],
+            "cargado_en": ahora,
+            "actualizado_en": ahora,
+        }
+        self._entradas.move_to_end(clave)
+
+        while len(self._entradas) > self.capacidad:
+            self._entradas.popitem(last=False)
+            self.desalojos += 1
+
+    def actualizar_stock(self, fk_producto: int, fk_almacen: int, movimiento_id: int, cambios: dict):  # Write-through de una fila de stock
+        self.escrituras += 1
+        ahora = time.monotonic()
+
+        for clave in (("producto", fk_producto), ("almacen", fk_almacen)):
+            self._avanzar_generacion(clave)
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                continue
+
+            fila = next(
+                (f for f in entrada["filas"] if f["fk_producto"] == fk_producto and f.get("fk_almacen", fk_almacen) == fk_almacen),
+                None,
+            )
+            if fila is None:  # Fila nueva (ej: primer ingreso a un almacén): no se puede armar sin el JOIN, se invalida
+                self.invalidar(clave)
+                continue
+
+            if (fila.get("ultimo_movimiento_id") or 0) >= movimiento_id:  # Ya refleja este movimiento o uno posterior
+                self.escrituras_viejas += 1
+                continue
+
+            for campo, valor in cambios.items():
+                if campo in fila:
+                    fila[campo] = valor
+            fila["ultimo_movimiento_id"] = movimiento_id
+            entrada["actualizado_en"] = ahora
+
+    def invalidar(self, clave):
+        self._avanzar_generacion(clave)
+        if self._entradas.pop(clave, None) is not None:
+            self.invalidaciones += 1
+
+    def invalidar_tipo(self, tipo: str):  # Invalida todas las claves de un tipo ("producto" o "almacen")
+        self._generacion_global += 1
+        for clave in [c for c in self._entradas if c[0] == tipo]:
+            self.invalidar(clave)
+
+    def metricas(self) -> dict:
+        lecturas = self.aciertos + self.fallos
+        return {
+            "habilitado": CACHE_HABILITADO,
+            "claves": len(self._entradas),
+            "capacidad": self.capacidad,
+            "ttl_segundos": self.ttl_segundos,
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+            "tasa_aciertos": round(self.aciertos / lecturas, 4) if lecturas else 0.0,
+            "escrituras": self.escrituras,
+            "escrituras_viejas": self.escrituras_viejas,
+            "lecturas_descartadas": self.lecturas_descartadas,
+            "invalidaciones": self.invalidaciones,
+            "desalojos": self.desalojos,
+            "edad_promedio_servida_segundos": round(self._edad_servida_total / self.aciertos, 3) if self.aciertos else 0.0,
+            "edad_maxima_servida_segundos": round(self._edad_servida_max, 3),
+        }
+
+
+cache_stock = CacheStock(CACHE_CAPACIDAD, CACHE_TTL_SEGUNDOS)
+
+
+# Funciones que usan los servicios (no hacen nada si la caché está deshabilitada)
+
+
+def obtener_por_producto(producto_id: int):
+    return cache_stock.obtener(("producto", producto_id)) if CACHE_HABILITADO else None
+
+
+def obtener_por_almacen(almacen_id: int):
+    return cache_stock.obtener(("almacen", almacen_id)) if CACHE_HABILITADO else None
+
+
+def generacion_por_producto(producto_id: int):  # Tomarla antes de la consulta y pasarla a guardar_por_producto
+    return cache_stock.generacion(("producto", producto_id))
+
+
+def generacion_por_almacen(almacen_id: int):
+    return cache_stock.generacion(("almacen", almacen_id))
+
+
+def guardar_por_producto(producto_id: int, filas, generacion):
+    if CACHE_HABILITADO and filas:
+        cache_stock.guardar(("producto", producto_id), filas, generacion)
+
+
+def guardar_por_almacen(almacen_id: int, filas, generacion):
+    if CACHE_HABILITADO and filas:
+        cache_stock.guardar(("almacen", almacen_id), filas, generacion)
+
+
+def actualizar_desde_movimiento(movimiento):  # Write-through a partir de una fila de movimientos_inventario
+    if CACHE_HABILITADO:
+        cache_stock.actualizar_stock(
+            movimiento["fk_producto"],
+            movimiento["fk_almacen"],
+            movimiento["id"],
+            {
+                "cantidad_disponible": movimiento["cantidad_nueva"],
+                "fecha_ultima_actualizacion": movimiento["fecha_movimiento"],
+            },
+        )
+
+
+def invalidar_stock(fk_producto: int, fk_almacen: int):
+    if CACHE_HABILITADO:
+        cache_stock.invalidar(("producto", fk_producto))
+        cache_stock.invalidar(("almacen", fk_almacen))
+
+
+def invalidar_producto(fk_producto: int):  # Ej: cambió el nombre o el código del producto
+    if CACHE_HABILITADO:
+        cache_stock.invalidar(("producto", fk_producto))
+        cache_stock.invalidar_tipo("almacen")  # El producto puede estar en cualquier almacén cacheado
+
+
+def metricas() -> dict:
+    return cache_stock.metricas()
+
+
+# Sincronización entre workers: aplica los movimientos que registraron otros procesos
+
+
+async def sincronizar_movimientos(cursor: int) -> int:  # Aplica los movimientos posteriores al cursor; devuelve el cursor nuevo
+    # Se aplican todos los leídos (el write-through ignora lo que ya vio por ultimo_movimiento_id), pero el cursor
+    # solo avanza sobre los asentados: un id menor que todavía no confirmó se lee en la próxima pasada
+    rows = await db.fetch_all(
+        query="""
+            SELECT id, fk_producto, fk_almacen, cantidad_nueva, fecha_movimiento,
+                fecha_movimiento < :limite_asentado AS asentado
+            FROM movimientos_inventario
+            WHERE id > :cursor
+            ORDER BY id
+            LIMIT :limite
+        """,
+        values={
+            "cursor": cursor,
+            "limite_asentado": await limite_asentado(CACHE_SYNC_MARGEN_SEGUNDOS),
+            "limite": CACHE_SYNC_LOTE,
+        },
+    )
+    avanzar = True
+    for row in rows:
+        actualizar_desde_movimiento(row)
+        if avanzar and row["asentado"]:
+            cursor = row["id"]
+        else:
+            avanzar = False
+    return cursor
+
+
+async def _loop_sync():
+    cursor = None
+    while True:
+        try:
+            if cursor is None:  # Al arrancar la caché está vacía: alcanza con seguir desde el último movimiento
+                row = await db.fetch_one("SELECT COALESCE(MAX(id), 0) AS ultimo FROM movimientos_inventario")
+                cursor = row["ultimo"]
+            cursor = await sincronizar_movimientos(cursor)
+        except Exception as e:
+            print(f"❌Error al sincronizar la caché de stock: {e}")
+        await asyncio.sleep(CACHE_SYNC_SEGUNDOS)
+
+
+def iniciar_sync_stock_cache():
+    global _tarea_sync
+    if CACHE_HABILITADO:
+        _tarea_sync = asyncio.create_task(_loop_sync())
+
+
+async def detener_sync_stock_cache():
+    if _tarea_sync:
+        _tarea_sync.cancel()
@@ -0,0 +1,212 @@
+import asyncio
+import os
+from datetime import datetime
+from typing import List
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.stock_almacen import StockCheckpointOut, StockHistoricoOut
+from app.services.movimiento_archivo import get_corte_archivo
+
+load_dotenv()
+
+# Cada cuánto se saca una foto del stock y cuántos días se conservan las fotos
+CHECKPOINT_INTERVALO_MINUTOS = int(os.getenv("STOCK_CHECKPOINT_INTERVALO_MINUTOS", "1440"))
+CHECKPOINT_RETENCION_DIAS = int(os.getenv("STOCK_CHECKPOINT_RETENCION_DIAS", "365"))
+CHECKPOINT_BORRADO_LOTE = 5000  # Filas de detalle por DELETE al borrar fotos viejas
+
+_tarea_checkpoints: asyncio.Task | None = None
+
+
+async def tomar_checkpoint_stock() -> StockCheckpointOut:  # Guarda una foto de todo stock_almacen y hasta qué movimiento cubre
+    async with db.connection() as conn:
+        async with conn.transaction():
+            fecha_checkpoint = datetime.now()
+            lote_id = await conn.execute(
+                query="""
+                    INSERT INTO stock_checkpoint_lotes (fecha_checkpoint, ultimo_movimiento_id)
+                    VALUES (:fecha_checkpoint, 0)
+                """,
+                values={"fecha_checkpoint": fecha_checkpoint},
+            )
+            # Primero la foto: el INSERT ... SELECT es una lectura con lock (LOCK IN SHARE MODE implícito) sobre
+            # todo stock_almacen, así que espera a los movimientos en curso y frena a los nuevos hasta el commit
+            await conn.execute(
+                query="""
+                    INSERT INTO stock_checkpoints (fk_lote, fk_producto, fk_almacen, cantidad_disponible)
+                    SELECT :fk_lote, fk_producto, fk_almacen, cantidad_disponible
+                    FROM stock_almacen
+                """,
+                values={"fk_lote": lote_id},
+            )
+            # Después el último id, también con lectura con lock: ve lo último confirmado (como la foto) y no la
+            # vista de snapshot de la transacción, que podría no incluir movimientos que la foto sí refleja
+            ultimo = await conn.fetch_one(
+                "SELECT COALESCE(MAX(id), 0) AS ultimo_id FROM movimientos_inventario LOCK IN SHARE MODE"
+            )
+            await conn.execute(
+                query="UPDATE stock_checkpoint_lotes SET ultimo_movimiento_id = :ultimo_movimiento_id WHERE id = :id",
+                values={"ultimo_movimiento_id": ultimo["ultimo_id"], "id": lote_id},
+            )
+
+    # Fuera de la transacción de la foto: los locks sobre stock_almacen ya se soltaron con el commit
+    await borrar_checkpoints_viejos(fecha_checkpoint)
+
+    return {
+        "id": lote_id,
+        "fecha_checkpoint": fecha_checkpoint,
+        "ultimo_movimiento_id": ultimo["ultimo_id"],
+    }
+
+
+async def borrar_checkpoints_viejos(fecha_checkpoint: datetime) -> int:  # Borra en tandas las fotos vencidas; devuelve cuántas
+    lotes = await db.fetch_all(
+        query="""
+            SELECT id FROM stock_checkpoint_lotes
+            WHERE fecha_checkpoint < DATE_SUB(:fecha_checkpoint, INTERVAL :dias DAY)
+        """,
+        values={"fecha_checkpoint": fecha_checkpoint, "dias": CHECKPOINT_RETENCION_DIAS},
+    )
+    for lote in lotes:
+        # El detalle de una foto tiene una fila por (producto, almacén): se borra de a tandas, cada una su propio commit
+        while True:
+            await db.execute(
+                query="DELETE FROM stock_checkpoints WHERE fk_lote = :fk_lote LIMIT :limite",
+                values={"fk_lote": lote["id"], "limite": CHECKPOINT_BORRADO_LOTE},
+            )
+            quedan = await db.fetch_one(
+                query="SELECT 1 FROM stock_checkpoints WHERE fk_lote = :fk_lote LIMIT 1",
+                values={"fk_lote": lote["id"]},
+            )
+            if not quedan:
+                break
+            await asyncio.sleep(0)  # Deja pasar otras requests entre tanda y tanda
+        await db.execute(query="DELETE FROM stock_checkpoint_lotes WHERE id = :id", values={"id": lote["id"]})
+    return len(lotes)
+
+
+async def get_stock_historico(
+    fecha: datetime, almacen_id: int | None = None, producto_id: int | None = None
+) -> List[StockHistoricoOut]:  # GET - Reconstruye el stock a una fecha: checkpoint más cercano + movimientos posteriores
+    try:
+        lote = await db.fetch_one(
+            query="""
+                SELECT id, fecha_checkpoint, ultimo_movimiento_id
+                FROM stock_checkpoint_lotes
+                WHERE fecha_checkpoint <= :fecha
+                ORDER BY fecha_checkpoint DESC
+                LIMIT 1
+            """,
+            values={"fecha": fecha},
+        )
+
+        # Sin checkpoint previo se parte de cero y se aplican todos los movimientos hasta la fecha
+        values = {
+            "fk_lote": lote["id"] if lote else 0,
+            "ultimo_movimiento_id": lote["ultimo_movimiento_id"] if lote else 0,
+            "fecha": fecha,
+        }
+
+        filtros = ""
+        if almacen_id is not None:
+            filtros += " AND fk_almacen = :almacen_id"
+            values["almacen_id"] = almacen_id
+        if producto_id is not None:
+            filtros += " AND fk_producto = :producto_id"
+            values["producto_id"] = producto_id
+
+        base = f"""
+            SELECT fk_producto, fk_almacen, cantidad_disponible AS cantidad
+            FROM stock_checkpoints
+            WHERE fk_lote = :fk_lote {filtros}
+        """
+        tablas = ["movimientos_inventario"]
+        fecha_checkpoint = lote["fecha_checkpoint"] if lote else None
+
+        # Si parte de los movimientos posteriores al checkpoint ya se archivó, se leen también del archivo.
+        # La base sigue siendo el checkpoint: saldos_apertura es solo la suma de los movimientos archivados y no
+        # incluye el stock que no vino de un movimiento (alta o edición directa de stock_almacen)
+        corte = await get_corte_archivo()
+        if corte and values["ultimo_movimiento_id"] < corte["ultimo_movimiento_id"]:
+            tablas.append("movimientos_inventario_archivo")
+
+        # El cambio neto de cada movimiento es cantidad_nueva - cantidad_anterior, sea cual sea su tipo
+        deltas = " UNION ALL ".join(
+            f"""
+                SELECT fk_producto, fk_almacen, cantidad_nueva - cantidad_anterior AS cantidad
+                FROM {tabla}
+                WHERE id > :ultimo_movimiento_id
+                AND fecha_movimiento <= :fecha {filtros}
+            """
+            for tabla in tablas
+        )
+        query = f"""
+            SELECT
+                t.fk_producto,
+                t.fk_almacen,
+                CAST(SUM(t.cantidad) AS SIGNED) AS cantidad_disponible
+            FROM (
+                {base}
+                UNION ALL
+                {deltas}
+            ) t
+            GROUP BY t.fk_producto, t.fk_almacen
+            ORDER BY t.fk_producto, t.fk_almacen
+        """
+        rows = await db.fetch_all(query=query, values=values)
+        return [{**dict(row), "fecha_checkpoint": fecha_checkpoint} for row in rows]
+
+    except Exception as e:
+        print(f"Error al reconstruir el stock histórico: {e}")
+        raise HTTPException(
+            status_code=500, detail=f"Error al obtener el stock histórico: {e}"
+        )
+
+
+async def crear_checkpoint_stock(usuario_actual) -> StockCheckpointOut:  # POST - Fuerza un checkpoint (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para crear checkpoints de stock")
+
+    try:
+        return await tomar_checkpoint_stock()
+    except Exception as e:
+        print(f"Error al crear checkpoint de stock: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al crear checkpoint de stock: {e}")
+
+
+# Tarea en segundo plano
+
+
+async def _segundos_hasta_proximo_checkpoint() -> float:  # Si el último checkpoint ya venció (o no hay ninguno), 0
+    row = await db.fetch_one("SELECT MAX(fecha_checkpoint) AS fecha FROM stock_checkpoint_lotes")
+    if not row or not row["fecha"]:
+        return 0
+    transcurrido = (datetime.now() - row["fecha"]).total_seconds()
+    return max(0, CHECKPOINT_INTERVALO_MINUTOS * 60 - transcurrido)
+
+
+async def _loop_checkpoints():
+    # El primer checkpoint no espera un intervalo entero desde el arranque: se toma en cuanto el último venció
+    try:
+        espera = await _segundos_hasta_proximo_checkpoint()
+    except Exception as e:
+        print(f"❌Error al leer el último checkpoint de stock: {e}")
+        espera = 0
+    while True:
+        await asyncio.sleep(espera)
+        espera = CHECKPOINT_INTERVALO_MINUTOS * 60
+        try:
+            lote = await tomar_checkpoint_stock()
+            print(f"📸 Checkpoint de stock {lote['id']} guardado")
+        except Exception as e:  # Un error no debe matar la tarea, se reintenta en el próximo intervalo
+            print(f"❌Error al guardar checkpoint de stock: {e}")
+
+
+def iniciar_checkpoints_stock():
+    global _tarea_checkpoints
+    _tarea_checkpoints = asyncio.create_task(_loop_checkpoints())
+
+
+async def detener_checkpoints_stock():
+    if _tarea_checkpoints:
+        _tarea_checkpoints.cancel()
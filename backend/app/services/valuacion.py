@@ -0,0 +1,560 @@
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from app.config.database import db
+from app.schemas.stock_almacen import ValuacionActualizacionOut, ValuacionOut
+from app.services.movimiento_feed import limite_asentado
+
+load_dotenv()
+
+# Valuación a costo por (producto, almacén): promedio ponderado móvil y capas FIFO, calculados recorriendo
+# movimientos_inventario (y su archivo) una sola vez. El estado queda guardado con un checkpoint, así cada
+# corrida solo procesa los movimientos nuevos y los cierres de mes quedan como fotos listas para consultar
+VALUACION_INTERVALO_MINUTOS = int(os.getenv("VALUACION_INTERVALO_MINUTOS", "60"))  # 0 = sin tarea periódica
+VALUACION_LOTE = int(os.getenv("VALUACION_LOTE", "5000"))  # Movimientos procesados por transacción
+# Los movimientos no asentados (ver movimiento_feed.limite_asentado) esperan a la próxima corrida, para no
+# saltear los ids menores que todavía no confirmaron. Este margen solo se usa si no se puede leer
+# information_schema.innodb_trx, y tiene que superar la transacción de movimientos más larga
+VALUACION_MARGEN_SEGUNDOS = int(os.getenv("VALUACION_MARGEN_SEGUNDOS", "60"))
+
+CUATRO_DECIMALES = Decimal("0.0001")
+
+_lock = asyncio.Lock()  # Una sola corrida a la vez dentro del proceso (entre procesos lo cuida el checkpoint)
+_tarea_valuacion: asyncio.Task | None = None
+
+
+# Motor: funciones puras sobre el estado de un (producto, almacén)
+# estado = {"cantidad": int, "costo_promedio": Decimal, "capas": [[cantidad, costo unitario], ...]}
+
+
+def estado_vacio() -> dict:
+    return {"cantidad": 0, "costo_promedio": Decimal(0), "capas": []}
+
+
+def _ingresar(estado: dict, cantidad: int, costo: Decimal):
+    actual = estado["cantidad"]
+    estado["costo_promedio"] = (
+        (actual * estado["costo_promedio"] + cantidad * costo) / (actual + cantidad)
+    ).quantize(CUATRO_DECIMALES)
+    estado["cantidad"] = actual + cantidad
+
+    capas = estado["capas"]
+    if capas and capas[-1][1] == costo:  # Mismo costo que la última capa: se suma a ella
+        capas[-1][0] += cantidad
+    else:
+        capas.append([cantidad, costo])
+
+
+def _egresar(estado: dict, cantidad: int) -> list:  # Consume las capas más viejas; el costo promedio no cambia
+    capas = estado["capas"]
+    consumidas = []  # [[cantidad, costo], ...] que salieron, para trasladarlas si es una transferencia
+    while cantidad > 0 and capas:
+        consumido = min(cantidad, capas[0][0])
+        capas[0][0] -= consumido
+        cantidad -= consumido
+        estado["cantidad"] -= consumido
+        consumidas.append([consumido, capas[0][1]])
+        if capas[0][0] == 0:
+            capas.pop(0)
+    return consumidas
+
+
+def _ingresar_transferencia(estado: dict, cantidad: int, origen: dict, costo_faltante: Decimal):  # Entra con el costo que tenía en el almacén de origen
+    # El promedio se mueve con el costo promedio del origen y las capas FIFO llegan tal cual salieron
+    actual = estado["cantidad"]
+    estado["costo_promedio"] = (
+        (actual * estado["costo_promedio"] + cantidad * origen["costo_promedio"]) / (actual + cantidad)
+    ).quantize(CUATRO_DECIMALES)
+    estado["cantidad"] = actual + cantidad
+
+    capas = estado["capas"]
+    for cantidad_capa, costo in origen["capas"]:
+        cantidad_capa = min(cantidad_capa, cantidad)
+        if cantidad_capa <= 0:
+            break
+        if capas and capas[-1][1] == costo:
+            capas[-1][0] += cantidad_capa
+        else:
+            capas.append([cantidad_capa, costo])
+        cantidad -= cantidad_capa
+    if cantidad > 0:  # El origen tenía menos capas que lo transferido (datos previos al libro): el resto, al costo de compra
+        capas.append([cantidad, costo_faltante])
+
+
+def _costo_ingreso(estado: dict, costo_compra: Decimal, es_compra: bool) -> Decimal:
+    # Las compras entran a su precio; devoluciones y ajustes positivos, al costo promedio vigente
+    if es_compra or estado["cantidad"] <= 0:
+        return costo_compra
+    return estado["costo_promedio"]
+
+
+def aplicar_movimiento(estado: dict, movimiento: dict, transferencias: dict | None = None):  # Aplica un movimiento (fk_producto/almacén ya resueltos) al estado
+    # transferencias: id de la salida de una transferencia -> costo con el que salió, hasta que llega su entrada.
+    # Así una transferencia entre almacenes mueve el costo del origen al destino y no revalúa el stock
+    costo_compra = Decimal(movimiento["costo_compra"] or 0)
+    transferencias = {} if transferencias is None else transferencias
+    fk_transferencia = movimiento.get("fk_transferencia")
+
+    # Si el stock se tocó sin movimiento (alta directa en stock_almacen, datos previos al libro),
+    # cantidad_anterior no coincide con el estado: primero se lo lleva a ese valor
+    diferencia = movimiento["cantidad_anterior"] - estado["cantidad"]
+    if diferencia > 0:
+        _ingresar(estado, diferencia, _costo_ingreso(estado, costo_compra, False))
+    elif diferencia < 0:
+        _egresar(estado, -diferencia)
+
+    # El cambio neto es cantidad_nueva - cantidad_anterior, sea cual sea el tipo
+    neto = movimiento["cantidad_nueva"] - movimiento["cantidad_anterior"]
+    if neto > 0 and fk_transferencia is not None and fk_transferencia in transferencias:
+        _ingresar_transferencia(estado, neto, transferencias.pop(fk_transferencia), costo_compra)
+    elif neto > 0:
+        es_compra = movimiento["tipo_movimiento"] == "entrada" and fk_transferencia is None
+        _ingresar(estado, neto, _costo_ingreso(estado, costo_compra, es_compra))
+    elif neto < 0:
+        costo_promedio = estado["costo_promedio"]
+        consumidas = _egresar(estado, -neto)
+        if fk_transferencia == movimiento["id"]:  # Salida de una transferencia: su entrada viene después
+            transferencias[movimiento["id"]] = {"costo_promedio": costo_promedio, "capas": consumidas}
+
+
+def valor_fifo(estado: dict) -> Decimal:
+    return sum((cantidad * costo for cantidad, costo in estado["capas"]), Decimal(0))
+
+
+# Persistencia del estado y del checkpoint
+
+
+def _estado_desde_fila(row) -> dict:
+    return {
+        "cantidad": row["cantidad"],
+        "costo_promedio": Decimal(row["costo_promedio"]),
+        "capas": [[cantidad, Decimal(costo)] for cantidad, costo in json.loads(row["capas_fifo"])],
+    }
+
+
+async def _cargar_estados(estados: dict, claves: set):  # Trae de la BD los estados que todavía no están en memoria
+    faltantes = [c for c in claves if c not in estados]
+    for inicio in range(0, len(faltantes), 1000):
+        bloque = faltantes[inicio:inicio + 1000]
+        values = {}
+        tuplas = []
+        for i, (fk_producto, fk_almacen) in enumerate(bloque):
+            tuplas.append(f"(:p{i}, :a{i})")
+            values[f"p{i}"] = fk_producto
+            values[f"a{i}"] = fk_almacen
+        rows = await db.fetch_all(
+            query=f"""
+                SELECT fk_producto, fk_almacen, cantidad, costo_promedio, capas_fifo
+                FROM valuacion_estado
+                WHERE (fk_producto, fk_almacen) IN ({", ".join(tuplas)})
+            """,
+            values=values,
+        )
+        for row in rows:
+            estados[(row["fk_producto"], row["fk_almacen"])] = _estado_desde_fila(row)
+        for clave in bloque:
+            estados.setdefault(clave, estado_vacio())
+
+
+async def get_checkpoint_valuacion(conn=None) -> dict:
+    row = await (conn or db).fetch_one(
+        """
+        SELECT ultimo_movimiento_id, fecha_ultimo_movimiento, fecha_actualizacion, movimientos_procesados
+        FROM valuacion_checkpoint
+        WHERE id = 1
+        """
+    )
+    if not row:
+        raise HTTPException(status_code=500, detail="Falta la fila de valuacion_checkpoint (ver sql/valuacion.sql)")
+    return dict(row)
+
+
+async def _cargar_transferencias() -> dict:  # Salidas de transferencias cuya entrada quedó después del checkpoint
+    rows = await db.fetch_all(
+        "SELECT fk_movimiento, costo_promedio, capas_fifo FROM valuacion_transferencias_pendientes"
+    )
+    return {
+        row["fk_movimiento"]: {
+            "costo_promedio": Decimal(row["costo_promedio"]),
+            "capas": [[cantidad, Decimal(costo)] for cantidad, costo in json.loads(row["capas_fifo"])],
+        }
+        for row in rows
+    }
+
+
+async def _guardar(
+    estados: dict, sucios: set, transferencias: dict, desde_id: int, ultimo: dict, procesados: int, cierre: str | None
+) -> bool:  # Estado + checkpoint (+ cierre de mes) en una transacción; False si otro proceso movió el checkpoint
+    async with db.connection() as conn:
+        async with conn.transaction():
+            checkpoint = await conn.fetch_one(
+                "SELECT ultimo_movimiento_id FROM valuacion_checkpoint WHERE id = 1 FOR UPDATE"
+            )
+            if checkpoint["ultimo_movimiento_id"] != desde_id:  # Otro proceso avanzó mientras tanto: lo calculado ya no vale
+                return False
+
+            # Son pocas (solo las salidas cuya entrada cae en el próximo lote): se reescriben enteras
+            await conn.execute("DELETE FROM valuacion_transferencias_pendientes")
+            if transferencias:
+                await conn.execute_many(
+                    query="""
+                        INSERT INTO valuacion_transferencias_pendientes (fk_movimiento, costo_promedio, capas_fifo)
+                        VALUES (:fk_movimiento, :costo_promedio, :capas_fifo)
+                    """,
+                    values=[
+                        {
+                            "fk_movimiento": fk_movimiento,
+                            "costo_promedio": origen["costo_promedio"],
+                            "capas_fifo": json.dumps([[c, str(costo)] for c, costo in origen["capas"]]),
+                        }
+                        for fk_movimiento, origen in transferencias.items()
+                    ],
+                )
+
+            if sucios:
+                await conn.execute_many(
+                    query="""
+                        INSERT INTO valuacion_estado (fk_producto, fk_almacen, cantidad, costo_promedio, valor_fifo, capas_fifo)
+                        VALUES (:fk_producto, :fk_almacen, :cantidad, :costo_promedio, :valor_fifo, :capas_fifo)
+                        ON DUPLICATE KEY UPDATE
+                            cantidad = VALUES(cantidad),
+                            costo_promedio = VALUES(costo_promedio),
+                            valor_fifo = VALUES(valor_fifo),
+                            capas_fifo = VALUES(capas_fifo)
+                    """,
+                    values=[
+                        {
+                            "fk_producto": fk_producto,
+                            "fk_almacen": fk_almacen,
+                            "cantidad": estados[(fk_producto, fk_almacen)]["cantidad"],
+                            "costo_promedio": estados[(fk_producto, fk_almacen)]["costo_promedio"],
+                            "valor_fifo": valor_fifo(estados[(fk_producto, fk_almacen)]),
+                            "capas_fifo": json.dumps(
+                                [[c, str(costo)] for c, costo in estados[(fk_producto, fk_almacen)]["capas"]]
+                            ),
+                        }
+                        for fk_producto, fk_almacen in sucios
+                    ],
+                )
+
+            await conn.execute(
+                query="""
+                    UPDATE valuacion_checkpoint
+                    SET ultimo_movimiento_id = :ultimo_movimiento_id,
+                        fecha_ultimo_movimiento = :fecha_ultimo_movimiento,
+                        fecha_actualizacion = :fecha_actualizacion,
+                        movimientos_procesados = movimientos_procesados + :procesados
+                    WHERE id = 1
+                """,
+                values={
+                    "ultimo_movimiento_id": ultimo["id"],
+                    "fecha_ultimo_movimiento": ultimo["fecha_movimiento"],
+                    "fecha_actualizacion": datetime.now(),
+                    "procesados": procesados,
+                },
+            )
+
+            if cierre:
+                await _cerrar_periodo(conn, cierre, ultimo["id"])
+    return True
+
+
+async def _cerrar_periodo(conn, periodo: str, ultimo_movimiento_id: int):  # Foto de valuacion_estado al último movimiento del mes
+    existente = await conn.fetch_one(
+        "SELECT id FROM valuacion_cierres WHERE periodo = :periodo", values={"periodo": periodo}
+    )
+    if existente:
+        return
+
+    inicio = datetime.strptime(periodo, "%Y-%m")
+    fecha_cierre = (inicio + timedelta(days=32)).replace(day=1)  # Primer instante del mes siguiente
+    cierre_id = await conn.execute(
+        query="""
+            INSERT INTO valuacion_cierres (periodo, fecha_cierre, ultimo_movimiento_id, valor_promedio_total, valor_fifo_total)
+            SELECT :periodo, :fecha_cierre, :ultimo_movimiento_id,
+                COALESCE(SUM(cantidad * costo_promedio), 0), COALESCE(SUM(valor_fifo), 0)
+            FROM valuacion_estado
+        """,
+        values={"periodo": periodo, "fecha_cierre": fecha_cierre, "ultimo_movimiento_id": ultimo_movimiento_id},
+    )
+    await conn.execute(
+        query="""
+            INSERT INTO valuacion_cierres_detalle (
+                fk_cierre, fk_producto, fk_almacen, cantidad, costo_promedio, valor_promedio, valor_fifo
+            )
+            SELECT :fk_cierre, fk_producto, fk_almacen, cantidad, costo_promedio, cantidad * costo_promedio, valor_fifo
+            FROM valuacion_estado
+            WHERE cantidad <> 0
+        """,
+        values={"fk_cierre": cierre_id},
+    )
+
+
+# Corrida incremental
+
+
+QUERY_MOVIMIENTOS = """
+    SELECT
+        m.id,
+        m.fk_producto,
+        m.fk_almacen,
+        m.tipo_movimiento,
+        m.cantidad_anterior,
+        m.cantidad_nueva,
+        m.fecha_movimiento,
+        m.fk_transferencia,
+        COALESCE(
+            (
+                SELECT h.precio_compra
+                FROM productos_precios_compra h
+                WHERE h.fk_producto = m.fk_producto
+                AND h.fecha_hasta > m.fecha_movimiento
+                ORDER BY h.fecha_hasta
+                LIMIT 1
+            ),
+            p.precio_compra
+        ) AS costo_compra
+    FROM (
+        (
+            SELECT id, fk_producto, fk_almacen, tipo_movimiento, cantidad_anterior, cantidad_nueva, fecha_movimiento, fk_transferencia
+            FROM movimientos_inventario_archivo
+            WHERE id > :desde AND id <= :hasta
+            ORDER BY id
+            LIMIT :lote
+        )
+        UNION ALL
+        (
+            SELECT id, fk_producto, fk_almacen, tipo_movimiento, cantidad_anterior, cantidad_nueva, fecha_movimiento, fk_transferencia
+            FROM movimientos_inventario
+            WHERE id > :desde AND id <= :hasta
+            ORDER BY id
+            LIMIT :lote
+        )
+    ) m
+    LEFT JOIN productos p ON m.fk_producto = p.id  -- LEFT: un producto borrado igual mueve cantidades (y el lote nunca queda vacío)
+    ORDER BY m.id
+    LIMIT :lote
+"""
+
+
+def _periodo(fecha: datetime | None) -> str | None:
+    return fecha.strftime("%Y-%m") if fecha else None
+
+
+async def actualizar_valuacion() -> ValuacionActualizacionOut:  # Procesa los movimientos posteriores al checkpoint
+    async with _lock:
+        inicio = time.perf_counter()
+        limite = await db.fetch_one(
+            query="""
+                SELECT GREATEST(
+                    COALESCE((SELECT MAX(id) FROM movimientos_inventario WHERE fecha_movimiento < :limite), 0),
+                    COALESCE((SELECT MAX(id) FROM movimientos_inventario_archivo), 0)
+                ) AS hasta
+            """,
+            values={"limite": await limite_asentado(VALUACION_MARGEN_SEGUNDOS)},
+        )
+        procesados = 0
+        cierres = []
+
+        # Si otro proceso (otro worker, el script) guarda antes, lo calculado en memoria se descarta
+        # y se sigue desde su checkpoint: nunca se pisa ni se aplica dos veces un movimiento
+        while True:
+            resultado = await _procesar_hasta(limite["hasta"])
+            procesados += resultado["procesados"]
+            cierres.extend(resultado["cierres"])
+            if resultado["completo"]:
+                break
+
+        return {
+            "movimientos_procesados": procesados,
+            "ultimo_movimiento_id": resultado["desde"],
+            "cierres_generados": cierres,
+            "duracion_ms": round((time.perf_counter() - inicio) * 1000, 2),
+        }
+
+
+async def _procesar_hasta(hasta: int) -> dict:  # Una pasada desde el checkpoint; completo=False si hubo que reintentar
+    checkpoint = await get_checkpoint_valuacion()
+    desde = checkpoint["ultimo_movimiento_id"]
+    periodo_actual = _periodo(checkpoint["fecha_ultimo_movimiento"])
+    estados = {}
+    transferencias = await _cargar_transferencias()
+    procesados = 0
+    cierres = []
+
+    def resultado(completo: bool) -> dict:
+        return {"completo": completo, "desde": desde, "procesados": procesados, "cierres": cierres}
+
+    while desde < hasta:
+        rows = await db.fetch_all(
+            query=QUERY_MOVIMIENTOS, values={"desde": desde, "hasta": hasta, "lote": VALUACION_LOTE}
+        )
+        if not rows:
+            break
+        movimientos = [dict(row) for row in rows]
+        await _cargar_estados(estados, {(m["fk_producto"], m["fk_almacen"]) for m in movimientos})
+
+        sucios = set()
+        pendientes = 0
+        ultimo = None
+        for movimiento in movimientos:
+            periodo = _periodo(movimiento["fecha_movimiento"])
+            if periodo_actual and periodo > periodo_actual and ultimo:
+                # Primer movimiento de un mes nuevo: se guarda lo anterior y se cierra el mes que terminó
+                if not await _guardar(estados, sucios, transferencias, desde, ultimo, pendientes, periodo_actual):
+                    return resultado(False)
+                cierres.append(periodo_actual)
+                procesados += pendientes
+                desde, sucios, pendientes = ultimo["id"], set(), 0
+            elif periodo_actual and periodo > periodo_actual:  # El mes terminó justo en el checkpoint anterior
+                async with db.connection() as conn:
+                    async with conn.transaction():
+                        await _cerrar_periodo(conn, periodo_actual, desde)
+                cierres.append(periodo_actual)
+            periodo_actual = max(periodo_actual or periodo, periodo)
+
+            clave = (movimiento["fk_producto"], movimiento["fk_almacen"])
+            aplicar_movimiento(estados[clave], movimiento, transferencias)
+            sucios.add(clave)
+            pendientes += 1
+            ultimo = movimiento
+
+        if not await _guardar(estados, sucios, transferencias, desde, ultimo, pendientes, None):
+            return resultado(False)
+        procesados += pendientes
+        desde = ultimo["id"]
+        await asyncio.sleep(0)  # Deja pasar otras requests entre lote y lote
+
+    return resultado(True)
+
+
+async def actualizar_valuacion_admin(usuario_actual) -> ValuacionActualizacionOut:  # POST - Fuerza una corrida (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para actualizar la valuación")
+
+    try:
+        return await actualizar_valuacion()
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al actualizar la valuación: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al actualizar la valuación: {e}")
+
+
+# Consulta
+
+
+async def get_valuacion(
+    usuario_actual, periodo: str | None = None, almacen_id: int | None = None, producto_id: int | None = None
+) -> ValuacionOut:  # GET - Valuación a costo actual o al cierre de un mes (AAAA-MM) (solo admin)
+    if usuario_actual["rol"] != "admin":
+        raise HTTPException(status_code=403, detail="No tienes permiso para ver la valuación del inventario")
+
+    if periodo:
+        try:
+            datetime.strptime(periodo, "%Y-%m")
+        except ValueError:
+            raise HTTPException(status_code=400, detail="El período debe tener el formato AAAA-MM")
+
+    try:
+        # Solo lee lo ya calculado: la corrida la hacen la tarea periódica, el script o POST /valuacion/actualizar
+        checkpoint = await get_checkpoint_valuacion()
+
+        filtros = ""
+        values = {}
+        if almacen_id is not None:
+            filtros += " AND v.fk_almacen = :almacen_id"
+            values["almacen_id"] = almacen_id
+        if producto_id is not None:
+            filtros += " AND v.fk_producto = :producto_id"
+            values["producto_id"] = producto_id
+
+        # Si el último movimiento procesado es de ese mes o anterior, el estado actual ya es el cierre.
+        # Si no, vale el último cierre guardado hasta ese mes (los meses sin movimientos arrastran el anterior)
+        cierre = None
+        if periodo and (_periodo(checkpoint["fecha_ultimo_movimiento"]) or "") > periodo:
+            cierre = await db.fetch_one(
+                query="""
+                    SELECT id, periodo, fecha_cierre, ultimo_movimiento_id
+                    FROM valuacion_cierres
+                    WHERE periodo <= :periodo
+                    ORDER BY periodo DESC
+                    LIMIT 1
+                """,
+                values={"periodo": periodo},
+            )
+            if not cierre:
+                raise HTTPException(status_code=404, detail=f"No hay valuación para el período {periodo}")
+
+        if cierre:
+            origen = "valuacion_cierres_detalle v"
+            filtros = " AND v.fk_cierre = :fk_cierre" + filtros
+            values["fk_cierre"] = cierre["id"]
+            columnas = "v.cantidad, v.costo_promedio, v.valor_promedio, v.valor_fifo"
+        else:
+            origen = "valuacion_estado v"
+            columnas = "v.cantidad, v.costo_promedio, v.cantidad * v.costo_promedio AS valor_promedio, v.valor_fifo"
+
+        rows = await db.fetch_all(
+            query=f"""
+                SELECT
+                    v.fk_producto,
+                    p.codigo,
+                    p.nombre AS producto,
+                    v.fk_almacen,
+                    a.nombre AS almacen,
+                    {columnas}
+                FROM {origen}
+                INNER JOIN productos p ON v.fk_producto = p.id
+                INNER JOIN almacenes a ON v.fk_almacen = a.id
+                WHERE v.cantidad <> 0 {filtros}
+                ORDER BY a.nombre, p.nombre
+            """,
+            values=values,
+        )
+        items = [dict(row) for row in rows]
+
+        return {
+            "periodo": cierre["periodo"] if cierre else periodo,
+            "fecha_cierre": cierre["fecha_cierre"] if cierre else None,
+            "ultimo_movimiento_id": cierre["ultimo_movimiento_id"] if cierre else checkpoint["ultimo_movimiento_id"],
+            "fecha_actualizacion": checkpoint["fecha_actualizacion"],
+            "valor_promedio_total": sum((i["valor_promedio"] for i in items), Decimal(0)),
+            "valor_fifo_total": sum((i["valor_fifo"] for i in items), Decimal(0)),
+            "items": items,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error al obtener la valuación: {e}")
+        raise HTTPException(status_code=500, detail=f"Error al obtener la valuación: {e}")
+
+
+# Tarea en segundo plano
+
+
+async def _loop_valuacion():
+    while True:
+        await asyncio.sleep(VALUACION_INTERVALO_MINUTOS * 60)
+        try:
+            resultado = await actualizar_valuacion()
+            print(f"💲 Valuación actualizada: {resultado['movimientos_procesados']} movimientos")
+        except Exception as e:
+            print(f"❌Error al actualizar la valuación: {e}")
+
+
+def iniciar_valuacion():
+    global _tarea_valuacion
+    if VALUACION_INTERVALO_MINUTOS > 0:
+        _tarea_valuacion = asyncio.create_task(_loop_valuacion())
+
+
+async def detener_valuacion():
+    if _tarea_valuacion:
+        _tarea_valuacion.cancel()
@@ -0,0 +1,5 @@
+-- Índice "cubriente" para la conciliación stock vs. libro de movimientos:
+-- el SUM(cantidad_nueva - cantidad_anterior) por almacén/producto se resuelve leyendo solo el índice
+
+CREATE INDEX idx_movimientos_conciliacion
+    ON movimientos_inventario (fk_almacen, fk_producto, cantidad_anterior, cantidad_nueva);
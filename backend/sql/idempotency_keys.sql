@@ -0,0 +1,18 @@
+-- Claves de idempotencia de POST /movimientos/ (header Idempotency-Key)
+-- Un reintento con la misma clave devuelve el movimiento original en lugar de procesarlo otra vez.
+-- La clave se reserva (INSERT con la PK única) en la MISMA transacción que registra el movimiento:
+-- fk_movimiento queda NULL mientras la reserva está en curso y se completa antes del COMMIT
+
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    fk_usuario INT NOT NULL,
+    clave VARCHAR(255) NOT NULL,
+    hash_solicitud CHAR(64) NOT NULL,
+    fk_movimiento INT NULL,
+    fecha_creacion DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    fecha_expiracion DATETIME NOT NULL,
+    PRIMARY KEY (fk_usuario, clave),
+    INDEX idx_idempotency_expiracion (fecha_expiracion)
+);
+
+-- Para las bases que ya tenían la tabla con fk_movimiento NOT NULL
+ALTER TABLE idempotency_keys MODIFY fk_movimiento INT NULL;
@@ -0,0 +1,23 @@
+-- Archivo de movimientos viejos (python -m app.scripts.archivar_movimientos o tarea periódica)
+-- Los movimientos anteriores al horizonte pasan a movimientos_inventario_archivo y su efecto
+-- neto queda acumulado en saldos_apertura, para que la tabla "caliente" se mantenga chica
+
+CREATE TABLE IF NOT EXISTS movimientos_inventario_archivo LIKE movimientos_inventario;
+
+-- Stock de cada (producto, almacén) al último movimiento archivado
+CREATE TABLE IF NOT EXISTS saldos_apertura (
+    fk_producto INT NOT NULL,
+    fk_almacen INT NOT NULL,
+    cantidad BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fk_producto, fk_almacen),
+    INDEX idx_saldos_apertura_almacen (fk_almacen)
+);
+
+-- Una fila por corrida; la última indica hasta qué movimiento cubren los saldos de apertura
+CREATE TABLE IF NOT EXISTS movimientos_archivo_corridas (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fecha_archivo DATETIME NOT NULL,
+    fecha_corte DATETIME NULL,  -- Fecha del movimiento archivado más reciente
+    ultimo_movimiento_id INT NOT NULL,
+    movimientos_archivados INT NOT NULL DEFAULT 0
+);
@@ -0,0 +1,15 @@
+-- Índices compuestos para los listados de movimientos paginados por (fecha_movimiento, id)
+-- En InnoDB cada índice secundario ya incluye la PK (id), así que sirven para el keyset completo
+
+CREATE INDEX idx_movimientos_usuario_fecha ON movimientos_inventario (fk_usuario, fecha_movimiento);
+CREATE INDEX idx_movimientos_producto_fecha ON movimientos_inventario (fk_producto, fecha_movimiento);
+CREATE INDEX idx_movimientos_almacen_fecha ON movimientos_inventario (fk_almacen, fecha_movimiento);
+CREATE INDEX idx_movimientos_proveedor_fecha ON movimientos_inventario (fk_proveedor, fecha_movimiento);
+CREATE INDEX idx_movimientos_tipo_fecha ON movimientos_inventario (tipo_movimiento, fecha_movimiento);
+
+-- El rango de fechas de /reportes/movimientos y /movimientos/export (fecha_movimiento >= inicio AND < fin + 1 día)
+-- usa idx_movimientos_fecha, creado en stock_checkpoints.sql
+
+-- Último movimiento de cada fila de stock (MAX(id) por producto y almacén) para la caché de stock:
+-- con el id implícito al final del índice, es una sola búsqueda por fila
+CREATE INDEX idx_movimientos_producto_almacen ON movimientos_inventario (fk_producto, fk_almacen);
@@ -0,0 +1,15 @@
+-- Totales diarios de movimientos por (producto, almacén, tipo), mantenidos al registrar cada movimiento
+-- Se reconstruye desde cero con: python -m app.scripts.reconstruir_resumen_diario
+
+CREATE TABLE IF NOT EXISTS movimientos_resumen_diario (
+    fecha DATE NOT NULL,
+    fk_producto INT NOT NULL,
+    fk_almacen INT NOT NULL,
+    tipo_movimiento VARCHAR(20) NOT NULL,
+    cantidad_movimientos INT NOT NULL DEFAULT 0,
+    cantidad_total BIGINT NOT NULL DEFAULT 0,
+    cambio_neto BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (fecha, fk_producto, fk_almacen, tipo_movimiento),
+    INDEX idx_resumen_producto_fecha (fk_producto, fecha),
+    INDEX idx_resumen_almacen_fecha (fk_almacen, fecha)
+);
@@ -0,0 +1,58 @@
+-- Enlace entre la salida y la entrada de cada transferencia (POST /movimientos/transferencia):
+-- las dos filas llevan en fk_transferencia el id de la salida.
+-- Hay que correrla después de movimientos_archivo.sql, porque también agrega la columna al archivo.
+-- Se agrega al final de las dos tablas porque el archivo copia con INSERT ... SELECT *
+ALTER TABLE movimientos_inventario ADD COLUMN fk_transferencia INT NULL;
+ALTER TABLE movimientos_inventario_archivo ADD COLUMN fk_transferencia INT NULL;
+
+-- Transferencias anteriores a la columna: se emparejan por el motivo automático
+-- ("Transferencia almacén X -> Y"), mismo producto, cantidad y usuario, y la salida justo antes de la entrada.
+-- Las que usaron un motivo propio no se pueden reconocer y siguen valuándose como entradas comunes
+UPDATE movimientos_inventario e
+INNER JOIN (
+    SELECT e2.id AS entrada_id, MAX(s.id) AS salida_id
+    FROM movimientos_inventario e2
+    INNER JOIN movimientos_inventario s
+        ON s.fk_producto = e2.fk_producto
+        AND s.cantidad = e2.cantidad
+        AND s.fk_usuario = e2.fk_usuario
+        AND s.tipo_movimiento = 'salida'
+        AND s.id < e2.id
+        AND s.fecha_movimiento >= e2.fecha_movimiento - INTERVAL 5 SECOND
+        AND e2.motivo = CONCAT('Transferencia almacén ', s.fk_almacen, ' -> ', e2.fk_almacen)
+        AND s.motivo = e2.motivo
+    WHERE e2.tipo_movimiento = 'entrada' AND e2.fk_transferencia IS NULL
+    GROUP BY e2.id
+) t ON t.entrada_id = e.id
+SET e.fk_transferencia = t.salida_id;
+
+UPDATE movimientos_inventario s
+INNER JOIN (
+    SELECT DISTINCT fk_transferencia FROM movimientos_inventario WHERE fk_transferencia IS NOT NULL
+) t ON t.fk_transferencia = s.id
+SET s.fk_transferencia = s.id;
+
+-- Lo mismo sobre el archivo
+UPDATE movimientos_inventario_archivo e
+INNER JOIN (
+    SELECT e2.id AS entrada_id, MAX(s.id) AS salida_id
+    FROM movimientos_inventario_archivo e2
+    INNER JOIN movimientos_inventario_archivo s
+        ON s.fk_producto = e2.fk_producto
+        AND s.cantidad = e2.cantidad
+        AND s.fk_usuario = e2.fk_usuario
+        AND s.tipo_movimiento = 'salida'
+        AND s.id < e2.id
+        AND s.fecha_movimiento >= e2.fecha_movimiento - INTERVAL 5 SECOND
+        AND e2.motivo = CONCAT('Transferencia almacén ', s.fk_almacen, ' -> ', e2.fk_almacen)
+        AND s.motivo = e2.motivo
+    WHERE e2.tipo_movimiento = 'entrada' AND e2.fk_transferencia IS NULL
+    GROUP BY e2.id
+) t ON t.entrada_id = e.id
+SET e.fk_transferencia = t.salida_id;
+
+UPDATE movimientos_inventario_archivo s
+INNER JOIN (
+    SELECT DISTINCT fk_transferencia FROM movimientos_inventario_archivo WHERE fk_transferencia IS NOT NULL
+) t ON t.fk_transferencia = s.id
+SET s.fk_transferencia = s.id;
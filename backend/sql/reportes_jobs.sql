@@ -0,0 +1,18 @@
+-- Jobs de reportes en segundo plano (ver app/services/reporte_jobs.py).
+-- El estado está en la base para que cualquier worker responda el polling y la descarga
+CREATE TABLE IF NOT EXISTS reportes_jobs (
+    id CHAR(32) PRIMARY KEY,
+    fk_usuario INT NOT NULL,
+    tipo VARCHAR(30) NOT NULL,
+    pedido JSON NOT NULL,  -- ReporteJobIn tal como llegó
+    estado VARCHAR(20) NOT NULL,  -- en_cola, consultando, armando, terminado, error
+    filas INT NULL,
+    tamano_bytes BIGINT NULL,
+    error VARCHAR(500) NULL,
+    ruta VARCHAR(500) NULL,  -- Archivo en REPORTES_JOBS_DIRECTORIO
+    fecha_creacion DATETIME NOT NULL,
+    fecha_fin DATETIME NULL,
+    fecha_expiracion DATETIME NULL,  -- A partir de esta fecha se borran el archivo y la fila
+    INDEX idx_reportes_jobs_usuario (fk_usuario, estado),
+    INDEX idx_reportes_jobs_expiracion (fecha_expiracion)
+);
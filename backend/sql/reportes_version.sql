@@ -0,0 +1,9 @@
+-- Versión compartida de los datos que muestran los reportes (ver app/services/reporte_cache.py).
+-- Cada proceso de la API la sube cuando una escritura cambia algún reporte y la lee antes de servir uno
+-- desde su caché: una escritura atendida por un worker invalida los PDF cacheados en todos
+CREATE TABLE IF NOT EXISTS reportes_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO reportes_version (id) VALUES (1);
@@ -0,0 +1,5 @@
+-- Índices para listar stock_almacen paginado por ids (GET /stock_almacen/)
+-- La combinación producto/almacén ya se valida como única en el servicio; el índice lo garantiza y ordena el keyset
+
+CREATE UNIQUE INDEX idx_stock_producto_almacen ON stock_almacen (fk_producto, fk_almacen);
+CREATE INDEX idx_stock_almacen_producto ON stock_almacen (fk_almacen, fk_producto);
@@ -0,0 +1,21 @@
+-- Snapshots periódicos de stock_almacen para reconstruir el stock a una fecha pasada
+-- (GET /stock_almacen/historico). Cada lote guarda hasta qué movimiento cubre la foto.
+
+CREATE TABLE IF NOT EXISTS stock_checkpoint_lotes (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fecha_checkpoint DATETIME NOT NULL,
+    ultimo_movimiento_id INT NOT NULL,
+    INDEX idx_checkpoint_fecha (fecha_checkpoint)
+);
+
+CREATE TABLE IF NOT EXISTS stock_checkpoints (
+    fk_lote INT NOT NULL,
+    fk_producto INT NOT NULL,
+    fk_almacen INT NOT NULL,
+    cantidad_disponible INT NOT NULL,
+    PRIMARY KEY (fk_lote, fk_producto, fk_almacen),
+    FOREIGN KEY (fk_lote) REFERENCES stock_checkpoint_lotes(id) ON DELETE CASCADE
+);
+
+-- Para aplicar solo los movimientos posteriores al checkpoint
+CREATE INDEX idx_movimientos_fecha ON movimientos_inventario (fecha_movimiento);
@@ -0,0 +1,69 @@
+-- Valuación del inventario a costo: promedio ponderado móvil y capas FIFO por (producto, almacén).
+-- Se actualiza de forma incremental (python -m app.scripts.actualizar_valuacion o tarea periódica):
+-- cada corrida procesa solo los movimientos posteriores al checkpoint y deja una foto por cada mes cerrado
+-- Requiere antes sql/movimientos_transferencia.sql (columna fk_transferencia: la valuación traslada el costo
+-- de las transferencias del almacén de origen al de destino en lugar de tomar la entrada como una compra)
+
+-- Precio de compra que rigió hasta cada cambio (lo registra update_producto).
+-- El costo de una entrada es el primer precio con fecha_hasta posterior al movimiento, o el precio actual
+CREATE TABLE IF NOT EXISTS productos_precios_compra (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    fk_producto INT NOT NULL,
+    precio_compra DECIMAL(12,2) NOT NULL,
+    fecha_hasta DATETIME NOT NULL,
+    INDEX idx_precios_compra_producto (fk_producto, fecha_hasta)
+);
+
+-- Estado de cada (producto, almacén) al movimiento del checkpoint
+CREATE TABLE IF NOT EXISTS valuacion_estado (
+    fk_producto INT NOT NULL,
+    fk_almacen INT NOT NULL,
+    cantidad BIGINT NOT NULL DEFAULT 0,
+    costo_promedio DECIMAL(16,4) NOT NULL DEFAULT 0,
+    valor_fifo DECIMAL(18,4) NOT NULL DEFAULT 0,
+    capas_fifo JSON NOT NULL,  -- [[cantidad, costo unitario], ...] de la capa más vieja a la más nueva
+    PRIMARY KEY (fk_producto, fk_almacen),
+    INDEX idx_valuacion_almacen (fk_almacen)
+);
+
+-- Una sola fila: hasta qué movimiento cubre valuacion_estado
+CREATE TABLE IF NOT EXISTS valuacion_checkpoint (
+    id TINYINT PRIMARY KEY,
+    ultimo_movimiento_id INT NOT NULL DEFAULT 0,
+    fecha_ultimo_movimiento DATETIME NULL,
+    fecha_actualizacion DATETIME NULL,
+    movimientos_procesados BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT IGNORE INTO valuacion_checkpoint (id) VALUES (1);
+
+-- Salidas de transferencias ya valuadas cuya entrada quedó después del checkpoint:
+-- el costo con el que salieron (promedio y capas FIFO consumidas) espera a la entrada
+CREATE TABLE IF NOT EXISTS valuacion_transferencias_pendientes (
+    fk_movimiento INT PRIMARY KEY,  -- id de la salida (= fk_transferencia de la entrada)
+    costo_promedio DECIMAL(16,4) NOT NULL,
+    capas_fifo JSON NOT NULL
+);
+
+-- Cierres mensuales: foto de valuacion_estado al último movimiento de cada mes
+CREATE TABLE IF NOT EXISTS valuacion_cierres (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    periodo CHAR(7) NOT NULL,  -- AAAA-MM
+    fecha_cierre DATETIME NOT NULL,
+    ultimo_movimiento_id INT NOT NULL,
+    valor_promedio_total DECIMAL(18,4) NOT NULL,
+    valor_fifo_total DECIMAL(18,4) NOT NULL,
+    UNIQUE KEY uq_valuacion_cierres_periodo (periodo)
+);
+
+CREATE TABLE IF NOT EXISTS valuacion_cierres_detalle (
+    fk_cierre INT NOT NULL,
+    fk_producto INT NOT NULL,
+    fk_almacen INT NOT NULL,
+    cantidad BIGINT NOT NULL,
+    costo_promedio DECIMAL(16,4) NOT NULL,
+    valor_promedio DECIMAL(18,4) NOT NULL,
+    valor_fifo DECIMAL(18,4) NOT NULL,
+    PRIMARY KEY (fk_cierre, fk_producto, fk_almacen),
+    FOREIGN KEY (fk_cierre) REFERENCES valuacion_cierres(id) ON DELETE CASCADE
+);
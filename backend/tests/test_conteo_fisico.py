@@ -0,0 +1,71 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from app.services.conteo_fisico import leer_conteo_csv, leer_conteo_json
+
+
+def leer(lector, *chunks: bytes) -> list:  # Pasa los chunks como si fueran el body de la request
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def todo():
+        return [linea async for linea in lector(body())]
+
+    return asyncio.run(todo())
+
+
+# CSV
+
+
+def test_csv_con_bom_crlf_y_lineas_vacias():
+    contenido = "﻿Codigo, Cantidad\r\nA-1,3\r\n\r\nB-2, 4\r\n".encode()
+    assert leer(leer_conteo_csv, contenido) == [
+        {"codigo": "A-1", "cantidad": "3"},
+        {"codigo": "B-2", "cantidad": "4"},
+    ]
+
+
+def test_csv_partido_en_cualquier_byte():
+    contenido = "fk_producto,cantidad\n1,2\n3,4".encode()  # Sin salto de línea al final
+    chunks = [contenido[i:i + 3] for i in range(0, len(contenido), 3)]
+    assert leer(leer_conteo_csv, *chunks) == [
+        {"fk_producto": "1", "cantidad": "2"},
+        {"fk_producto": "3", "cantidad": "4"},
+    ]
+
+
+def test_csv_caracter_multibyte_partido():
+    contenido = "codigo,cantidad\nÑandú,1\n".encode()
+    corte = contenido.index("Ñ".encode()) + 1  # En el medio de los dos bytes de la Ñ
+    assert leer(leer_conteo_csv, contenido[:corte], contenido[corte:]) == [{"codigo": "Ñandú", "cantidad": "1"}]
+
+
+def test_csv_comillas():
+    assert leer(leer_conteo_csv, b'codigo,cantidad\n"A,1",2\n') == [{"codigo": "A,1", "cantidad": "2"}]
+
+
+# JSON
+
+
+def test_json_objeto_por_objeto():
+    contenido = b'[ {"codigo": "A", "cantidad": 1},\n {"fk_producto": 2, "cantidad": 5} ]'
+    chunks = [contenido[i:i + 7] for i in range(0, len(contenido), 7)]
+    assert leer(leer_conteo_json, *chunks) == [{"codigo": "A", "cantidad": 1}, {"fk_producto": 2, "cantidad": 5}]
+
+
+def test_json_vacio_y_con_bom():
+    assert leer(leer_conteo_json, b"[]") == []
+    assert leer(leer_conteo_json, "﻿[{\"codigo\": \"A\", \"cantidad\": 1}]".encode()) == [{"codigo": "A", "cantidad": 1}]
+
+
+def test_json_elementos_que_no_son_objeto():
+    # Se entregan tal cual: procesar_conteo_fisico los reporta como error de esa línea
+    assert leer(leer_conteo_json, b'[1, "x", null]') == [1, "x", None]
+
+
+@pytest.mark.parametrize("contenido", [b"", b'{"codigo": "A"}', b'[{"codigo": "A"}', b'[{"codigo": "A",'])
+def test_json_invalido(contenido):
+    with pytest.raises(HTTPException) as error:
+        leer(leer_conteo_json, contenido)
+    assert error.value.status_code == 400
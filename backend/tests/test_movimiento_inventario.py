@@ -0,0 +1,69 @@
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from app.services.movimiento_inventario import (
+    armar_cursor_movimientos,
+    calcular_cantidad_nueva,
+    parsear_cursor_movimientos,
+)
+
+
+# calcular_cantidad_nueva
+
+
+@pytest.mark.parametrize(
+    "tipo, anterior, cantidad, esperado",
+    [
+        ("entrada", 10, 5, 15),
+        ("devolucion", 10, 5, 15),
+        ("salida", 10, 4, 6),
+        ("salida", 10, 10, 0),
+        ("ajuste", 10, 3, 3),
+        ("ajuste", 10, 0, 0),
+    ],
+)
+def test_calcular_cantidad_nueva(tipo, anterior, cantidad, esperado):
+    assert calcular_cantidad_nueva(tipo, anterior, cantidad) == esperado
+
+
+def test_salida_sin_stock_suficiente():
+    with pytest.raises(HTTPException) as error:
+        calcular_cantidad_nueva("salida", 3, 4)
+    assert error.value.status_code == 400
+    assert "Stock insuficiente" in error.value.detail
+
+
+@pytest.mark.parametrize("tipo, cantidad", [("entrada", 0), ("salida", 0), ("entrada", -1), ("ajuste", -1)])
+def test_cantidad_invalida(tipo, cantidad):
+    with pytest.raises(HTTPException) as error:
+        calcular_cantidad_nueva(tipo, 10, cantidad)
+    assert error.value.status_code == 400
+
+
+def test_tipo_invalido():
+    with pytest.raises(HTTPException) as error:
+        calcular_cantidad_nueva("robo", 10, 1)
+    assert error.value.status_code == 400
+
+
+# Cursor de la paginación por keyset
+
+
+@pytest.mark.parametrize(
+    "fecha", [datetime(2026, 3, 1, 8, 30, 0), datetime(2026, 3, 1, 8, 30, 0, 250000)]
+)
+def test_cursor_movimientos_ida_y_vuelta(fecha):
+    cursor = armar_cursor_movimientos({"fecha_movimiento": fecha, "id": 42})
+    assert parsear_cursor_movimientos(cursor) == (fecha, 42)
+
+
+def test_cursor_movimientos_vacio():
+    assert parsear_cursor_movimientos(None) is None
+    assert parsear_cursor_movimientos("") is None
+
+
+@pytest.mark.parametrize("cursor", ["42", "ayer|42", "2026-03-01T08:30:00|x", "2026-03-01T08:30:00"])
+def test_cursor_movimientos_invalido(cursor):
+    with pytest.raises(HTTPException) as error:
+        parsear_cursor_movimientos(cursor)
+    assert error.value.status_code == 400
@@ -0,0 +1,59 @@
+from datetime import datetime
+import pytest
+from app.services.reporte_programado import parsear_cron, proxima_ejecucion
+
+
+def test_parsear_cron():
+    cron = parsear_cron("*/15 8-18 * * 1-5")
+    assert cron["minutos"] == {0, 15, 30, 45}
+    assert cron["horas"] == set(range(8, 19))
+    assert cron["dias"] == set(range(1, 32))
+    assert cron["meses"] == set(range(1, 13))
+    assert cron["dias_semana"] == {1, 2, 3, 4, 5}
+    assert cron["dia_o_semana"] is False
+
+
+def test_listas_y_paso_desde_un_valor():
+    cron = parsear_cron("5/20 0,12 1 1,7 *")
+    assert cron["minutos"] == {5, 25, 45}
+    assert cron["horas"] == {0, 12}
+    assert cron["meses"] == {1, 7}
+
+
+def test_domingo_como_7():
+    assert parsear_cron("0 0 * * 7")["dias_semana"] == {0}
+
+
+@pytest.mark.parametrize("expresion", ["* * * *", "60 * * * *", "* 24 * * *", "* * 0 * *", "* * * 13 *", "5-1 * * * *", "x * * * *"])
+def test_expresion_invalida(expresion):
+    with pytest.raises(ValueError):
+        parsear_cron(expresion)
+
+
+def test_proxima_ejecucion_diaria():
+    cron = parsear_cron("30 2 * * *")
+    assert proxima_ejecucion(cron, datetime(2026, 10, 19, 1, 0)) == datetime(2026, 10, 19, 2, 30)
+    # Siempre posterior a "desde", aunque coincida justo
+    assert proxima_ejecucion(cron, datetime(2026, 10, 19, 2, 30, 15)) == datetime(2026, 10, 20, 2, 30)
+
+
+def test_proxima_ejecucion_dias_habiles():
+    cron = parsear_cron("0 8 * * 1-5")
+    # Viernes 23/10/2026 a las 9: el próximo es el lunes 26
+    assert proxima_ejecucion(cron, datetime(2026, 10, 23, 9, 0)) == datetime(2026, 10, 26, 8, 0)
+
+
+def test_dia_del_mes_o_de_la_semana():
+    cron = parsear_cron("0 0 1 * 1")  # El 1 de cada mes o cualquier lunes
+    assert proxima_ejecucion(cron, datetime(2026, 10, 19, 12, 0)) == datetime(2026, 10, 26, 0, 0)
+    assert proxima_ejecucion(cron, datetime(2026, 10, 27, 0, 0)) == datetime(2026, 11, 1, 0, 0)
+
+
+def test_29_de_febrero():
+    cron = parsear_cron("0 0 29 2 *")
+    assert proxima_ejecucion(cron, datetime(2026, 3, 1)) == datetime(2028, 2, 29)
+
+
+def test_nunca_se_cumple():
+    with pytest.raises(ValueError):
+        proxima_ejecucion(parsear_cron("0 0 31 2 *"), datetime(2026, 1, 1))
@@ -0,0 +1,37 @@
+from datetime import date, datetime
+import pytest
+from fastapi import HTTPException
+from app.services.reportes import filtro_fechas_movimientos
+
+
+def test_sin_fechas():
+    assert filtro_fechas_movimientos() == ("", {})
+
+
+def test_rango_semiabierto():
+    condiciones, values = filtro_fechas_movimientos(date(2026, 1, 1), date(2026, 1, 31))
+    assert condiciones == " AND mi.fecha_movimiento >= :fecha_desde AND mi.fecha_movimiento < :fecha_hasta"
+    # El fin es exclusivo: el 31 entero queda adentro, el 1 de febrero no
+    assert values == {"fecha_desde": datetime(2026, 1, 1), "fecha_hasta": datetime(2026, 2, 1)}
+
+
+def test_un_solo_dia():
+    _, values = filtro_fechas_movimientos(date(2026, 2, 28), date(2026, 2, 28))
+    assert values == {"fecha_desde": datetime(2026, 2, 28), "fecha_hasta": datetime(2026, 3, 1)}
+
+
+def test_solo_inicio_o_solo_fin():
+    assert filtro_fechas_movimientos(fecha_inicio=date(2026, 1, 1)) == (
+        " AND mi.fecha_movimiento >= :fecha_desde",
+        {"fecha_desde": datetime(2026, 1, 1)},
+    )
+    assert filtro_fechas_movimientos(fecha_fin=date(2026, 12, 31)) == (
+        " AND mi.fecha_movimiento < :fecha_hasta",
+        {"fecha_hasta": datetime(2027, 1, 1)},
+    )
+
+
+def test_inicio_posterior_al_fin():
+    with pytest.raises(HTTPException) as error:
+        filtro_fechas_movimientos(date(2026, 2, 1), date(2026, 1, 31))
+    assert error.value.status_code == 400
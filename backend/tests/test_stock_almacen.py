@@ -0,0 +1,21 @@
+import pytest
+from fastapi import HTTPException
+from app.services.stock_almacen import armar_cursor_stock, parsear_cursor_stock
+
+
+def test_cursor_stock_ida_y_vuelta():
+    cursor = armar_cursor_stock({"fk_producto": 7, "fk_almacen": 3, "producto": "Tornillo"})
+    assert cursor == "7:3"
+    assert parsear_cursor_stock(cursor) == (7, 3)
+
+
+def test_cursor_stock_vacio():
+    assert parsear_cursor_stock(None) is None
+    assert parsear_cursor_stock("") is None
+
+
+@pytest.mark.parametrize("cursor", ["7", "7:3:1", "a:3", "7-3"])
+def test_cursor_stock_invalido(cursor):
+    with pytest.raises(HTTPException) as error:
+        parsear_cursor_stock(cursor)
+    assert error.value.status_code == 400
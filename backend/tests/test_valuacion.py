@@ -0,0 +1,121 @@
+from decimal import Decimal
+from app.services.valuacion import (
+    _egresar,
+    _ingresar_transferencia,
+    aplicar_movimiento,
+    estado_vacio,
+    valor_fifo,
+)
+
+
+def movimiento(id, tipo, anterior, nueva, costo=None, fk_transferencia=None) -> dict:
+    return {
+        "id": id,
+        "tipo_movimiento": tipo,
+        "cantidad_anterior": anterior,
+        "cantidad_nueva": nueva,
+        "costo_compra": costo,
+        "fk_transferencia": fk_transferencia,
+    }
+
+
+def estado_con_compras() -> dict:  # 10 a $5 y 10 a $9
+    estado = estado_vacio()
+    aplicar_movimiento(estado, movimiento(1, "entrada", 0, 10, Decimal(5)))
+    aplicar_movimiento(estado, movimiento(2, "entrada", 10, 20, Decimal(9)))
+    return estado
+
+
+def test_compras_fifo_y_promedio():
+    estado = estado_con_compras()
+    assert estado["cantidad"] == 20
+    assert estado["costo_promedio"] == Decimal(7)
+    assert estado["capas"] == [[10, Decimal(5)], [10, Decimal(9)]]
+    assert valor_fifo(estado) == Decimal(140)
+
+
+def test_compra_al_mismo_costo_suma_a_la_ultima_capa():
+    estado = estado_vacio()
+    aplicar_movimiento(estado, movimiento(1, "entrada", 0, 4, Decimal(3)))
+    aplicar_movimiento(estado, movimiento(2, "entrada", 4, 10, Decimal(3)))
+    assert estado["capas"] == [[10, Decimal(3)]]
+
+
+def test_salida_consume_las_capas_mas_viejas():
+    estado = estado_con_compras()
+    aplicar_movimiento(estado, movimiento(3, "salida", 20, 8))
+    assert estado["cantidad"] == 8
+    assert estado["capas"] == [[8, Decimal(9)]]
+    assert estado["costo_promedio"] == Decimal(7)  # Las salidas no cambian el promedio
+
+
+def test_egresar_devuelve_lo_consumido():
+    estado = estado_con_compras()
+    assert _egresar(estado, 15) == [[10, Decimal(5)], [5, Decimal(9)]]
+    assert estado["cantidad"] == 5
+    assert estado["capas"] == [[5, Decimal(9)]]
+
+
+def test_egresar_mas_que_las_capas():
+    estado = estado_con_compras()
+    assert _egresar(estado, 25) == [[10, Decimal(5)], [10, Decimal(9)]]
+    assert estado["cantidad"] == 0
+    assert estado["capas"] == []
+
+
+def test_devolucion_entra_al_costo_promedio():
+    estado = estado_con_compras()
+    aplicar_movimiento(estado, movimiento(3, "devolucion", 20, 22, Decimal(100)))
+    assert estado["costo_promedio"] == Decimal(7)
+    assert estado["capas"][-1] == [2, Decimal(7)]
+
+
+def test_transferencia_mueve_el_costo_del_origen():
+    origen, destino = estado_con_compras(), estado_vacio()
+    transferencias = {}
+
+    aplicar_movimiento(origen, movimiento(3, "salida", 20, 5, fk_transferencia=3), transferencias)
+    assert origen["cantidad"] == 5
+    assert origen["capas"] == [[5, Decimal(9)]]
+    assert transferencias == {3: {"costo_promedio": Decimal(7), "capas": [[10, Decimal(5)], [5, Decimal(9)]]}}
+
+    aplicar_movimiento(destino, movimiento(4, "entrada", 0, 15, fk_transferencia=3), transferencias)
+    assert destino["cantidad"] == 15
+    assert destino["costo_promedio"] == Decimal(7)
+    assert destino["capas"] == [[10, Decimal(5)], [5, Decimal(9)]]
+    assert transferencias == {}
+    # El valor total no cambia: solo se movió de almacén
+    assert valor_fifo(origen) + valor_fifo(destino) == Decimal(140)
+
+
+def test_transferencia_a_un_destino_con_stock():
+    destino = estado_vacio()
+    aplicar_movimiento(destino, movimiento(1, "entrada", 0, 5, Decimal(10)))
+    _ingresar_transferencia(destino, 5, {"costo_promedio": Decimal(6), "capas": [[5, Decimal(6)]]}, Decimal(0))
+    assert destino["cantidad"] == 10
+    assert destino["costo_promedio"] == Decimal(8)
+    assert destino["capas"] == [[5, Decimal(10)], [5, Decimal(6)]]
+
+
+def test_transferencia_con_menos_capas_que_lo_transferido():
+    destino = estado_vacio()
+    _ingresar_transferencia(destino, 8, {"costo_promedio": Decimal(4), "capas": [[3, Decimal(4)]]}, Decimal(2))
+    assert destino["capas"] == [[3, Decimal(4)], [5, Decimal(2)]]
+
+
+def test_entrada_de_transferencia_sin_su_salida_no_es_compra():
+    # La salida quedó antes del checkpoint y no está en memoria: entra al costo promedio, no como compra
+    estado = estado_con_compras()
+    aplicar_movimiento(estado, movimiento(5, "entrada", 20, 25, Decimal(100), fk_transferencia=4), {})
+    assert estado["costo_promedio"] == Decimal(7)
+
+
+def test_stock_tocado_sin_movimiento():
+    # cantidad_anterior no coincide con el estado: primero se lo lleva a ese valor
+    estado = estado_vacio()
+    aplicar_movimiento(estado, movimiento(1, "entrada", 4, 10, Decimal(3)))
+    assert estado["cantidad"] == 10
+    assert estado["capas"] == [[10, Decimal(3)]]
+
+    aplicar_movimiento(estado, movimiento(2, "salida", 6, 5))
+    assert estado["cantidad"] == 5